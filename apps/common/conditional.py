@@ -0,0 +1,58 @@
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для GET-представлений DRF с поддержкой ETag / Last-Modified.
+
+    Представление описывает своё состояние дешёвыми данными (версии, max(updated_at)),
+    а не телом ответа, поэтому на If-None-Match / If-Modified-Since
+    отвечаем 304 до выполнения основного запроса к БД.
+    """
+
+    def get_conditional_state(
+        self, request
+    ) -> Optional[tuple[list, Optional[datetime]]]:
+        """
+        Возвращает (части ETag, время последнего изменения).
+        None - у ресурса нет состояния (например, его нет в каталоге):
+        условный GET пропускается, ответ отдаёт само представление.
+        Должен быть реализован в представлении.
+        """
+        raise NotImplementedError("Метод get_conditional_state должен быть реализован.")
+
+    def get(self, request, *args, **kwargs):
+        state = self.get_conditional_state(request)
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        etag_parts, last_modified = state
+        etag = self._build_etag(request, etag_parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if not_modified is not None:
+            patch_cache_control(not_modified, public=True, no_cache=True)
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def _build_etag(self, request, etag_parts: list) -> str:
+        source = ":".join(
+            [self.__class__.__name__, request.get_full_path()]
+            + [str(part) for part in etag_parts]
+        )
+        return quote_etag(hashlib.sha1(source.encode("utf-8")).hexdigest())
@@ -0,0 +1,99 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from typing import Optional
+
+from django.db import DatabaseError, connection
+
+from .metrics import get_request_metrics
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL: deadlock_detected, serialization_failure
+RETRYABLE_SQLSTATES = {"40P01", "40001"}
+
+_retry_counts = Counter()
+_retry_counts_lock = threading.Lock()
+
+
+def get_sqlstate(error: DatabaseError) -> Optional[str]:
+    """SQLSTATE исходной ошибки драйвера (psycopg2 - pgcode, psycopg 3 - sqlstate)."""
+    cause = error.__cause__
+    return getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+
+
+def is_contention_error(error: DatabaseError) -> bool:
+    """Ошибка конкуренции за строки, после которой транзакцию можно повторить."""
+    if get_sqlstate(error) in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite: блокировка всей базы другой транзакцией
+    return "database is locked" in str(error)
+
+
+def get_retry_stats() -> dict:
+    """Счётчики повторов в процессе: {"<name>:<sqlstate>": n, "<name>:gave_up": n}."""
+    with _retry_counts_lock:
+        return dict(_retry_counts)
+
+
+def _count_retry(name: str, outcome: str) -> None:
+    with _retry_counts_lock:
+        _retry_counts[f"{name}:{outcome}"] += 1
+
+
+def retry_on_contention(
+    name: Optional[str] = None,
+    max_attempts: int = 4,
+    base_delay: float = 0.05,
+    max_delay: float = 2.0,
+):
+    """
+    Повторяет транзакцию при deadlock / serialization failure (40P01/40001)
+    и "database is locked" в SQLite.
+
+    Пауза - экспоненциальная с полным jitter: random(0, base * 2^attempt),
+    чтобы конкурирующие запросы не повторяли попытки синхронно. Повторы
+    считаются в get_retry_stats() и в метриках текущего запроса (db_retries).
+
+    Оборачивать нужно функцию, которая сама открывает транзакцию: внутри
+    внешнего atomic повтор невозможен, и ошибка пробрасывается сразу.
+    """
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return func(*args, **kwargs)
+                except DatabaseError as e:
+                    if not is_contention_error(e) or connection.in_atomic_block:
+                        raise
+                    if attempt == max_attempts - 1:
+                        _count_retry(label, "gave_up")
+                        logger.error(
+                            f"{label}: конфликт блокировок после {max_attempts} попыток, "
+                            f"сдаёмся: {e}"
+                        )
+                        raise
+
+                    sqlstate = get_sqlstate(e) or "locked"
+                    _count_retry(label, sqlstate)
+                    metrics = get_request_metrics()
+                    if metrics is not None:
+                        metrics.db_retries += 1
+
+                    wait_time = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+                    logger.warning(
+                        f"{label}: {sqlstate} на попытке {attempt + 1}/{max_attempts}, "
+                        f"повтор через {wait_time:.3f}s"
+                    )
+                    time.sleep(wait_time)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,86 @@
+from typing import Iterable, Optional
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Миксин сериализатора для выборочных полей (?fields=id,name / ?omit=group).
+
+    Невыбранные поля удаляются из self.fields до сериализации, поэтому их
+    SerializerMethodField не вызываются. Для связей, которые кормят эти поля,
+    сериализатор реализует setup_eager_loading(queryset, fields) и подгружает
+    только нужное - набор полей считает select_field_names().
+
+    Meta.sparse_optional_fields - поля, которые отдаются только по явному
+    запросу в ?fields= (например, облегчённое "image" для мобильных списков).
+    """
+
+    def __init__(
+        self,
+        *args,
+        fields: Optional[Iterable[str]] = None,
+        omit: Optional[Iterable[str]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        selected = self.select_field_names(fields, omit)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def select_field_names(
+        cls, fields: Optional[Iterable[str]] = None, omit: Optional[Iterable[str]] = None
+    ) -> set:
+        """Имена полей, которые попадут в ответ."""
+        declared = cls.Meta.fields
+        if fields:
+            selected = set(declared) & set(fields)
+        else:
+            optional = set(getattr(cls.Meta, "sparse_optional_fields", ()))
+            selected = set(declared) - optional
+        return selected - set(omit or ())
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields: Optional[set] = None):
+        return queryset
+
+
+class SparseFieldsetViewMixin:
+    """
+    Миксин представления: читает ?fields= / ?omit= (через запятую), передаёт
+    их сериализатору и подгружает связи только для выбранных полей.
+    Сериализатор должен использовать SparseFieldsetSerializerMixin.
+    """
+
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+
+    def get_sparse_fieldset(self) -> dict:
+        params = self.request.query_params
+        return {
+            "fields": self._split(params.get(self.fields_query_param)),
+            "omit": self._split(params.get(self.omit_query_param)),
+        }
+
+    def get_selected_field_names(self) -> set:
+        return self.get_serializer_class().select_field_names(
+            **self.get_sparse_fieldset()
+        )
+
+    def is_sparse_request(self) -> bool:
+        return any(self.get_sparse_fieldset().values())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_sparse_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        return self.get_serializer_class().setup_eager_loading(
+            super().filter_queryset(queryset), fields=self.get_selected_field_names()
+        )
+
+    @staticmethod
+    def _split(value: Optional[str]) -> Optional[list]:
+        if not value:
+            return None
+        return [name.strip() for name in value.split(",") if name.strip()]
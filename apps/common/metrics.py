@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Optional
+
+
+@dataclass
+class RequestMetrics:
+    """Счётчики одного запроса: SQL, повторы транзакций и внешние вызовы."""
+
+    queries: int = 0
+    db_time: float = 0.0
+    db_retries: int = 0
+    outbound: dict = field(default_factory=dict)
+
+    def add_query(self, duration: float) -> None:
+        self.queries += 1
+        self.db_time += duration
+
+    def add_outbound(self, name: str, duration: float) -> None:
+        calls, total = self.outbound.get(name, (0, 0.0))
+        self.outbound[name] = (calls + 1, total + duration)
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+def get_request_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def collect_request_metrics():
+    """Включает сбор метрик для текущего запроса (используется middleware)."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def track_outbound(name: str):
+    """
+    Засекает время внешнего вызова (YooKassa, Яндекс Доставка, S3).
+    Вне HTTP-запроса (команды, cron) ничего не делает.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_outbound(name, time.perf_counter() - started)
+
+
+def timed_outbound(name: str):
+    """Декоратор-вариант track_outbound для методов провайдеров."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_outbound(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
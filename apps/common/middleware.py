@@ -0,0 +1,96 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import collect_request_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше SQL-запросов, чем разрешено бюджетом."""
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает SQL-запросы, время БД и внешних вызовов на запрос.
+
+    Результат уходит в заголовок Server-Timing и в одну строку лога
+    (key=value). Бюджеты запросов задаются в settings.QUERY_BUDGETS по имени
+    маршрута; при превышении пишется warning или, при
+    QUERY_BUDGET_ACTION="raise" (по умолчанию в тестах), бросается
+    QueryBudgetExceeded - так N+1 в сериализаторах ловятся тестами.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect_request_metrics() as metrics, ExitStack() as stack:
+            wrapper = self._query_wrapper(metrics)
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        response["Server-Timing"] = self._server_timing(metrics, total)
+        view_name = self._view_name(request)
+        self._log(request, response, view_name, metrics, total)
+        self._check_budget(view_name, metrics)
+        return response
+
+    @staticmethod
+    def _query_wrapper(metrics):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                metrics.add_query(time.perf_counter() - started)
+
+        return wrapper
+
+    @staticmethod
+    def _server_timing(metrics, total: float) -> str:
+        parts = [f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"']
+        for name, (calls, duration) in sorted(metrics.outbound.items()):
+            parts.append(f'{name};dur={duration * 1000:.1f};desc="{calls} calls"')
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    @staticmethod
+    def _view_name(request) -> str:
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match else ""
+
+    def _log(self, request, response, view_name, metrics, total) -> None:
+        outbound = "".join(
+            f" {name}_calls={calls} {name}_ms={duration * 1000:.1f}"
+            for name, (calls, duration) in sorted(metrics.outbound.items())
+        )
+        logger.info(
+            f"request method={request.method} path={request.path} "
+            f"view={view_name or '-'} status={response.status_code} "
+            f"duration_ms={total * 1000:.1f} db_queries={metrics.queries} "
+            f"db_ms={metrics.db_time * 1000:.1f} db_retries={metrics.db_retries}{outbound}"
+        )
+
+    def _check_budget(self, view_name, metrics) -> None:
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is None or metrics.queries <= budget:
+            return
+
+        message = (
+            f"Query budget exceeded for {view_name}: "
+            f"{metrics.queries} queries (budget {budget})"
+        )
+        if settings.QUERY_BUDGET_ACTION == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
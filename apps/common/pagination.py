@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) пагинация.
+
+    Следующая страница выбирается условием по значениям полей сортировки
+    последней строки (WHERE (f, id) > (v, id_v)), без COUNT(*) и OFFSET,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    К сортировке всегда добавляется pk как уникальный tie-breaker.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values))
+
+        results = list(queryset.order_by(*self.ordering)[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_ordering(self, queryset) -> list:
+        """Сортировка из OrderingFilter (или модели) с pk в конце."""
+        ordering = [
+            field
+            for field in (queryset.query.order_by or self.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        pk_name = self.model._meta.pk.name
+        if not any(field.lstrip("-") in (pk_name, "pk") for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith("-")
+            ordering.append(f"-{pk_name}" if descending else pk_name)
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [
+            self._encode_value(getattr(last, field.lstrip("-")))
+            for field in self.ordering
+        ]
+        token = json.dumps({"o": self.ordering, "v": values}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Возвращает значения полей сортировки из курсора или None."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if token["o"] != self.ordering or len(token["v"]) != len(self.ordering):
+                raise ValueError("ordering mismatch")
+            return [
+                self.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, token["v"])
+            ]
+        except (
+            binascii.Error,
+            UnicodeError,
+            ValueError,
+            KeyError,
+            TypeError,
+            FieldDoesNotExist,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _keyset_filter(self, values) -> Q:
+        """
+        f1 >= v1 AND ((f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...) с учётом
+        направления. Цепочка OR сама по себе не задаёт границу диапазона,
+        и PostgreSQL читал бы индекс (f1, id) с начала, отбрасывая прошлые
+        страницы; ведущее f1 >= v1 превращает её в Index Cond.
+        """
+        first = self.ordering[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return Q(**{f"{first.lstrip('-')}__{bound}": values[0]}) & condition
+
+    @staticmethod
+    def _encode_value(value):
+        if isinstance(value, (datetime, date)):
+            # полная точность: DjangoJSONEncoder обрезает микросекунды
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+
+class OptionalKeysetPaginationMixin:
+    """
+    Включает KeysetPagination по запросу клиента (?pagination=cursor
+    или наличие ?cursor=), иначе используется пагинация по умолчанию.
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.keyset_pagination_requested():
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
+
+    def keyset_pagination_requested(self) -> bool:
+        params = self.request.query_params
+        return (
+            params.get("pagination") == "cursor"
+            or self.keyset_pagination_class.cursor_query_param in params
+        )
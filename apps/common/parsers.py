@@ -0,0 +1,51 @@
+import codecs
+import io
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+# orjson превращает целые больше 64 бит во float, такие тела разбирает json
+LONG_NUMBER_RE = re.compile(rb"\d{20}")
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser на orjson (включается API_JSON_BACKEND=orjson).
+
+    Тело в UTF-8 разбирается orjson; если orjson не справился (другая
+    кодировка, целые больше 64 бит, NaN при STRICT_JSON=False, ошибка
+    синтаксиса), тело разбирается стандартным парсером - результат
+    и тексты ошибок совпадают с JSONParser.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                "API_JSON_BACKEND=orjson требует установленного пакета orjson"
+            )
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        raw = stream.read()
+
+        if self._is_utf8(parser_context) and not LONG_NUMBER_RE.search(raw):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+
+        return super().parse(io.BytesIO(raw), media_type, parser_context)
+
+    @staticmethod
+    def _is_utf8(parser_context) -> bool:
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            return codecs.lookup(encoding).name == "utf-8"
+        except LookupError:
+            return False
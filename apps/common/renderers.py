@@ -0,0 +1,60 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson - необязательная зависимость
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson (включается API_JSON_BACKEND=orjson).
+
+    Вывод побайтно совпадает со стандартным JSONRenderer: UUID и datetime
+    (UTC как "Z") кодируются нативно, остальные типы (Decimal -> float,
+    timedelta, lazy-строки, QuerySet) проходят через тот же JSONEncoder.default.
+    Отступы (?format=api, "; indent=4"), ensure_ascii / не-compact режимы,
+    а также то, что orjson не умеет (целые больше 64 бит, aware time),
+    отдаются стандартному рендереру.
+
+    Расхождения: NaN/Infinity пишутся как null (стандартный рендерер
+    бросает ValueError), экспоненциальная запись float вне 1e-4..1e16
+    отличается (1e16 вместо 1e+16). В данных API таких значений нет.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_PASSTHROUGH_DATACLASS
+        if orjson
+        else 0
+    )
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                "API_JSON_BACKEND=orjson требует установленного пакета orjson"
+            )
+        self.default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Как и JSONRenderer, экранируем U+2028 / U+2029 (строгое подмножество JS)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
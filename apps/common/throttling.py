@@ -10,6 +10,14 @@ class OrderCreateThrottle(AnonRateThrottle):
     rate = "5/minute"
     scope = "order_create"
 
+    def allow_request(self, request, view):
+        # Повтор с Idempotency-Key, ответ на который уже сохранён, заказ не
+        # создаёт - лимит на него не расходуется
+        is_replay = getattr(view, "is_idempotent_replay", None)
+        if is_replay is not None and is_replay(request):
+            return True
+        return super().allow_request(request, view)
+
 
 class ContactFormThrottle(AnonRateThrottle):
     """
@@ -5,6 +5,8 @@ from typing import Dict, List, Optional
 
 from django.conf import settings
 
+from apps.common.metrics import track_outbound
+
 from .base import DeliveryProviderBase
 from .schemas import CalculateCostResult
 
@@ -90,9 +92,10 @@ class YandexDeliveryProvider(DeliveryProviderBase):
         }
 
         try:
-            response = requests.post(
-                url, headers=self._get_headers(), json=payload, timeout=30
-            )
+            with track_outbound("delivery"):
+                response = requests.post(
+                    url, headers=self._get_headers(), json=payload, timeout=30
+                )
             response.raise_for_status()
             data = response.json()
 
@@ -68,7 +68,16 @@ class ProductMediaInline(admin.TabularInline):
     model = ProductMedia
     formset = ProductMediaFormSet
     extra = 1
-    fields = ("preview", "file_upload", "type", "url", "variant", "position", "is_main")
+    fields = (
+        "preview",
+        "file_upload",
+        "uploaded_key",
+        "type",
+        "url",
+        "variant",
+        "position",
+        "is_main",
+    )
     readonly_fields = ("preview",)
     classes = ["collapse"]
 
@@ -87,6 +96,7 @@ class ProductMediaInline(admin.TabularInline):
     def delete_model(self, request, obj):
         """Удаление медиафайла с cleanup из S3 если не используется."""
         old_url = obj.url
+        derivative_urls = [d["url"] for d in obj.derivatives]
         obj.delete()
 
         if old_url:
@@ -96,6 +106,7 @@ class ProductMediaInline(admin.TabularInline):
                     file_url=old_url,
                     model_class=ProductMedia,
                     field_name="url",
+                    related_urls=derivative_urls,
                 )
             except Exception as e:
                 logger.error(f"Ошибка при удалении файла из S3: {str(e)}")
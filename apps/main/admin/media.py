@@ -1,6 +1,9 @@
 import logging
 
 from django.contrib import admin
+from django.http import JsonResponse
+from django.urls import path
+from django.views.decorators.http import require_POST
 
 from apps.storage import StorageService
 from .media_forms import ProductMediaForm
@@ -30,7 +33,7 @@ class ProductMediaAdmin(admin.ModelAdmin):
         (
             "Медиа",
             {
-                "fields": ("file_upload", "url", "preview", "position"),
+                "fields": ("file_upload", "uploaded_key", "url", "preview", "position"),
                 "description": "Загрузите файл или укажите URL",
             },
         ),
@@ -42,9 +45,51 @@ class ProductMediaAdmin(admin.ModelAdmin):
 
     preview.short_description = "Предпросмотр"
 
+    def get_urls(self):
+        urls = [
+            path(
+                "presign/",
+                self.admin_site.admin_view(require_POST(self.presign_view)),
+                name="main_productmedia_presign",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def presign_view(self, request):
+        """
+        Подписывает прямую загрузку файла из браузера в S3.
+        Сам файл через gunicorn не проходит - форма получает только ключ.
+        """
+        if not (
+            self.has_add_permission(request) or self.has_change_permission(request)
+        ):
+            return JsonResponse({"error": "Недостаточно прав"}, status=403)
+
+        product_id = request.POST.get("product", "")
+        path_prefix = (
+            f"products/{product_id}" if product_id.isdigit() else "products/temp"
+        )
+        size = request.POST.get("size", "")
+        try:
+            upload = StorageService().create_direct_upload(
+                filename=request.POST.get("filename", ""),
+                size=int(size) if size.isdigit() else None,
+                path_prefix=path_prefix,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Ошибка подписи прямой загрузки: {str(e)}")
+            return JsonResponse({"error": "Хранилище недоступно"}, status=502)
+
+        return JsonResponse(
+            {"url": upload.url, "fields": upload.fields, "file_key": upload.file_key}
+        )
+
     def delete_model(self, request, obj):
         """Удаление медиафайла с cleanup из S3 если не используется."""
         old_url = obj.url
+        derivative_urls = [d["url"] for d in obj.derivatives]
         super().delete_model(request, obj)
 
         if old_url:
@@ -54,23 +99,25 @@ class ProductMediaAdmin(admin.ModelAdmin):
                     file_url=old_url,
                     model_class=obj.__class__,
                     field_name="url",
+                    related_urls=derivative_urls,
                 )
             except Exception as e:
                 logger.error(f"Ошибка при удалении файла из S3: {str(e)}")
 
     def delete_queryset(self, request, queryset):
         """Массовое удаление с cleanup из S3."""
-        urls_to_cleanup = list(queryset.values_list("url", flat=True))
+        urls_to_cleanup = list(queryset.values_list("url", "derivatives"))
         super().delete_queryset(request, queryset)
 
         storage_service = StorageService()
-        for url in urls_to_cleanup:
+        for url, derivatives in urls_to_cleanup:
             if url:
                 try:
                     storage_service.cleanup_unused(
                         file_url=url,
                         model_class=queryset.model,
                         field_name="url",
+                        related_urls=[d["url"] for d in derivatives],
                     )
                 except Exception as e:
                     logger.error(f"Ошибка при удалении файла {url} из S3: {str(e)}")
@@ -1,8 +1,10 @@
 import logging
 
 from django import forms
+from django.urls import reverse
 
 from apps.storage import StorageService
+from config.admin import admin_site
 from ..models import ProductMedia
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,8 @@ class ProductMediaForm(forms.ModelForm):
         help_text="Загрузите изображение (jpg, jpeg, png, webp, gif, до 10 МБ)",
         widget=forms.ClearableFileInput(attrs={"accept": "image/*"}),
     )
+    # Ключ файла, загруженного браузером напрямую в бакет (presigned POST)
+    uploaded_key = forms.CharField(required=False, widget=forms.HiddenInput)
 
     class Meta:
         model = ProductMedia
@@ -30,9 +34,16 @@ class ProductMediaForm(forms.ModelForm):
             ),
         }
 
+    class Media:
+        js = ("main/admin/direct_upload.js",)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        
+        self.fields["file_upload"].widget.attrs["data-direct-upload-url"] = reverse(
+            f"{admin_site.name}:main_productmedia_presign"
+        )
+        self._direct_upload = None
+
         # URL не обязателен, если загружается файл
         if not self.instance.pk:
             self.fields["url"].required = False
@@ -40,10 +51,19 @@ class ProductMediaForm(forms.ModelForm):
     def clean(self):
         cleaned_data = super().clean()
         file_upload = cleaned_data.get("file_upload")
+        uploaded_key = cleaned_data.get("uploaded_key")
         url = cleaned_data.get("url")
 
+        if uploaded_key and not file_upload:
+            try:
+                self._direct_upload = StorageService().confirm_direct_upload(
+                    uploaded_key
+                )
+            except ValueError as e:
+                raise forms.ValidationError(f"Ошибка загрузки файла: {str(e)}")
+
         # Проверяем, что предоставлен либо файл, либо URL
-        if not file_upload and not url:
+        if not file_upload and not uploaded_key and not url:
             if not self.instance.pk:
                 raise forms.ValidationError(
                     "Необходимо загрузить файл или указать URL"
@@ -75,9 +95,36 @@ class ProductMediaForm(forms.ModelForm):
                 
                 logger.info(f"Файл загружен в S3: {result.url}")
 
+                # Уменьшенные копии для srcset (thumb/card/detail/zoom)
+                instance.derivatives = (
+                    storage_service.upload_derivatives(file_upload, result)
+                    if instance.type == "image"
+                    else []
+                )
+
             except Exception as e:
                 logger.error(f"Ошибка загрузки файла в S3: {str(e)}")
                 raise forms.ValidationError(f"Ошибка загрузки файла: {str(e)}")
+        elif self._direct_upload:
+            # Файл уже в бакете: читаем его оттуда только ради производных
+            result = self._direct_upload
+            instance.url = result.url
+            instance.derivatives = []
+            if instance.type == "image":
+                storage_service = StorageService()
+                try:
+                    with storage_service.open(result.file_key) as source:
+                        instance.derivatives = storage_service.upload_derivatives(
+                            source, result
+                        )
+                except Exception as e:
+                    logger.error(
+                        f"Ошибка создания производных для {result.url}: {str(e)}"
+                    )
+            logger.info(f"Файл загружен напрямую в S3: {result.url}")
+        elif "url" in self.changed_data:
+            # URL заменён вручную: старые производные к нему не относятся
+            instance.derivatives = []
 
         if commit:
             instance.save()
@@ -28,7 +28,7 @@ def render_media_preview(obj, size=150):
         return "—"
 
     if obj.type == "image":
-        return render_image_preview(obj.url, size)
+        return render_image_preview(obj.get_derivative_url("thumb"), size)
 
     if obj.type == "video":
         return format_html(
@@ -62,7 +62,7 @@ class ProductAdmin(TimestampMixin, admin.ModelAdmin):
         if main_media:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 4px;" />',
-                main_media.url
+                main_media.get_derivative_url("thumb")
             )
         return "-"
     
@@ -52,6 +52,7 @@ def generate_product_variants(
                 variant=variant,
                 type=media.type,
                 url=media.url,
+                derivatives=media.derivatives,
                 position=media.position,
                 is_main=False,
             )
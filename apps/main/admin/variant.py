@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.shortcuts import render
 from django.utils.html import format_html
 from ..models import ProductVariant, ProductMedia
+from ..signals import schedule_products_refresh
 from .mixins import TimestampMixin, render_image_preview
 
 
@@ -11,6 +12,7 @@ def bulk_update_price(modeladmin, request, queryset):
         new_price = request.POST.get("new_price")
         if new_price:
             count = queryset.update(price=new_price)
+            schedule_products_refresh(queryset.values_list("product_id", flat=True))
             modeladmin.message_user(request, f"Обновлено {count} цен")
             return
 
@@ -31,6 +33,7 @@ def bulk_update_stock(modeladmin, request, queryset):
         new_stock = request.POST.get("new_stock")
         if new_stock:
             count = queryset.update(stock=new_stock)
+            schedule_products_refresh(queryset.values_list("product_id", flat=True))
             modeladmin.message_user(request, f"Обновлено {count} остатков")
             return
 
@@ -65,6 +68,7 @@ def duplicate_variant(modeladmin, request, queryset):
                 variant=new_variant,
                 type=media.type,
                 url=media.url,
+                derivatives=media.derivatives,
                 position=media.position,
                 is_main=False,
             )
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+
+class ProductDetailCache:
+    """
+    Кэш сериализованных карточек товара (ProductDetailView) по slug.
+
+    Карточка включает соседние цвета группы, поэтому единица инвалидации -
+    группа товаров: любое изменение товара, его вариантов или медиа
+    сбрасывает карточки всех цветов этой группы.
+
+    Запись лежит под ключом с версией slug. Инвалидация увеличивает версию,
+    а не удаляет запись: карточка, собранная до инвалидации, запишется
+    под старой версией и уже не будет прочитана.
+    """
+
+    KEY_PREFIX = "product_detail"
+    HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+    MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+
+    @property
+    def timeout(self) -> int:
+        return settings.PRODUCT_DETAIL_CACHE_TIMEOUT
+
+    def get(self, slug: str) -> tuple[Optional[dict], int]:
+        """
+        Возвращает (карточка или None, версия). Версию нужно передать
+        в set() - она прочитана до сборки карточки из БД.
+        """
+        version = self._version(slug)
+        data = cache.get(self._key(slug, version))
+        self._incr(self.HITS_KEY if data is not None else self.MISSES_KEY)
+        return data, version
+
+    def set(self, slug: str, data: dict, version: int) -> None:
+        cache.set(self._key(slug, version), data, self.timeout)
+
+    def invalidate_slugs(self, slugs: Iterable[str]) -> None:
+        slugs = {slug for slug in slugs if slug}
+        for slug in slugs:
+            self._bump_version(slug)
+        if slugs:
+            logger.debug(f"Product detail cache invalidated: {len(slugs)} keys")
+
+    def invalidate_groups(
+        self, group_ids: Iterable[int] = (), product_ids: Iterable[int] = ()
+    ) -> None:
+        """
+        Сбрасывает карточки всех товаров указанных групп и групп,
+        к которым относятся указанные товары (одним запросом).
+        """
+        group_ids, product_ids = set(group_ids), set(product_ids)
+        if not group_ids and not product_ids:
+            return
+        affected_groups = Q(group_id__in=group_ids) | Q(
+            group_id__in=Product.objects.filter(id__in=product_ids).values("group_id")
+        )
+        self.invalidate_slugs(
+            Product.objects.filter(affected_groups).values_list("slug", flat=True)
+        )
+
+    def stats(self) -> dict:
+        values = cache.get_many([self.HITS_KEY, self.MISSES_KEY])
+        hits = values.get(self.HITS_KEY, 0)
+        misses = values.get(self.MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        cache.delete_many([self.HITS_KEY, self.MISSES_KEY])
+
+    def _key(self, slug: str, version: int) -> str:
+        return f"{self.KEY_PREFIX}:{slug}:{version}"
+
+    def _version_key(self, slug: str) -> str:
+        return f"{self.KEY_PREFIX}:version:{slug}"
+
+    def _version(self, slug: str) -> int:
+        key = self._version_key(slug)
+        version = cache.get(key)
+        if version is None:
+            # Как у CatalogVersion: после вытеснения ключа версия не повторится
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def _bump_version(self, slug: str) -> None:
+        key = self._version_key(slug)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+    def _incr(self, key: str) -> None:
+        # add() атомарно создаёт счётчик, если его ещё нет
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+
+class CatalogVersion:
+    """
+    Счётчик версии каталога. Увеличивается после коммита любого изменения
+    каталога и входит в ETag каталожных эндпоинтов.
+    """
+
+    KEY = "catalog:version"
+
+    def get(self) -> int:
+        version = cache.get(self.KEY)
+        if version is None:
+            # Стартуем со времени, чтобы после вытеснения ключа версия не повторилась
+            cache.add(self.KEY, time.time_ns(), timeout=None)
+            version = cache.get(self.KEY)
+        return version
+
+    def bump(self) -> None:
+        try:
+            cache.incr(self.KEY)
+        except ValueError:
+            cache.add(self.KEY, time.time_ns(), timeout=None)
+
+
+product_detail_cache = ProductDetailCache()
+catalog_version = CatalogVersion()
+
+
+def schedule_detail_invalidation(
+    group_ids: Iterable[int] = (),
+    product_ids: Iterable[int] = (),
+    slugs: Iterable[str] = (),
+) -> None:
+    """
+    Сбрасывает кэш карточек и увеличивает версию каталога после коммита
+    транзакции, чтобы параллельный запрос не закэшировал данные, которые
+    ещё не зафиксированы. Изменения внутри одной транзакции сбрасываются
+    одним проходом.
+    """
+    if getattr(_pending, "group_ids", None) is None:
+        _pending.group_ids, _pending.product_ids, _pending.slugs = set(), set(), set()
+    _pending.group_ids.update(group_ids)
+    _pending.product_ids.update(product_ids)
+    _pending.slugs.update(slugs)
+    transaction.on_commit(_flush_detail_invalidation)
+
+
+def _flush_detail_invalidation() -> None:
+    group_ids = getattr(_pending, "group_ids", None)
+    if group_ids is None:
+        return
+    product_ids, slugs = _pending.product_ids, _pending.slugs
+    if not group_ids and not product_ids and not slugs:
+        return
+    _pending.group_ids, _pending.product_ids, _pending.slugs = set(), set(), set()
+
+    try:
+        catalog_version.bump()
+        product_detail_cache.invalidate_slugs(slugs)
+        product_detail_cache.invalidate_groups(group_ids, product_ids)
+    except Exception as e:
+        logger.error(f"Failed to invalidate product detail cache: {e}", exc_info=True)
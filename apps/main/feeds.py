@@ -0,0 +1,296 @@
+import csv
+import gzip
+import io
+import os
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import quote, urlencode
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.orders.models import annotate_available_stock
+
+from .models import Category, ProductGroupCategory, ProductMedia, ProductVariant
+
+
+class ProductFeed:
+    """
+    Базовый класс товарного фида.
+
+    Варианты читаются одним запросом (товар, группа, цвет, размер и главное
+    фото через подзапрос) курсором с iterator(chunk_size=...), а документ
+    отдаётся генератором строк, поэтому память не зависит от размера каталога.
+    """
+
+    name = ""
+    formats = ("xml", "csv")
+    content_types = {
+        "xml": "application/xml; charset=utf-8",
+        "csv": "text/csv; charset=utf-8",
+    }
+    csv_fields: list = []
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def stream(self, fmt: str) -> Iterator[str]:
+        if fmt == "xml":
+            return self.stream_xml()
+        if fmt == "csv":
+            return self.stream_csv()
+        raise ValueError(f"Неподдерживаемый формат фида: {fmt}")
+
+    def stream_xml(self) -> Iterator[str]:
+        raise NotImplementedError("Метод stream_xml должен быть реализован.")
+
+    def stream_csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.csv_fields)
+
+        for row in self.iter_rows():
+            writer.writerow(self.csv_row(row))
+            if buffer.tell() > 64 * 1024:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    def csv_row(self, row: dict) -> list:
+        raise NotImplementedError("Метод csv_row должен быть реализован.")
+
+    def iter_rows(self) -> Iterator[dict]:
+        main_image = (
+            ProductMedia.objects.filter(product_id=OuterRef("product_id"))
+            .order_by("-is_main", "position")
+            .values("url")[:1]
+        )
+        category_id = (
+            ProductGroupCategory.objects.filter(
+                group_id=OuterRef("product__group_id"), category__is_active=True
+            )
+            .order_by("category_id")
+            .values("category_id")[:1]
+        )
+        # В фидах - доступный остаток: зарезервированное под заказы не продаём
+        queryset = (
+            annotate_available_stock(
+                ProductVariant.objects.filter(is_active=True, product__is_active=True)
+            )
+            .annotate(
+                final_price=Coalesce("price", "product__price"),
+                image=Subquery(main_image),
+                category_id=Subquery(category_id),
+                product_name=F("product__name"),
+                product_slug=F("product__slug"),
+                group_id=F("product__group_id"),
+                description=F("product__group__description"),
+                excerpt=F("product__group__excerpt"),
+                color_name=F("product__color__name"),
+                size_name=F("size__name"),
+            )
+            .values(
+                "id",
+                "sku",
+                "available_stock",
+                "final_price",
+                "image",
+                "category_id",
+                "product_name",
+                "product_slug",
+                "group_id",
+                "description",
+                "excerpt",
+                "color_name",
+                "size_name",
+            )
+            .order_by("id")
+        )
+        return queryset.iterator(chunk_size=self.chunk_size)
+
+    def product_url(self, row: dict) -> str:
+        query = urlencode({"size": row["size_name"]})
+        return f"{settings.FRONTEND_URL}/product/{quote(row['product_slug'])}?{query}"
+
+    def title(self, row: dict) -> str:
+        return f"{row['product_name']}, размер {row['size_name']}"
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+
+class YandexMarketFeed(ProductFeed):
+    """Фид в формате YML (Яндекс Маркет)."""
+
+    name = "yandex"
+    csv_fields = [
+        "id",
+        "available",
+        "name",
+        "url",
+        "price",
+        "currencyId",
+        "categoryId",
+        "picture",
+        "description",
+        "group_id",
+        "size",
+        "color",
+        "count",
+    ]
+
+    def stream_xml(self) -> Iterator[str]:
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield f"<yml_catalog date={quoteattr(timezone.now().isoformat(timespec='minutes'))}>\n"
+        yield "<shop>\n"
+        yield f"<name>{escape(settings.FEED_SHOP_NAME)}</name>\n"
+        yield f"<company>{escape(settings.FEED_COMPANY_NAME)}</company>\n"
+        yield f"<url>{escape(settings.FRONTEND_URL)}</url>\n"
+        yield '<currencies><currency id="RUB" rate="1"/></currencies>\n'
+
+        yield "<categories>\n"
+        for category_id, name in Category.objects.filter(is_active=True).values_list(
+            "id", "name"
+        ):
+            yield f'<category id="{category_id}">{escape(name)}</category>\n'
+        yield "</categories>\n"
+
+        yield "<offers>\n"
+        for row in self.iter_rows():
+            yield self._offer(row)
+        yield "</offers>\n</shop>\n</yml_catalog>\n"
+
+    def _offer(self, row: dict) -> str:
+        parts = [
+            f"<offer id={quoteattr(row['sku'])} "
+            f"available=\"{'true' if row['available_stock'] > 0 else 'false'}\" "
+            f"group_id=\"{row['group_id']}\">",
+            f"<name>{escape(self.title(row))}</name>",
+            f"<url>{escape(self.product_url(row))}</url>",
+            f"<price>{row['final_price']}</price>",
+            "<currencyId>RUB</currencyId>",
+        ]
+        if row["category_id"]:
+            parts.append(f"<categoryId>{row['category_id']}</categoryId>")
+        if row["image"]:
+            parts.append(f"<picture>{escape(row['image'])}</picture>")
+        description = row["description"] or row["excerpt"]
+        if description:
+            parts.append(f"<description>{escape(description)}</description>")
+        parts += [
+            f'<param name="Размер">{escape(row["size_name"])}</param>',
+            f'<param name="Цвет">{escape(row["color_name"])}</param>',
+            f"<count>{row['available_stock']}</count>",
+            "</offer>\n",
+        ]
+        return "".join(parts)
+
+    def csv_row(self, row: dict) -> list:
+        return [
+            row["sku"],
+            "true" if row["available_stock"] > 0 else "false",
+            self.title(row),
+            self.product_url(row),
+            row["final_price"],
+            "RUB",
+            row["category_id"] or "",
+            row["image"] or "",
+            row["description"] or row["excerpt"],
+            row["group_id"],
+            row["size_name"],
+            row["color_name"],
+            row["available_stock"],
+        ]
+
+
+class GoogleMerchantFeed(ProductFeed):
+    """Фид в формате Google Merchant Center (RSS 2.0)."""
+
+    name = "google"
+    csv_fields = [
+        "id",
+        "title",
+        "description",
+        "link",
+        "image_link",
+        "availability",
+        "price",
+        "item_group_id",
+        "size",
+        "color",
+        "condition",
+    ]
+
+    def stream_xml(self) -> Iterator[str]:
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+        yield f"<title>{escape(settings.FEED_SHOP_NAME)}</title>\n"
+        yield f"<link>{escape(settings.FRONTEND_URL)}</link>\n"
+        yield f"<description>{escape(settings.FEED_COMPANY_NAME)}</description>\n"
+        for row in self.iter_rows():
+            yield self._item(row)
+        yield "</channel>\n</rss>\n"
+
+    def _item(self, row: dict) -> str:
+        fields = zip(self.csv_fields, self.csv_row(row))
+        body = "".join(
+            f"<g:{name}>{escape(str(value))}</g:{name}>" for name, value in fields if value
+        )
+        return f"<item>{body}</item>\n"
+
+    def csv_row(self, row: dict) -> list:
+        return [
+            row["sku"],
+            self.title(row),
+            row["description"] or row["excerpt"],
+            self.product_url(row),
+            row["image"] or "",
+            "in_stock" if row["available_stock"] > 0 else "out_of_stock",
+            f"{row['final_price']} RUB",
+            row["group_id"],
+            row["size_name"],
+            row["color_name"],
+            "new",
+        ]
+
+
+FEEDS = {feed.name: feed for feed in (YandexMarketFeed, GoogleMerchantFeed)}
+
+
+def write_feed(feed: ProductFeed, fmt: str, directory: Path) -> Path:
+    """
+    Пишет фид на диск потоково: рядом кладутся <feed>.<fmt> и <feed>.<fmt>.gz
+    (для gzip_static в nginx). Файлы заменяются атомарно через os.replace,
+    поэтому nginx никогда не отдаёт недописанный фид.
+
+    Returns:
+        Путь к несжатому файлу
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{feed.name}.{fmt}"
+    gz_path = path.with_name(f"{path.name}.gz")
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_gz_path = gz_path.with_name(f".{gz_path.name}.tmp")
+
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as plain, gzip.open(
+            tmp_gz_path, "wt", encoding="utf-8", newline=""
+        ) as compressed:
+            for chunk in feed.stream(fmt):
+                plain.write(chunk)
+                compressed.write(chunk)
+        os.replace(tmp_gz_path, gz_path)
+        os.replace(tmp_path, path)
+    finally:
+        for leftover in (tmp_path, tmp_gz_path):
+            leftover.unlink(missing_ok=True)
+
+    return path
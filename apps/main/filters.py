@@ -0,0 +1,80 @@
+from django.db.models import Count
+from django_filters import rest_framework as filters
+
+from apps.orders.models import annotate_available_stock
+
+from .models import CatalogProduct, ProductGroupCategory, ProductVariant
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """Фильтр по списку значений через запятую: ?color=black,white"""
+
+
+def available_variants():
+    """Активные варианты с доступным остатком (за вычетом резервов заказов)."""
+    return annotate_available_stock(ProductVariant.objects.filter(is_active=True)).filter(
+        available_stock__gt=0
+    )
+
+
+class CatalogProductFilter(filters.FilterSet):
+    """
+    Фильтры каталога с подсчётом фасетов.
+
+    Счётчики фасета (цвет, размер) считаются с учётом всех остальных
+    фильтров, кроме собственного, - одним сгруппированным запросом на фасет.
+    """
+
+    color = CharInFilter(field_name="color_slug", lookup_expr="in")
+    size = CharInFilter(method="filter_size")
+    category = filters.CharFilter(method="filter_category")
+    price_min = filters.NumberFilter(field_name="price", lookup_expr="gte")
+    price_max = filters.NumberFilter(field_name="price", lookup_expr="lte")
+    in_stock = filters.BooleanFilter(field_name="in_stock")
+
+    class Meta:
+        model = CatalogProduct
+        fields = ["color", "size", "category", "price_min", "price_max", "in_stock"]
+
+    def filter_size(self, queryset, name, value):
+        product_ids = available_variants().filter(size__name__in=value)
+        return queryset.filter(id__in=product_ids.values("product_id"))
+
+    def filter_category(self, queryset, name, value):
+        group_ids = ProductGroupCategory.objects.filter(category__slug=value)
+        return queryset.filter(group_id__in=group_ids.values("group_id"))
+
+    def get_facets(self) -> dict:
+        return {
+            "colors": self.get_color_facet(),
+            "sizes": self.get_size_facet(),
+        }
+
+    def get_color_facet(self) -> list:
+        rows = (
+            self._queryset_without("color")
+            .values("color_slug", "color_name")
+            .annotate(count=Count("id"))
+            .order_by("color_name")
+        )
+        return [
+            {"slug": row["color_slug"], "name": row["color_name"], "count": row["count"]}
+            for row in rows
+        ]
+
+    def get_size_facet(self) -> list:
+        product_ids = self._queryset_without("size").values("id")
+        rows = (
+            available_variants()
+            .filter(product_id__in=product_ids)
+            .values("size__name", "size__position")
+            .annotate(count=Count("product_id", distinct=True))
+            .order_by("size__position", "size__name")
+        )
+        return [{"name": row["size__name"], "count": row["count"]} for row in rows]
+
+    def _queryset_without(self, param: str):
+        """Набор товаров со всеми фильтрами, кроме указанного."""
+        data = self.data.copy()
+        data.pop(param, None)
+        return type(self)(data, queryset=self.queryset, request=self.request).qs
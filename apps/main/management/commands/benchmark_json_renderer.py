@@ -0,0 +1,82 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.parsers import ORJSONParser
+from apps.common.renderers import ORJSONRenderer
+from apps.main.models import Product
+from apps.main.serializers import ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Микробенчмарк JSON-рендерера и парсера: стандартный json против orjson "
+        "на выдаче ProductListSerializer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=100,
+            help="Количество товаров в сериализуемом списке (по умолчанию 100)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Количество повторов каждого замера (по умолчанию 200)",
+        )
+
+    def handle(self, *args, **options):
+        products = ProductListSerializer.setup_eager_loading(
+            Product.objects.filter(is_active=True).order_by("id")
+        )[: options["products"]]
+        data = {
+            "count": len(products),
+            "next": None,
+            "previous": None,
+            "results": ProductListSerializer(products, many=True).data,
+        }
+        if not data["results"]:
+            raise CommandError("Нет активных товаров для бенчмарка")
+
+        stock_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        stock_body = stock_renderer.render(data)
+        if fast_renderer.render(data) != stock_body:
+            raise CommandError("Вывод ORJSONRenderer отличается от JSONRenderer")
+
+        repeat = options["repeat"]
+        self.stdout.write(
+            f"Товаров: {data['count']}, размер ответа: {len(stock_body)} байт, "
+            f"повторов: {repeat}"
+        )
+
+        render = self._compare(
+            "render",
+            lambda: stock_renderer.render(data),
+            lambda: fast_renderer.render(data),
+            repeat,
+        )
+        parse = self._compare(
+            "parse",
+            lambda: JSONParser().parse(io.BytesIO(stock_body)),
+            lambda: ORJSONParser().parse(io.BytesIO(stock_body)),
+            repeat,
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Ускорение: рендер x{render:.1f}, разбор x{parse:.1f}")
+        )
+
+    def _compare(self, name, stock, fast, repeat) -> float:
+        """Замеряет обе реализации и возвращает ускорение orjson."""
+        timings = []
+        for backend, func in (("json", stock), ("orjson", fast)):
+            seconds = min(timeit.repeat(func, number=repeat, repeat=3)) / repeat
+            timings.append(seconds)
+            self.stdout.write(f"{name} {backend:<6}: {seconds * 1_000_000:10.1f} мкс/вызов")
+        return timings[0] / timings[1]
@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.main.models import ProductMedia
+from apps.storage import StorageService
+from apps.storage.models import StoredFile
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление из хранилища медиафайлов товаров, на которые не ссылается "
+        "ни одна запись ProductMedia (включая производные изображения)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            action="append",
+            dest="prefixes",
+            help="Префикс ключей в бакете (можно несколько, по умолчанию products/)",
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=24,
+            help="Не трогать файлы моложе N часов - загрузки в процессе (по умолчанию 24)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы без реального удаления",
+        )
+
+    def handle(self, *args, **options):
+        prefixes = options["prefixes"] or ["products/"]
+        grace_hours = options["grace_hours"]
+        dry_run = options["dry_run"]
+        cutoff_time = timezone.now() - timedelta(hours=grace_hours)
+
+        referenced_urls = self._referenced_urls()
+        self.stdout.write(f"Файлов со ссылками: {len(referenced_urls)}")
+
+        service = StorageService()
+        orphans = [
+            obj
+            for prefix in prefixes
+            for obj in service.find_orphans(prefix, referenced_urls, cutoff_time)
+        ]
+
+        if not orphans:
+            self.stdout.write(self.style.SUCCESS("Неиспользуемых файлов не найдено"))
+            return
+
+        total_size = sum(obj.file_size for obj in orphans)
+        self.stdout.write(
+            self.style.WARNING(
+                f"Найдено {len(orphans)} неиспользуемых файлов "
+                f"({total_size / 1024 / 1024:.1f} МБ, старше {grace_hours}ч)"
+            )
+        )
+
+        if dry_run:
+            self.stdout.write(self.style.NOTICE("Режим dry-run: удаление не будет выполнено"))
+            for obj in orphans:
+                self.stdout.write(
+                    f"  - {obj.file_key} ({obj.file_size} байт, "
+                    f"{obj.last_modified.strftime('%Y-%m-%d %H:%M')})"
+                )
+            return
+
+        # Файлы хранилища удаляем по одному под блокировкой записи: на файл
+        # без ссылок могла снова сослаться загрузка с дедупликацией
+        stored = dict(
+            StoredFile.objects.filter(
+                url__in=[obj.url for obj in orphans]
+            ).values_list("url", "derivatives")
+        )
+        results, kept_urls = [], set()
+        for url, derivatives in stored.items():
+            result = service.delete_stored_file(url)
+            if result is None:
+                kept_urls.add(url)
+                kept_urls.update(d["url"] for d in derivatives)
+            else:
+                results.append(result)
+
+        results += service.delete_many(
+            obj.file_key
+            for obj in orphans
+            if obj.url not in stored and obj.url not in kept_urls
+        )
+        deleted = sum(result.success for result in results)
+
+        failed = len(results) - deleted
+        logger.info(f"Очистка медиа: удалено {deleted}, ошибок {failed}")
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Не удалось удалить {failed} файлов"))
+        self.stdout.write(
+            self.style.SUCCESS(f"Удалено {deleted} неиспользуемых файлов")
+        )
+
+    @staticmethod
+    def _referenced_urls() -> set:
+        """URL медиа и их производных, плюс файлы хранилища со ссылками."""
+        urls = set()
+        rows = ProductMedia.objects.values_list("url", "derivatives").iterator()
+        for url, derivatives in rows:
+            urls.add(url)
+            urls.update(d["url"] for d in derivatives)
+
+        stored = StoredFile.objects.filter(ref_count__gt=0).values_list(
+            "url", "derivatives"
+        )
+        for url, derivatives in stored.iterator():
+            urls.add(url)
+            urls.update(d["url"] for d in derivatives)
+        return urls
@@ -0,0 +1,51 @@
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.main.feeds import FEEDS, ProductFeed, write_feed
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Выгрузка товарных фидов (YML / Google Merchant) в XML и CSV с gzip-копией"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--feed",
+            choices=sorted(FEEDS),
+            action="append",
+            help="Фид для выгрузки (можно указать несколько раз, по умолчанию все)",
+        )
+        parser.add_argument(
+            "--format",
+            choices=ProductFeed.formats,
+            action="append",
+            dest="formats",
+            help="Формат файла (можно указать несколько раз, по умолчанию все)",
+        )
+        parser.add_argument(
+            "--output-dir",
+            type=Path,
+            default=settings.FEED_ROOT,
+            help="Каталог для файлов фидов (по умолчанию MEDIA_ROOT/feeds)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ProductFeed.CHUNK_SIZE,
+            help="Количество вариантов, читаемых из БД за один раз (по умолчанию 2000)",
+        )
+
+    def handle(self, *args, **options):
+        feed_names = options["feed"] or sorted(FEEDS)
+        formats = options["formats"] or ProductFeed.formats
+
+        for name in feed_names:
+            feed = FEEDS[name](chunk_size=options["chunk_size"])
+            for fmt in formats:
+                path = write_feed(feed, fmt, options["output_dir"])
+                logger.info(f"Product feed exported: {path}")
+                self.stdout.write(self.style.SUCCESS(f"Фид выгружен: {path} (+ .gz)"))
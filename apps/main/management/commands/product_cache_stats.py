@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.cache import product_detail_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Статистика попаданий в кэш карточек товаров. "
+        "Для LocMemCache показывает только счётчики текущего процесса"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счётчики после вывода",
+        )
+
+    def handle(self, *args, **options):
+        stats = product_detail_cache.stats()
+
+        self.stdout.write(f"Попаданий: {stats['hits']}")
+        self.stdout.write(f"Промахов: {stats['misses']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Доля попаданий: {stats['hit_ratio']:.2%}")
+        )
+
+        if options["reset"]:
+            product_detail_cache.reset_stats()
+            self.stdout.write(self.style.NOTICE("Счётчики обнулены"))
@@ -0,0 +1,40 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.main.snapshot import CatalogSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Публикация статического снимка каталога (категории, страницы категорий, "
+        "карточки товаров) для раздачи через nginx"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=3,
+            help="Сколько последних версий снимка хранить (по умолчанию 3)",
+        )
+        parser.add_argument(
+            "--unpublish",
+            action="store_true",
+            help="Снять снимок с публикации: каталог снова отдаётся из Django",
+        )
+
+    def handle(self, *args, **options):
+        service = CatalogSnapshotService()
+
+        if options["unpublish"]:
+            service.unpublish()
+            self.stdout.write(self.style.SUCCESS("Снимок каталога снят с публикации"))
+            return
+
+        self.stdout.write("Рендеринг снимка каталога...")
+        directory = service.publish(keep=options["keep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Снимок каталога опубликован: {directory}"))
@@ -0,0 +1,30 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.main.service import CatalogProjectionService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Полная пересборка денормализованной таблицы каталога"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CatalogProjectionService.CHUNK_SIZE,
+            help="Количество товаров, пересчитываемых за один проход (по умолчанию 500)",
+        )
+
+    def handle(self, *args, **options):
+        service = CatalogProjectionService()
+        service.CHUNK_SIZE = options["chunk_size"]
+
+        self.stdout.write("Пересборка каталога...")
+        total = service.rebuild_all()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Каталог пересобран: {total} карточек товаров")
+        )
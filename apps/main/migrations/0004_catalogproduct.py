@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_productvariant_dimension_height_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogProduct',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID товара')),
+                ('name', models.CharField(max_length=250, verbose_name='Полное название')),
+                ('slug', models.SlugField(unique=True, verbose_name='URL (латиницей)')),
+                ('group_id', models.BigIntegerField(db_index=True, verbose_name='ID группы')),
+                ('group_name', models.CharField(max_length=250, verbose_name='Название группы')),
+                ('group_slug', models.SlugField(verbose_name='URL группы')),
+                ('color_id', models.BigIntegerField(verbose_name='ID цвета')),
+                ('color_name', models.CharField(max_length=50, verbose_name='Название цвета')),
+                ('color_slug', models.SlugField(verbose_name='URL цвета')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Базовая цена')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Минимальная цена варианта')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Максимальная цена варианта')),
+                ('images', models.JSONField(default=list, verbose_name='Изображения')),
+                ('available_sizes', models.JSONField(default=list, verbose_name='Размеры в наличии')),
+                ('in_stock', models.BooleanField(default=False, verbose_name='В наличии')),
+                ('excerpt', models.CharField(blank=True, max_length=500, verbose_name='Краткое описание')),
+                ('created_at', models.DateTimeField(verbose_name='Товар создан')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Карточка каталога',
+                'verbose_name_plural': 'Карточки каталога',
+                'db_table': 'catalog_products',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-created_at'], name='catalog_pro_created_ae7028_idx'), models.Index(fields=['name'], name='catalog_pro_name_890acd_idx'), models.Index(fields=['price'], name='catalog_pro_price_680d88_idx')],
+            },
+        ),
+    ]
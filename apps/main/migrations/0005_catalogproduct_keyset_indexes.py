@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_catalogproduct'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='catalogproduct',
+            name='catalog_pro_created_ae7028_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='catalogproduct',
+            name='catalog_pro_name_890acd_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='catalogproduct',
+            name='catalog_pro_price_680d88_idx',
+        ),
+        migrations.AddIndex(
+            model_name='catalogproduct',
+            index=models.Index(fields=['created_at', 'id'], name='catalog_pro_created_55cab3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogproduct',
+            index=models.Index(fields=['name', 'id'], name='catalog_pro_name_a6294d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogproduct',
+            index=models.Index(fields=['price', 'id'], name='catalog_pro_price_2e823b_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:56
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    # GIN доступен только в PostgreSQL, на SQLite работает поиск по тексту
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS catalog_products_search_gin "
+        "ON catalog_products USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS catalog_products_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_catalogproduct_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogproduct',
+            name='search_body',
+            field=models.TextField(blank=True, help_text='Описание, состав и цвет (в нижнем регистре)', verbose_name='Поисковый текст'),
+        ),
+        migrations.AddField(
+            model_name='catalogproduct',
+            name='search_title',
+            field=models.TextField(blank=True, help_text='Название товара, группы и артикулы (в нижнем регистре)', verbose_name='Поисковый заголовок'),
+        ),
+        migrations.AddField(
+            model_name='catalogproduct',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_catalogproduct_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogproduct',
+            name='image_srcsets',
+            field=models.JSONField(default=list, verbose_name='srcset изображений (по формату, как images)'),
+        ),
+        migrations.AddField(
+            model_name='productmedia',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=list, help_text='Уменьшенные копии (WebP и JPEG), создаются при загрузке файла', verbose_name='Производные изображения'),
+        ),
+    ]
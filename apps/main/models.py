@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.forms import ValidationError
 from django.utils.text import slugify
@@ -383,6 +384,13 @@ class ProductMedia(models.Model):
     url = models.URLField(verbose_name="URL")  # S3
     position = models.PositiveIntegerField(default=0, verbose_name="Позиция")
     is_main = models.BooleanField(default=False, verbose_name="Основное")
+    # [{"name": "card", "format": "webp", "width": 480, "height": 640, "url": ...}]
+    derivatives = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Производные изображения",
+        help_text="Уменьшенные копии (WebP и JPEG), создаются при загрузке файла",
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Загружено")
 
     class Meta:
@@ -403,3 +411,92 @@ class ProductMedia(models.Model):
             self.product = self.variant.product
 
         return super().clean()
+
+    def get_srcsets(self) -> dict:
+        """srcset по форматам: {"webp": "url 160w, url 480w", "jpeg": ...}"""
+        srcsets = {}
+        for derivative in sorted(self.derivatives, key=lambda d: d["width"]):
+            srcsets.setdefault(derivative["format"], []).append(
+                f"{derivative['url']} {derivative['width']}w"
+            )
+        return {fmt: ", ".join(items) for fmt, items in srcsets.items()}
+
+    def get_derivative_url(self, name: str, fmt: str = "jpeg") -> str:
+        """URL производного изображения или оригинала, если его нет."""
+        for derivative in self.derivatives:
+            if derivative["name"] == name and derivative["format"] == fmt:
+                return derivative["url"]
+        return self.url
+
+
+class CatalogProduct(models.Model):
+    """
+    Денормализованная карточка товара для каталога (read model).
+    Одна строка на активный товар, обновляется сигналами при изменении
+    товара, его группы, цвета, вариантов и медиа.
+    """
+
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID товара")
+    name = models.CharField(max_length=250, verbose_name="Полное название")
+    slug = models.SlugField(unique=True, verbose_name="URL (латиницей)")
+    group_id = models.BigIntegerField(db_index=True, verbose_name="ID группы")
+    group_name = models.CharField(max_length=250, verbose_name="Название группы")
+    group_slug = models.SlugField(verbose_name="URL группы")
+    color_id = models.BigIntegerField(verbose_name="ID цвета")
+    color_name = models.CharField(max_length=50, verbose_name="Название цвета")
+    color_slug = models.SlugField(verbose_name="URL цвета")
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Базовая цена"
+    )
+    min_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Минимальная цена варианта",
+    )
+    max_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Максимальная цена варианта",
+    )
+    images = models.JSONField(default=list, verbose_name="Изображения")
+    image_srcsets = models.JSONField(
+        default=list, verbose_name="srcset изображений (по формату, как images)"
+    )
+    available_sizes = models.JSONField(default=list, verbose_name="Размеры в наличии")
+    in_stock = models.BooleanField(default=False, verbose_name="В наличии")
+    excerpt = models.CharField(
+        max_length=500, blank=True, verbose_name="Краткое описание"
+    )
+    search_title = models.TextField(
+        blank=True,
+        verbose_name="Поисковый заголовок",
+        help_text="Название товара, группы и артикулы (в нижнем регистре)",
+    )
+    search_body = models.TextField(
+        blank=True,
+        verbose_name="Поисковый текст",
+        help_text="Описание, состав и цвет (в нижнем регистре)",
+    )
+    # Заполняется только на PostgreSQL, GIN-индекс создаётся миграцией 0006
+    search_vector = SearchVectorField(null=True, verbose_name="Поисковый вектор")
+    created_at = models.DateTimeField(verbose_name="Товар создан")
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        db_table = "catalog_products"
+        verbose_name = "Карточка каталога"
+        verbose_name_plural = "Карточки каталога"
+        ordering = ["name"]
+        # Составные индексы с id - под keyset пагинацию с tie-breaker
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["name", "id"]),
+            models.Index(fields=["price", "id"]),
+        ]
+
+    def __str__(self):
+        return self.name
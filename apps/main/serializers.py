@@ -1,15 +1,62 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from django.utils.text import slugify
 
+from apps.common.fieldsets import SparseFieldsetSerializerMixin
+from apps.orders.models import annotate_available_stock
+
 from .models import (
+    CatalogProduct,
     Category,
     Color,
     ProductGroup,
     Product,
+    ProductMedia,
     ProductVariant,
 )
 
 
+def catalog_prefetches(prefix: str = "", media: bool = True, variants: bool = True) -> list:
+    """
+    Prefetch-объекты для карточек товаров в каталоге.
+    Медиа приходят уже отсортированными, варианты - вместе с размерами и
+    доступным остатком (available_stock: stock минус активные резервы),
+    поэтому сериализаторы работают с данными в памяти без доп. запросов.
+    """
+    prefetches = []
+    if media:
+        prefetches.append(
+            Prefetch(
+                f"{prefix}media",
+                queryset=ProductMedia.objects.order_by("-is_main", "position"),
+            )
+        )
+    if variants:
+        prefetches.append(
+            Prefetch(
+                f"{prefix}variants",
+                queryset=annotate_available_stock(
+                    ProductVariant.objects.select_related("size")
+                ),
+            )
+        )
+    return prefetches
+
+
+def get_available_variants(product) -> list:
+    """Активные варианты с ненулевым доступным остатком (из prefetch)."""
+    return [v for v in product.variants.all() if v.is_active and v.available_stock > 0]
+
+
+def get_available_size_names(product) -> list:
+    """Названия размеров в наличии в порядке справочника размеров."""
+    sizes = []
+    for variant in get_available_variants(product):
+        if variant.size.name not in sizes:
+            sizes.append(variant.size.name)
+    return sizes
+
+
 class ColorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Color
@@ -33,8 +80,11 @@ class ProductGroupBriefSerializer(serializers.ModelSerializer):
 
 
 class ProductVariantSerializer(serializers.ModelSerializer):
+    """stock - доступный остаток (queryset через annotate_available_stock)."""
+
     price = serializers.SerializerMethodField()
     size = serializers.CharField(source="size.name")
+    stock = serializers.IntegerField(source="available_stock", read_only=True)
 
     class Meta:
         model = ProductVariant
@@ -44,10 +94,85 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return obj.get_price()
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class CartVariantsRequestSerializer(serializers.Serializer):
+    """Запрос актуальных данных для вариантов в корзине."""
+
+    MAX_ITEMS = 100
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=MAX_ITEMS,
+        help_text="ID вариантов товара",
+    )
+    skus = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        default=list,
+        max_length=MAX_ITEMS,
+        help_text="Артикулы вариантов товара",
+    )
+
+    def validate(self, attrs):
+        count = len(set(attrs["ids"])) + len(set(attrs["skus"]))
+        if count == 0:
+            raise serializers.ValidationError("Передайте ids или skus")
+        if count > self.MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Максимум {self.MAX_ITEMS} вариантов за один запрос"
+            )
+        return attrs
+
+
+class CartVariantSerializer(serializers.ModelSerializer):
+    """
+    Актуальные данные варианта для корзины.
+    Цена считается так же, как при создании заказа (ProductVariant.get_price),
+    stock - доступный остаток за вычетом активных резервов заказов.
+    """
+
+    size = serializers.CharField(source="size.name")
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, source="get_price", read_only=True
+    )
+    stock = serializers.IntegerField(source="available_stock", read_only=True)
+    is_active = serializers.SerializerMethodField()
+    product = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductVariant
+        fields = ["id", "sku", "size", "price", "stock", "is_active", "product", "image"]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return annotate_available_stock(
+            queryset.select_related("product", "size").prefetch_related(
+                Prefetch(
+                    "product__media",
+                    queryset=ProductMedia.objects.order_by("-is_main", "position"),
+                )
+            )
+        )
+
+    def get_is_active(self, obj):
+        return obj.is_active and obj.product.is_active
+
+    def get_product(self, obj):
+        return {"id": obj.product.id, "name": obj.product.name, "slug": obj.product.slug}
+
+    def get_image(self, obj):
+        media = obj.product.media.all()
+        return media[0].url if media else None
+
+
+class ProductListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     group = ProductGroupBriefSerializer(read_only=True)
     color = ColorSerializer(read_only=True)
+    image = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
+    srcsets = serializers.SerializerMethodField()
     available_sizes = serializers.SerializerMethodField()
     in_stock = serializers.SerializerMethodField()
     excerpt = serializers.SerializerMethodField()
@@ -61,31 +186,113 @@ class ProductListSerializer(serializers.ModelSerializer):
             "group",
             "color",
             "price",
+            "image",
             "images",
+            "srcsets",
             "available_sizes",
             "in_stock",
             "excerpt",
         ]
+        # Главное фото для облегчённых списков: только ?fields=...,image
+        sparse_optional_fields = ["image"]
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        """
+        Подгружает связи, нужные выбранным полям (по умолчанию всем),
+        фиксированным числом запросов.
+        """
+        if fields is None:
+            fields = ProductListSerializer.select_field_names()
+        related = [
+            name
+            for name, needed in (
+                ("group", fields & {"group", "excerpt"}),
+                ("color", "color" in fields),
+            )
+            if needed
+        ]
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.prefetch_related(
+            *catalog_prefetches(
+                media=bool(fields & {"image", "images", "srcsets"}),
+                variants=bool(fields & {"available_sizes", "in_stock"}),
+            )
+        )
+
+    def get_image(self, obj):
+        media = obj.media.all()
+        return media[0].url if media else None
 
     def get_images(self, obj):
-        media_qs = obj.media.all().order_by("-is_main", "position")
-        return [m.url for m in media_qs]
+        return [m.url for m in obj.media.all()]
+
+    def get_srcsets(self, obj):
+        """srcset по форматам для каждого элемента images (пустой - без копий)."""
+        return [m.get_srcsets() for m in obj.media.all()]
 
     def get_available_sizes(self, obj):
-        return list(
-            obj.variants.filter(is_active=True, stock__gt=0)
-            .select_related("size")
-            .values_list("size__name", flat=True)
-            .distinct()
-        )
+        return get_available_size_names(obj)
 
     def get_in_stock(self, obj):
-        return obj.variants.filter(is_active=True, stock__gt=0).exists()
+        return bool(get_available_variants(obj))
 
     def get_excerpt(self, obj):
         return obj.group.excerpt if obj.group else ""
 
 
+class CatalogProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Карточка товара из денормализованной таблицы каталога.
+    Формат ответа совпадает с ProductListSerializer.
+    """
+
+    group = serializers.SerializerMethodField()
+    color = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    srcsets = serializers.JSONField(source="image_srcsets", read_only=True)
+
+    # Колонки проекции, которые нужны только соответствующим полям ответа
+    FIELD_COLUMNS = {
+        "group": ["group_name", "group_slug"],
+        "color": ["color_name", "color_slug"],
+        "images": ["images"],
+        "srcsets": ["image_srcsets"],
+        "available_sizes": ["available_sizes"],
+        "excerpt": ["excerpt"],
+    }
+
+    class Meta:
+        model = CatalogProduct
+        fields = ProductListSerializer.Meta.fields
+        sparse_optional_fields = ProductListSerializer.Meta.sparse_optional_fields
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        """
+        Не читает поисковые колонки и колонки невыбранных полей.
+        Колонки сортировки и фильтров (id, name, price, created_at, group_id,
+        color_id, in_stock) загружаются всегда.
+        """
+        if fields is None:
+            fields = CatalogProductSerializer.select_field_names()
+        deferred = ["search_title", "search_body", "search_vector"]
+        for name, columns in CatalogProductSerializer.FIELD_COLUMNS.items():
+            if name not in fields and not (name == "images" and "image" in fields):
+                deferred += columns
+        return queryset.defer(*deferred)
+
+    def get_group(self, obj):
+        return {"id": obj.group_id, "name": obj.group_name, "slug": obj.group_slug}
+
+    def get_color(self, obj):
+        return {"id": obj.color_id, "name": obj.color_name, "slug": obj.color_slug}
+
+    def get_image(self, obj):
+        return obj.images[0] if obj.images else None
+
+
 class RelatedColorSerializer(serializers.ModelSerializer):
     color = ColorSerializer(read_only=True)
     images = serializers.SerializerMethodField()
@@ -96,14 +303,13 @@ class RelatedColorSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug", "color", "price", "images", "in_stock"]
 
     def get_images(self, obj):
-        media_qs = obj.media.all().order_by("-is_main", "position")
-        return [m.url for m in media_qs]
+        return [m.url for m in obj.media.all()]
 
     def get_in_stock(self, obj):
-        return obj.variants.filter(is_active=True, stock__gt=0).exists()
+        return bool(get_available_variants(obj))
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     group = serializers.SerializerMethodField()
     color = ColorSerializer(read_only=True)
     media = serializers.SerializerMethodField()
@@ -126,6 +332,37 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             "categories",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        """
+        Подгружает связи только для выбранных полей. Соседние цвета
+        и категории читаются отдельными запросами в своих методах.
+        """
+        if fields is None:
+            fields = ProductDetailSerializer.select_field_names()
+        related = [
+            name
+            for name, needed in (
+                ("group", fields & {"group", "related_colors", "categories"}),
+                ("color", "color" in fields),
+            )
+            if needed
+        ]
+        if related:
+            queryset = queryset.select_related(*related)
+        if "media" in fields:
+            queryset = queryset.prefetch_related("media")
+        if "variants" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "variants",
+                    queryset=annotate_available_stock(
+                        ProductVariant.objects.select_related("size")
+                    ),
+                )
+            )
+        return queryset
+
     def get_group(self, obj):
         if not obj.group:
             return None
@@ -142,9 +379,16 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         }
 
     def get_media(self, obj):
-        media_qs = obj.media.all().order_by("position")
+        # сортировка в памяти, чтобы использовать prefetch
+        media = sorted(obj.media.all(), key=lambda m: m.position)
         return [
-            {"url": m.url, "type": m.type, "position": m.position} for m in media_qs
+            {
+                "url": m.url,
+                "type": m.type,
+                "position": m.position,
+                "srcset": m.get_srcsets(),
+            }
+            for m in media
         ]
 
     def get_related_colors(self, obj):
@@ -154,7 +398,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             obj.group.products.exclude(id=obj.id)
             .filter(is_active=True)
             .select_related("color")
-            .prefetch_related("media", "variants")
+            .prefetch_related(*catalog_prefetches())
         )
         return RelatedColorSerializer(related_products, many=True).data
 
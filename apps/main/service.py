@@ -0,0 +1,228 @@
+import logging
+import threading
+from typing import Iterable
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import CatalogProduct, Product
+from .serializers import (
+    ProductListSerializer,
+    get_available_size_names,
+    get_available_variants,
+)
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+SEARCH_CONFIG = "russian"
+
+
+class CatalogProjectionService:
+    """
+    Сервис для поддержки денормализованной таблицы каталога (CatalogProduct).
+    """
+
+    CHUNK_SIZE = 500
+
+    UPDATE_FIELDS = [
+        "name",
+        "slug",
+        "group_id",
+        "group_name",
+        "group_slug",
+        "color_id",
+        "color_name",
+        "color_slug",
+        "price",
+        "min_price",
+        "max_price",
+        "images",
+        "image_srcsets",
+        "available_sizes",
+        "in_stock",
+        "excerpt",
+        "search_title",
+        "search_body",
+        "created_at",
+        "refreshed_at",
+    ]
+
+    def refresh_products(self, product_ids: Iterable[int]) -> int:
+        """
+        Пересчитывает карточки указанных товаров.
+        Неактивные и удалённые товары убираются из каталога.
+
+        Returns:
+            Количество записанных карточек
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+
+        products = ProductListSerializer.setup_eager_loading(
+            Product.objects.filter(id__in=product_ids, is_active=True)
+        )
+        entries = [self._build_entry(product) for product in products]
+        active_ids = {entry.id for entry in entries}
+
+        with transaction.atomic():
+            CatalogProduct.objects.filter(
+                id__in=product_ids - active_ids
+            ).delete()
+            self._upsert(entries)
+            self._update_search_vectors(active_ids)
+
+        logger.debug(
+            f"Catalog projection refreshed: {len(entries)} upserted, "
+            f"{len(product_ids - active_ids)} removed"
+        )
+        return len(entries)
+
+    def rebuild_all(self) -> int:
+        """
+        Полная пересборка таблицы каталога.
+
+        Returns:
+            Количество карточек в каталоге после пересборки
+        """
+        active_ids = list(
+            Product.objects.filter(is_active=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        total = 0
+        for start in range(0, len(active_ids), self.CHUNK_SIZE):
+            total += self.refresh_products(active_ids[start : start + self.CHUNK_SIZE])
+
+        CatalogProduct.objects.exclude(id__in=active_ids).delete()
+
+        logger.info(f"Catalog projection rebuilt: {total} products")
+        return total
+
+    def _build_entry(self, product: Product) -> CatalogProduct:
+        variants = product.variants.all()
+        variant_prices = [variant.get_price() for variant in variants]
+        group = product.group
+
+        return CatalogProduct(
+            id=product.id,
+            name=product.name,
+            slug=product.slug,
+            group_id=product.group_id,
+            group_name=group.name,
+            group_slug=group.slug,
+            color_id=product.color_id,
+            color_name=product.color.name,
+            color_slug=product.color.slug,
+            price=product.price,
+            min_price=min(variant_prices, default=None),
+            max_price=max(variant_prices, default=None),
+            images=[media.url for media in product.media.all()],
+            image_srcsets=[media.get_srcsets() for media in product.media.all()],
+            available_sizes=get_available_size_names(product),
+            in_stock=bool(get_available_variants(product)),
+            excerpt=group.excerpt,
+            search_title=self._join_search_text(
+                product.name, group.name, *(variant.sku for variant in variants)
+            ),
+            search_body=self._join_search_text(
+                group.excerpt, group.description, group.materials, product.color.name
+            ),
+            created_at=product.created_at,
+        )
+
+    @staticmethod
+    def _join_search_text(*parts: str) -> str:
+        return " ".join(part for part in parts if part).lower()
+
+    def _update_search_vectors(self, product_ids: set) -> None:
+        """Пересчитывает tsvector (только PostgreSQL) одним UPDATE."""
+        if not product_ids or connection.vendor != "postgresql":
+            return
+        CatalogProduct.objects.filter(id__in=product_ids).update(
+            search_vector=(
+                SearchVector("search_title", weight="A", config=SEARCH_CONFIG)
+                + SearchVector("search_body", weight="B", config=SEARCH_CONFIG)
+            )
+        )
+
+    def _upsert(self, entries: list) -> None:
+        if not entries:
+            return
+        CatalogProduct.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=self.UPDATE_FIELDS,
+        )
+
+
+class CatalogSearchService:
+    """
+    Полнотекстовый поиск по каталогу.
+    PostgreSQL: tsvector (russian) с GIN-индексом и ранжированием ts_rank.
+    Остальные БД (SQLite для разработки): поиск подстрок по тем же полям.
+    """
+
+    def search(self, query: str):
+        query = " ".join(query.split())
+        if not query:
+            return CatalogProduct.objects.none()
+
+        if connection.vendor == "postgresql":
+            return self._search_postgres(query)
+        return self._search_fallback(query)
+
+    def _search_postgres(self, query: str):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            CatalogProduct.objects.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "id")
+        )
+
+    def _search_fallback(self, query: str):
+        terms = query.lower().split()
+        condition = Q()
+        rank = Value(0)
+        for term in terms:
+            condition &= Q(search_title__contains=term) | Q(search_body__contains=term)
+            rank = rank + Case(
+                When(search_title__contains=term, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        return (
+            CatalogProduct.objects.filter(condition)
+            .annotate(rank=rank)
+            .order_by("-rank", "id")
+        )
+
+
+def schedule_catalog_refresh(product_ids: Iterable[int]) -> None:
+    """
+    Откладывает пересчёт карточек до коммита текущей транзакции.
+    Идентификаторы копятся в рамках потока, поэтому несколько изменений
+    одного товара в транзакции пересчитываются одним проходом.
+    """
+    pending = getattr(_pending, "product_ids", None)
+    if pending is None:
+        pending = _pending.product_ids = set()
+    pending.update(product_ids)
+    transaction.on_commit(_flush_catalog_refresh)
+
+
+def _flush_catalog_refresh() -> None:
+    product_ids = getattr(_pending, "product_ids", None)
+    if not product_ids:
+        return
+    _pending.product_ids = set()
+
+    try:
+        CatalogProjectionService().refresh_products(product_ids)
+    except Exception as e:
+        logger.error(f"Failed to refresh catalog projection: {e}", exc_info=True)
@@ -0,0 +1,235 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.storage.models import StoredFile
+
+from .cache import schedule_detail_invalidation
+from .models import (
+    Category,
+    Color,
+    Product,
+    ProductGroup,
+    ProductGroupCategory,
+    ProductMedia,
+    ProductVariant,
+    Size,
+)
+from .service import schedule_catalog_refresh
+from .snapshot import schedule_snapshot_refresh
+
+
+def schedule_products_refresh(product_ids) -> None:
+    """
+    То же, что post_save варианта, для массовых UPDATE в обход сигналов:
+    проекция каталога, кэш карточек с версией каталога и снимок
+    пересчитываются после коммита транзакции.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    schedule_stock_refresh(product_ids)
+    schedule_snapshot_refresh(product_ids=product_ids)
+
+
+def schedule_stock_refresh(product_ids) -> None:
+    """
+    Изменился только доступный остаток (резервы, списание, отмена заказа):
+    проекция каталога и кэш карточек с версией каталога. Снимок на пути
+    оформления заказа не перерисовывается - остатки в нём обновляет
+    периодический publish_catalog_snapshot.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    schedule_catalog_refresh(product_ids)
+    schedule_detail_invalidation(product_ids=product_ids)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_catalog_on_product_change(sender, instance, **kwargs):
+    schedule_catalog_refresh([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def refresh_catalog_on_product_part_change(sender, instance, **kwargs):
+    schedule_catalog_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=ProductGroup)
+def refresh_catalog_on_group_change(sender, instance, **kwargs):
+    schedule_catalog_refresh(instance.products.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Color)
+def refresh_catalog_on_color_change(sender, instance, **kwargs):
+    schedule_catalog_refresh(instance.products.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Size)
+def refresh_catalog_on_size_change(sender, instance, **kwargs):
+    schedule_catalog_refresh(instance.variants.values_list("product_id", flat=True))
+
+
+# Кэш карточек товара (ProductDetailView)
+
+
+@receiver(pre_save, sender=Product)
+def invalidate_detail_on_product_move(sender, instance, **kwargs):
+    """Сбрасывает старый slug и старую группу, если товар их сменил."""
+    if not instance.pk:
+        return
+    previous = (
+        Product.objects.filter(pk=instance.pk).values("slug", "group_id").first()
+    )
+    if previous and (
+        previous["slug"] != instance.slug or previous["group_id"] != instance.group_id
+    ):
+        schedule_detail_invalidation(
+            group_ids=[previous["group_id"]], slugs=[previous["slug"]]
+        )
+        schedule_snapshot_refresh(
+            group_ids=[previous["group_id"]], slugs=[previous["slug"]]
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_detail_on_product_change(sender, instance, **kwargs):
+    schedule_detail_invalidation(group_ids=[instance.group_id], slugs=[instance.slug])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def invalidate_detail_on_product_part_change(sender, instance, **kwargs):
+    schedule_detail_invalidation(product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=ProductGroup)
+@receiver(post_delete, sender=ProductGroup)
+@receiver(post_save, sender=ProductGroupCategory)
+@receiver(post_delete, sender=ProductGroupCategory)
+def invalidate_detail_on_group_change(sender, instance, **kwargs):
+    group_id = instance.pk if sender is ProductGroup else instance.group_id
+    schedule_detail_invalidation(group_ids=[group_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_detail_on_category_change(sender, instance, **kwargs):
+    schedule_detail_invalidation(
+        group_ids=instance.category_groups.values_list("group_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Color)
+def invalidate_detail_on_color_change(sender, instance, **kwargs):
+    schedule_detail_invalidation(
+        product_ids=instance.products.values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Size)
+def invalidate_detail_on_size_change(sender, instance, **kwargs):
+    schedule_detail_invalidation(
+        product_ids=instance.variants.values_list("product_id", flat=True)
+    )
+
+
+# Статический снимок каталога (publish_catalog_snapshot)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_snapshot_on_product_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(
+        product_ids=[instance.pk], group_ids=[instance.group_id], slugs=[instance.slug]
+    )
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def refresh_snapshot_on_product_part_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=ProductGroup)
+@receiver(post_delete, sender=ProductGroup)
+def refresh_snapshot_on_group_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(group_ids=[instance.pk])
+
+
+@receiver(post_save, sender=ProductGroupCategory)
+@receiver(post_delete, sender=ProductGroupCategory)
+def refresh_snapshot_on_group_category_change(sender, instance, **kwargs):
+    # Страница категории, из которой группу убрали, тоже устарела
+    schedule_snapshot_refresh(
+        group_ids=[instance.group_id],
+        category_slugs=Category.objects.filter(pk=instance.category_id).values_list(
+            "slug", flat=True
+        ),
+    )
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_slug(sender, instance, **kwargs):
+    instance._snapshot_slug = (
+        Category.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_snapshot_on_category_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(
+        group_ids=instance.category_groups.values_list("group_id", flat=True),
+        category_slugs=[instance.slug, getattr(instance, "_snapshot_slug", None)],
+    )
+
+
+@receiver(post_save, sender=Color)
+def refresh_snapshot_on_color_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(product_ids=instance.products.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Size)
+def refresh_snapshot_on_size_change(sender, instance, **kwargs):
+    schedule_snapshot_refresh(
+        product_ids=instance.variants.values_list("product_id", flat=True)
+    )
+
+
+# Счётчики ссылок на файлы хранилища (StorageService.cleanup_unused)
+
+
+@receiver(pre_save, sender=ProductMedia)
+def remember_media_url(sender, instance, **kwargs):
+    instance._stored_url = (
+        ProductMedia.objects.filter(pk=instance.pk).values_list("url", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=ProductMedia)
+def count_media_reference(sender, instance, created, **kwargs):
+    old_url = getattr(instance, "_stored_url", None)
+    if not created and old_url == instance.url:
+        return
+    if old_url:
+        StoredFile.remove_reference(old_url)
+    StoredFile.add_reference(instance.url)
+
+
+@receiver(post_delete, sender=ProductMedia)
+def release_media_reference(sender, instance, **kwargs):
+    StoredFile.remove_reference(instance.url)
@@ -0,0 +1,288 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from .models import Category, Product, ProductGroupCategory
+from .serializers import ProductDetailSerializer
+from .service import _flush_catalog_refresh
+from .views import CategoryListView, CategoryProductListView
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+
+class CatalogSnapshotService:
+    """
+    Статический снимок каталога для раздачи nginx без обращения к gunicorn.
+
+    Структура каталога снимка (пути повторяют API):
+        versions/<версия>/categories/page-<n>.json         - список категорий
+        versions/<версия>/categories/<slug>/page-<n>.json  - товары категории
+        versions/<версия>/products/<slug>.json             - карточка товара
+        current -> versions/<версия>
+
+    Рядом с каждым файлом лежит .gz-копия для gzip_static.
+    """
+
+    DETAIL_CHUNK_SIZE = 200
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or settings.CATALOG_SNAPSHOT_ROOT)
+        self.current = self.root / "current"
+        self.renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        self.factory = RequestFactory()
+
+    def publish(self, keep: int = 3) -> Path:
+        """
+        Рендерит полный снимок в новую версию и атомарно переключает current.
+
+        Returns:
+            Путь к директории опубликованной версии
+        """
+        version = timezone.now().strftime("%Y%m%dT%H%M%S%f")
+        directory = self.root / "versions" / version
+        directory.mkdir(parents=True)
+
+        self.render_category_list(directory)
+        for slug in Category.objects.filter(is_active=True).values_list(
+            "slug", flat=True
+        ):
+            self.render_category_products(directory, slug)
+        self.render_product_details(
+            directory, Product.objects.filter(is_active=True).values_list("slug", flat=True)
+        )
+
+        self._switch_current(directory)
+        self._remove_old_versions(keep)
+
+        logger.info(f"Catalog snapshot published: {directory}")
+        return directory
+
+    def unpublish(self) -> None:
+        """Убирает current: nginx снова отдаёт каталог из Django."""
+        self.current.unlink(missing_ok=True)
+
+    def refresh(
+        self,
+        product_ids: Iterable[int] = (),
+        group_ids: Iterable[int] = (),
+        slugs: Iterable[str] = (),
+        category_slugs: Iterable[str] = (),
+    ) -> None:
+        """
+        Перерисовывает в текущей версии только затронутые файлы: карточки
+        товаров затронутых групп (в карточке есть соседние цвета) и все
+        страницы категорий этих групп. Изменённые категории (category_slugs)
+        перерисовываются вместе со списком категорий, а страницы
+        неактивных и удалённых категорий убираются.
+        """
+        if not self.current.exists():
+            return
+        directory = self.current.resolve()
+
+        product_ids = set(product_ids)
+        group_ids = set(group_ids) | set(
+            Product.objects.filter(id__in=product_ids).values_list("group_id", flat=True)
+        )
+
+        products = Product.objects.filter(group_id__in=group_ids)
+        active_slugs = set(products.filter(is_active=True).values_list("slug", flat=True))
+        stale_slugs = (
+            set(slugs)
+            | set(
+                Product.objects.filter(id__in=product_ids, is_active=False).values_list(
+                    "slug", flat=True
+                )
+            )
+        ) - active_slugs
+
+        self.render_product_details(directory, active_slugs)
+        for slug in stale_slugs:
+            self._remove(directory / "products" / f"{slug}.json")
+
+        changed_categories = {slug for slug in category_slugs if slug}
+        category_slugs = ProductGroupCategory.objects.filter(
+            group_id__in=group_ids, category__is_active=True
+        ).values_list("category__slug", flat=True)
+        for slug in set(category_slugs) - changed_categories:
+            self.render_category_products(directory, slug)
+
+        if changed_categories:
+            self.render_category_list(directory)
+            active_categories = set(
+                Category.objects.filter(
+                    slug__in=changed_categories, is_active=True
+                ).values_list("slug", flat=True)
+            )
+            for slug in changed_categories:
+                if slug in active_categories:
+                    self.render_category_products(directory, slug)
+                else:
+                    shutil.rmtree(directory / "categories" / slug, ignore_errors=True)
+
+        logger.debug(
+            f"Catalog snapshot refreshed: {len(active_slugs)} products, "
+            f"{len(stale_slugs)} removed"
+        )
+
+    def render_category_list(self, directory: Path) -> None:
+        self._render_pages(
+            CategoryListView.as_view(),
+            reverse("category-list"),
+            directory / "categories",
+        )
+
+    def render_category_products(self, directory: Path, slug: str) -> None:
+        self._render_pages(
+            CategoryProductListView.as_view(),
+            reverse("category-product-list", kwargs={"slug": slug}),
+            directory / "categories" / slug,
+            slug=slug,
+        )
+
+    def render_product_details(self, directory: Path, slugs: Iterable[str]) -> None:
+        slugs = sorted(set(slugs))
+        for start in range(0, len(slugs), self.DETAIL_CHUNK_SIZE):
+            chunk = slugs[start : start + self.DETAIL_CHUNK_SIZE]
+            products = ProductDetailSerializer.setup_eager_loading(
+                Product.objects.filter(is_active=True, slug__in=chunk)
+            )
+            for product in products:
+                data = ProductDetailSerializer(product).data
+                self._write(
+                    directory / "products" / f"{product.slug}.json",
+                    self.renderer.render(data),
+                )
+
+    def _render_pages(self, view, path: str, target: Path, **kwargs) -> None:
+        """Рендерит все страницы списка и удаляет страницы, ставшие лишними."""
+        page = 1
+        while True:
+            response = view(self._request(path, page), **kwargs)
+            response.render()
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Snapshot render failed: {path}?page={page} -> {response.status_code}"
+                )
+            self._write(target / f"page-{page}.json", response.content)
+            if not response.data.get("next"):
+                break
+            page += 1
+
+        for stale in target.glob("page-*.json"):
+            number = stale.name[len("page-") : -len(".json")]
+            if number.isdigit() and int(number) > page:
+                self._remove(stale)
+
+    def _request(self, path: str, page: int):
+        base_url = urlsplit(settings.CATALOG_SNAPSHOT_BASE_URL)
+        data = {"page": page} if page > 1 else {}
+        return self.factory.get(
+            path,
+            data,
+            secure=base_url.scheme == "https",
+            HTTP_HOST=base_url.netloc,
+            HTTP_ACCEPT="application/json",
+        )
+
+    @staticmethod
+    def _write(path: Path, content: bytes) -> None:
+        """Пишет файл и его .gz-копию атомарно (через временный файл)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for target, payload in (
+            (path.with_name(f"{path.name}.gz"), gzip.compress(content, mtime=0)),
+            (path, content),
+        ):
+            # Уникальный временный файл: страницу может перерисовывать
+            # несколько воркеров одновременно
+            fd, tmp_path = tempfile.mkstemp(
+                dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    tmp_file.write(payload)
+                # mkstemp создаёт файл 0600, а читать его будет nginx
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, target)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        path.unlink(missing_ok=True)
+        path.with_name(f"{path.name}.gz").unlink(missing_ok=True)
+
+    def _switch_current(self, directory: Path) -> None:
+        tmp_link = self.root / f".current.{uuid.uuid4().hex}.tmp"
+        tmp_link.symlink_to(directory.relative_to(self.root))
+        os.replace(tmp_link, self.current)
+
+    def _remove_old_versions(self, keep: int) -> None:
+        versions = sorted((self.root / "versions").iterdir(), reverse=True)
+        current = self.current.resolve()
+        for directory in versions[max(keep, 1) :]:
+            if directory.resolve() != current:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+def schedule_snapshot_refresh(
+    product_ids: Iterable[int] = (),
+    group_ids: Iterable[int] = (),
+    slugs: Iterable[str] = (),
+    category_slugs: Iterable[str] = (),
+) -> None:
+    """
+    Откладывает перерисовку снимка каталога до коммита транзакции.
+    Ничего не делает, если CATALOG_SNAPSHOT_AUTO_REFRESH выключен.
+    """
+    if not settings.CATALOG_SNAPSHOT_AUTO_REFRESH:
+        return
+    if getattr(_pending, "product_ids", None) is None:
+        _reset_pending()
+    _pending.product_ids.update(product_ids)
+    _pending.group_ids.update(group_ids)
+    _pending.slugs.update(slugs)
+    _pending.category_slugs.update(category_slugs)
+    transaction.on_commit(_flush_snapshot_refresh)
+
+
+def _reset_pending() -> None:
+    _pending.product_ids, _pending.group_ids = set(), set()
+    _pending.slugs, _pending.category_slugs = set(), set()
+
+
+def _flush_snapshot_refresh() -> None:
+    product_ids = getattr(_pending, "product_ids", None)
+    if product_ids is None:
+        return
+    group_ids, slugs = _pending.group_ids, _pending.slugs
+    category_slugs = _pending.category_slugs
+    if not product_ids and not group_ids and not slugs and not category_slugs:
+        return
+    _reset_pending()
+
+    # Списки рендерятся из CatalogProduct: проекция должна быть пересчитана раньше
+    _flush_catalog_refresh()
+
+    try:
+        CatalogSnapshotService().refresh(
+            product_ids, group_ids, slugs, category_slugs
+        )
+    except Exception as e:
+        logger.error(f"Failed to refresh catalog snapshot: {e}", exc_info=True)
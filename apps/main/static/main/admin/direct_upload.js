@@ -0,0 +1,115 @@
+/*
+ * Прямая загрузка медиа из админки в Object Storage (presigned POST).
+ *
+ * При выборе файла запрашивает у бэкенда подписанную форму, отправляет файл
+ * прямо в бакет и кладёт полученный ключ в скрытое поле uploaded_key, а
+ * само поле с файлом очищает - на сервер уходит только ключ. Если подпись
+ * или загрузка не удались, файл остаётся в поле и уходит обычным способом.
+ */
+(function () {
+    "use strict";
+
+    var pending = 0;
+
+    function csrfToken(form) {
+        var input = form.querySelector("input[name=csrfmiddlewaretoken]");
+        return input ? input.value : "";
+    }
+
+    function keyInput(fileInput) {
+        var name = fileInput.name.replace(/file_upload$/, "uploaded_key");
+        return fileInput.form.querySelector('input[name="' + name + '"]');
+    }
+
+    function productId(fileInput) {
+        var match = window.location.pathname.match(/\/product\/(\d+)\/change\//);
+        if (match) {
+            return match[1];
+        }
+        var select = fileInput.form.querySelector("select[name=product]");
+        return select ? select.value : "";
+    }
+
+    function setStatus(fileInput, text) {
+        var status = fileInput.parentNode.querySelector(".direct-upload-status");
+        if (!status) {
+            status = document.createElement("div");
+            status.className = "direct-upload-status help";
+            fileInput.parentNode.appendChild(status);
+        }
+        status.textContent = text;
+    }
+
+    function upload(fileInput) {
+        var file = fileInput.files[0];
+        var target = keyInput(fileInput);
+        if (!file || !target) {
+            return;
+        }
+
+        var request = new FormData();
+        request.append("filename", file.name);
+        request.append("size", file.size);
+        request.append("product", productId(fileInput));
+
+        pending += 1;
+        setStatus(fileInput, "Загрузка…");
+
+        fetch(fileInput.dataset.directUploadUrl, {
+            method: "POST",
+            body: request,
+            credentials: "same-origin",
+            headers: {"X-CSRFToken": csrfToken(fileInput.form)}
+        })
+            .then(function (response) {
+                return response.json().then(function (data) {
+                    if (!response.ok) {
+                        throw new Error(data.error || response.statusText);
+                    }
+                    return data;
+                });
+            })
+            .then(function (presigned) {
+                var body = new FormData();
+                Object.keys(presigned.fields).forEach(function (name) {
+                    body.append(name, presigned.fields[name]);
+                });
+                body.append("file", file);
+                return fetch(presigned.url, {method: "POST", body: body}).then(
+                    function (response) {
+                        if (!response.ok) {
+                            throw new Error("хранилище ответило " + response.status);
+                        }
+                        target.value = presigned.file_key;
+                        fileInput.value = "";
+                        setStatus(fileInput, "Загружено: " + file.name);
+                    }
+                );
+            })
+            .catch(function (error) {
+                target.value = "";
+                setStatus(
+                    fileInput,
+                    "Прямая загрузка не удалась (" + error.message +
+                    "), файл будет отправлен вместе с формой"
+                );
+            })
+            .then(function () {
+                pending -= 1;
+            });
+    }
+
+    document.addEventListener("change", function (event) {
+        var input = event.target;
+        if (input.matches && input.matches("input[type=file][data-direct-upload-url]")) {
+            upload(input);
+        }
+    });
+
+    document.addEventListener("submit", function (event) {
+        if (pending > 0) {
+            event.preventDefault();
+            window.alert("Дождитесь окончания загрузки файлов");
+        }
+    }, true);
+})();
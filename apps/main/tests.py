@@ -1,3 +1,794 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import partial
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import (
+    CatalogProduct,
+    Category,
+    Color,
+    Product,
+    ProductGroup,
+    ProductGroupCategory,
+    ProductMedia,
+    ProductVariant,
+    Size,
+)
+from apps.common.metrics import collect_request_metrics, track_outbound
+from apps.common.middleware import QueryBudgetExceeded
+from apps.common.pagination import KeysetPagination
+from apps.common.parsers import ORJSONParser
+from apps.common.renderers import ORJSONRenderer
+
+from .admin.variant import bulk_update_stock
+from .cache import product_detail_cache
+from .feeds import ProductFeed
+from .serializers import ProductListSerializer
+from .service import CatalogProjectionService
+from .snapshot import CatalogSnapshotService
+from .views import ProductDetailView
+
+
+def create_catalog(products_count: int) -> Category:
+    """Создаёт каталог из N товаров с размерами и медиа в одной категории."""
+    category = Category.objects.create(name="Hoodies", slug="hoodies", is_active=True)
+    sizes = [
+        Size.objects.create(name=name, position=position)
+        for position, name in enumerate(["S", "M", "L"])
+    ]
+
+    for i in range(products_count):
+        group = ProductGroup.objects.create(
+            name=f"Group {i}", slug=f"group-{i}", excerpt="excerpt", is_active=True
+        )
+        ProductGroupCategory.objects.create(group=group, category=category)
+        color = Color.objects.create(name=f"Color {i}", slug=f"color-{i}")
+        product = Product.objects.create(
+            group=group,
+            color=color,
+            name=f"Product {i}",
+            slug=f"product-{i}",
+            price=Decimal("1000.00"),
+            is_active=True,
+        )
+        for size in sizes:
+            ProductVariant.objects.create(
+                product=product, size=size, stock=0 if size.name == "L" else 5
+            )
+        for position in range(2):
+            ProductMedia.objects.create(
+                product=product,
+                type="image",
+                url=f"https://cdn.example.com/{i}/{position}.jpg",
+                position=position,
+                is_main=position == 1,
+            )
+
+    return category
+
+
+class ProductListQueryCountTests(TestCase):
+    """Количество запросов списка товаров не зависит от размера страницы."""
+
+    # состояние для ETag + COUNT(*) + карточки каталога + фасеты цвета и размера
+    EXPECTED_QUERIES = 5
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_catalog(self, products_count: int) -> Category:
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_catalog(products_count)
+
+    def assert_constant_queries(self, url):
+        for page_size in (1, 20, 100):
+            with self.subTest(page_size=page_size):
+                with mock.patch.object(PageNumberPagination, "page_size", page_size):
+                    with self.assertNumQueries(self.EXPECTED_QUERIES):
+                        response = self.client.get(url)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_product_list(self):
+        self.create_catalog(100)
+        self.assert_constant_queries(reverse("product-list"))
+
+    def test_category_product_list(self):
+        category = self.create_catalog(100)
+        self.assert_constant_queries(
+            reverse("category-product-list", kwargs={"slug": category.slug})
+        )
+
+    def test_item_payload(self):
+        self.create_catalog(1)
+        response = self.client.get(reverse("product-list"))
+
+        item = response.data["results"][0]
+        self.assertEqual(
+            item["images"],
+            ["https://cdn.example.com/0/1.jpg", "https://cdn.example.com/0/0.jpg"],
+        )
+        self.assertEqual(item["available_sizes"], ["S", "M"])
+        self.assertTrue(item["in_stock"])
+        self.assertEqual(item["excerpt"], "excerpt")
+
+
+class ProductListSerializerQueryCountTests(TestCase):
+    """Сериализатор карточек не делает запросов на каждую строку."""
+
+    # товары + медиа + варианты с размерами
+    EXPECTED_QUERIES = 3
+
+    def test_constant_queries(self):
+        create_catalog(100)
+        for limit in (1, 20, 100):
+            with self.subTest(limit=limit):
+                queryset = ProductListSerializer.setup_eager_loading(
+                    Product.objects.order_by("id")[:limit]
+                )
+                with self.assertNumQueries(self.EXPECTED_QUERIES):
+                    data = ProductListSerializer(queryset, many=True).data
+                self.assertEqual(len(data), limit)
+
+
+class CatalogProjectionTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(2)
+        self.product = Product.objects.get(slug="product-0")
+
+    def test_rebuild_all(self):
+        CatalogProduct.objects.all().delete()
+        self.assertEqual(CatalogProjectionService().rebuild_all(), 2)
+
+        entry = CatalogProduct.objects.get(pk=self.product.pk)
+        self.assertEqual(entry.group_name, "Group 0")
+        self.assertEqual(entry.available_sizes, ["S", "M"])
+        self.assertEqual(entry.min_price, Decimal("1000.00"))
+
+    def test_variant_change_refreshes_entry(self):
+        variant = self.product.variants.get(size__name="L")
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.stock = 3
+            variant.price = Decimal("1500.00")
+            variant.save()
+
+        entry = CatalogProduct.objects.get(pk=self.product.pk)
+        self.assertEqual(entry.available_sizes, ["S", "M", "L"])
+        self.assertEqual(entry.max_price, Decimal("1500.00"))
+
+    def test_group_change_refreshes_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.group.excerpt = "new excerpt"
+            self.product.group.save()
+
+        entry = CatalogProduct.objects.get(pk=self.product.pk)
+        self.assertEqual(entry.excerpt, "new excerpt")
+
+    def test_deactivated_product_is_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.is_active = False
+            self.product.save()
+
+        self.assertFalse(CatalogProduct.objects.filter(pk=self.product.pk).exists())
+        self.assertEqual(CatalogProduct.objects.count(), 1)
+
+
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(1)
+            self.product = Product.objects.get(slug="product-0")
+            self.sibling = Product.objects.create(
+                group=self.product.group,
+                color=Color.objects.create(name="Sibling", slug="sibling"),
+                name="Sibling",
+                slug="sibling",
+                price=Decimal("900.00"),
+                is_active=True,
+            )
+        self.url = reverse("product-detail", kwargs={"slug": self.product.slug})
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+        # только агрегат состояния для ETag
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(product_detail_cache.stats()["hits"], 1)
+        self.assertEqual(product_detail_cache.stats()["misses"], 1)
+
+    def test_variant_stock_change_invalidates(self):
+        self.client.get(self.url)
+        variant = self.product.variants.get(size__name="S")
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.stock = 0
+            variant.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["variants"][0]["stock"], 0)
+
+    def test_bulk_stock_action_invalidates(self):
+        etag = self.client.get(self.url)["ETag"]
+        request = RequestFactory().post("/", {"apply": "1", "new_stock": "0"})
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_stock(mock.Mock(), request, self.product.variants.all())
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertFalse(CatalogProduct.objects.get(pk=self.product.pk).in_stock)
+
+    def test_invalidation_during_miss_discards_stale_payload(self):
+        get_object = ProductDetailView.get_object
+
+        def get_object_then_invalidate(view):
+            # инвалидация приходит, пока карточка собирается из старых данных
+            product = get_object(view)
+            product_detail_cache.invalidate_slugs([self.product.slug])
+            return product
+
+        with mock.patch.object(
+            ProductDetailView, "get_object", get_object_then_invalidate
+        ):
+            self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+    def test_sibling_color_change_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sibling.price = Decimal("800.00")
+            self.sibling.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["related_colors"][0]["price"], "800.00")
+
+    def test_unrelated_change_keeps_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductGroup.objects.create(name="Other", slug="other")
+
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+
+class CatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = create_catalog(3)
+        self.product = Product.objects.get(slug="product-0")
+
+    def urls(self):
+        return [
+            reverse("category-list"),
+            reverse("product-list"),
+            reverse("category-product-list", kwargs={"slug": self.category.slug}),
+            reverse("product-detail", kwargs={"slug": self.product.slug}),
+        ]
+
+    def test_if_none_match_returns_304_without_evaluating_queryset(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("Last-Modified", response)
+
+                # только агрегат состояния, без выборки и сериализации
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response["ETag"]
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_returns_304(self):
+        response = self.client.get(reverse("product-list"))
+        response = self.client.get(
+            reverse("product-list"),
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_catalog_change(self):
+        etags = [self.client.get(url)["ETag"] for url in self.urls()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Renamed"
+            self.category.save()
+            media = self.product.media.first()
+            media.position = 10
+            media.save()
+
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_missing_or_inactive_product_is_404_without_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.is_active = False
+            self.product.save()
+
+        for slug in ("missing", self.product.slug):
+            with self.subTest(slug=slug):
+                url = reverse("product-detail", kwargs={"slug": slug})
+                response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn("ETag", response)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(45)
+
+    def collect_pages(self, url):
+        slugs = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            slugs.extend(item["slug"] for item in response.data["results"])
+            url = response.data["next"]
+        return slugs
+
+    def test_walks_every_product_once_for_each_ordering(self):
+        # у всех товаров одинаковая цена - порядок держится на tie-breaker
+        for ordering in ("-created_at", "name", "-id", "price", "-price"):
+            with self.subTest(ordering=ordering):
+                slugs = self.collect_pages(
+                    f"{reverse('product-list')}?pagination=cursor&ordering={ordering}"
+                )
+                self.assertEqual(len(slugs), 45)
+                self.assertEqual(len(set(slugs)), 45)
+
+    def test_no_count_query(self):
+        url = f"{reverse('product-list')}?pagination=cursor"
+        next_url = self.client.get(url).data["next"]
+
+        # состояние для ETag + страница + фасеты цвета и размера
+        with self.assertNumQueries(4):
+            response = self.client.get(next_url)
+        self.assertNotIn("count", response.data)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{reverse('product-list')}?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_condition_is_index_range(self):
+        # Ведущее условие created_at <= v делает курсор границей диапазона
+        # индекса (created_at, id), а не фильтром поверх полного прохода
+        paginator = KeysetPagination()
+        paginator.ordering = ["-created_at", "-id"]
+        last = CatalogProduct.objects.order_by(*paginator.ordering)[20]
+        queryset = CatalogProduct.objects.filter(
+            paginator._keyset_filter([last.created_at, last.id])
+        ).order_by(*paginator.ordering)
+
+        self.assertEqual(queryset.count(), 24)
+        if connection.vendor == "sqlite":
+            # без ведущего условия: "SCAN catalog_products USING INDEX ..."
+            self.assertIn("(created_at<?)", queryset.explain())
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(3)
+            group = ProductGroup.objects.get(slug="group-1")
+            group.description = "Тёплый Пуховик из нейлона"
+            group.save()
+
+    def search(self, query):
+        response = self.client.get(reverse("product-search"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [item["slug"] for item in response.data["results"]]
+
+    def test_search_by_description_is_case_insensitive(self):
+        self.assertEqual(self.search("пуховик"), ["product-1"])
+
+    def test_title_matches_rank_first(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            group = ProductGroup.objects.get(slug="group-2")
+            group.name = "Пуховик"
+            group.save()
+
+        self.assertEqual(self.search("Пуховик"), ["product-2", "product-1"])
+
+    def test_search_by_sku(self):
+        self.assertEqual(self.search("product-0-s"), ["product-0"])
+
+    def test_blank_query(self):
+        self.assertEqual(self.search("  "), [])
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = create_catalog(4)
+            # product-0 и product-1 - черные, размер L есть только у product-1
+            black = Color.objects.create(name="Black", slug="black")
+            for product in Product.objects.filter(slug__in=["product-0", "product-1"]):
+                product.color = black
+                product.save()
+            variant = ProductVariant.objects.get(
+                product__slug="product-1", size__name="L"
+            )
+            variant.stock = 2
+            variant.save()
+
+    def get(self, **params):
+        response = self.client.get(reverse("product-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_filters(self):
+        data = self.get(color="black", size="L")
+        self.assertEqual([item["slug"] for item in data["results"]], ["product-1"])
+
+        data = self.get(price_min="1500")
+        self.assertEqual(data["results"], [])
+
+        data = self.get(category=self.category.slug, in_stock="true")
+        self.assertEqual(data["count"], 4)
+
+    def test_facet_counts_ignore_own_filter(self):
+        facets = self.get(color="black")["facets"]
+
+        colors = {row["slug"]: row["count"] for row in facets["colors"]}
+        self.assertEqual(colors["black"], 2)
+        self.assertEqual(colors["color-2"], 1)
+
+        sizes = {row["name"]: row["count"] for row in facets["sizes"]}
+        self.assertEqual(sizes, {"S": 2, "M": 2, "L": 1})
+
+    def test_size_filter_narrows_color_facet(self):
+        facets = self.get(size="L")["facets"]
+
+        colors = {row["slug"]: row["count"] for row in facets["colors"]}
+        self.assertEqual(colors, {"black": 1})
+
+
+class CartVariantsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        create_catalog(60)
+
+    def test_constant_queries(self):
+        variants = list(ProductVariant.objects.order_by("id")[:100])
+        for count in (1, 100):
+            with self.subTest(count=count):
+                with self.assertNumQueries(2):
+                    response = self.client.post(
+                        reverse("cart-variants"),
+                        {"ids": [v.id for v in variants[:count]]},
+                        format="json",
+                    )
+                self.assertEqual(len(response.data["results"]), count)
+
+    def test_payload_matches_order_price(self):
+        variant = ProductVariant.objects.get(sku="product-0-m")
+        variant.price = Decimal("1200.00")
+        variant.save()
+
+        response = self.client.post(
+            reverse("cart-variants"),
+            {"ids": [999999], "skus": ["product-0-m", "product-0-s"]},
+            format="json",
+        )
+
+        items = {item["sku"]: item for item in response.data["results"]}
+        self.assertEqual(items["product-0-m"]["price"], "1200.00")
+        self.assertEqual(items["product-0-s"]["price"], "1000.00")
+        self.assertEqual(items["product-0-s"]["size"], "S")
+        self.assertEqual(items["product-0-s"]["product"]["slug"], "product-0")
+        self.assertEqual(
+            items["product-0-s"]["image"], "https://cdn.example.com/0/1.jpg"
+        )
+        self.assertEqual(response.data["missing"], {"ids": [999999], "skus": []})
+
+    def test_limit(self):
+        response = self.client.post(
+            reverse("cart-variants"), {"ids": list(range(1, 102))}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductFeedTests(TestCase):
+    def setUp(self):
+        create_catalog(3)
+
+    def test_stream_xml(self):
+        response = self.client.get(
+            reverse("product-feed", kwargs={"feed": "yandex", "fmt": "xml"})
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(body.count("<offer "), 9)
+        self.assertIn('<offer id="product-0-l" available="false"', body)
+        self.assertIn("<picture>https://cdn.example.com/0/1.jpg</picture>", body)
+
+    @override_settings(FRONTEND_URL="https://shop.example.com")
+    def test_product_url_encodes_size(self):
+        url = ProductFeed().product_url(
+            {"product_slug": "hoodie", "size_name": "42/44 XL&L"}
+        )
+        self.assertEqual(
+            url, "https://shop.example.com/product/hoodie?size=42%2F44+XL%26L"
+        )
+
+    def test_unknown_feed(self):
+        response = self.client.get(
+            reverse("product-feed", kwargs={"feed": "yandex", "fmt": "json"})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_writes_gzip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "export_product_feeds",
+                feed=["google"],
+                formats=["csv"],
+                output_dir=Path(directory),
+                stdout=mock.Mock(),
+            )
+            plain = (Path(directory) / "google.csv").read_text(encoding="utf-8")
+            with gzip.open(Path(directory) / "google.csv.gz", "rt") as compressed:
+                self.assertEqual(compressed.read(), plain)
+
+        lines = plain.splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertTrue(lines[0].startswith("id,title,description"))
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        self.category = create_catalog(3)
+        CatalogProjectionService().rebuild_all()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = Path(self.directory.name)
+        self.service = CatalogSnapshotService(root=self.root)
+
+    def test_publish_matches_api(self):
+        published = self.service.publish()
+
+        self.assertEqual((self.root / "current").resolve(), published.resolve())
+        snapshot = (self.root / "current" / "products" / "product-0.json").read_bytes()
+        self.assertEqual(
+            snapshot, self.client.get(reverse("product-detail", args=["product-0"])).content
+        )
+        page = self.root / "current" / "categories" / "hoodies" / "page-1.json"
+        self.assertEqual(
+            page.read_bytes(),
+            self.client.get(reverse("category-product-list", args=["hoodies"])).content,
+        )
+        with gzip.open(f"{page}.gz") as compressed:
+            self.assertEqual(compressed.read(), page.read_bytes())
+
+    def test_publish_keeps_last_versions(self):
+        for _ in range(3):
+            self.service.publish(keep=2)
+        self.assertEqual(len(list((self.root / "versions").iterdir())), 2)
+
+    def test_concurrent_writes_use_own_temp_files(self):
+        target = self.root / "products" / "same.json"
+        payloads = [bytes([i]) * 100_000 for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(partial(CatalogSnapshotService._write, target), payloads))
+        versions = [self.root / "versions" / str(i) for i in range(8)]
+        for directory in versions:
+            directory.mkdir(parents=True)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(self.service._switch_current, versions))
+
+        self.assertIn(target.read_bytes(), payloads)
+        self.assertIn((self.root / "current").resolve(), versions)
+        self.assertEqual(target.stat().st_mode & 0o777, 0o644)
+        self.assertEqual(list(self.root.glob("**/.*.tmp")), [])
+
+    def test_product_edit_refreshes_affected_files(self):
+        self.service.publish()
+        detail = self.root / "current" / "products" / "product-0.json"
+        untouched = self.root / "current" / "products" / "product-1.json"
+        untouched_mtime = untouched.stat().st_mtime_ns
+
+        product = Product.objects.get(slug="product-0")
+        product.name = "Renamed"
+        with override_settings(
+            CATALOG_SNAPSHOT_ROOT=self.root, CATALOG_SNAPSHOT_AUTO_REFRESH=True
+        ), self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        self.assertIn(b"Renamed", detail.read_bytes())
+        page = self.root / "current" / "categories" / "hoodies" / "page-1.json"
+        self.assertIn(b"Renamed", page.read_bytes())
+        self.assertEqual(untouched.stat().st_mtime_ns, untouched_mtime)
+
+    def test_color_and_category_edits_refresh_snapshot(self):
+        self.service.publish()
+        current = self.root / "current"
+
+        color = Color.objects.get(slug="color-0")
+        color.name = "Recolored"
+        with override_settings(
+            CATALOG_SNAPSHOT_ROOT=self.root, CATALOG_SNAPSHOT_AUTO_REFRESH=True
+        ), self.captureOnCommitCallbacks(execute=True):
+            color.save()
+            self.category.slug = "sweatshirts"
+            self.category.save()
+
+        self.assertIn(b"Recolored", (current / "products" / "product-0.json").read_bytes())
+        self.assertIn(
+            b"sweatshirts", (current / "categories" / "page-1.json").read_bytes()
+        )
+        self.assertTrue((current / "categories" / "sweatshirts" / "page-1.json").exists())
+        self.assertFalse((current / "categories" / "hoodies").exists())
+
+
+class ORJSONRendererTests(TestCase):
+    def assertSameOutput(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_product_list_output_is_identical(self):
+        create_catalog(5)
+        products = ProductListSerializer.setup_eager_loading(Product.objects.all())
+        self.assertSameOutput(ProductListSerializer(products, many=True).data)
+
+    def test_native_and_fallback_types(self):
+        moscow = datetime.timezone(datetime.timedelta(hours=3))
+        self.assertSameOutput(
+            {
+                "price": Decimal("5990.50"),
+                "id": uuid.uuid4(),
+                "utc": datetime.datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=datetime.UTC),
+                "local": datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=moscow),
+                "naive": datetime.datetime(2026, 1, 2, 3, 4, 5),
+                "date": datetime.date(2026, 1, 2),
+                "time": datetime.time(10, 30),
+                "ttl": datetime.timedelta(minutes=15),
+                "lazy": gettext_lazy("Заказ"),
+                "text": "кириллица \u2028 \u2029 \x1f \"",
+                1: [1.5, 2**70, None, True],
+            }
+        )
+
+    def test_parser_matches_stock_parser(self):
+        body = '{"ids": [1, 2], "big": 100000000000000000000000, "name": "Худи"}'
+        for raw in (body.encode(), b"{broken"):
+            with self.subTest(raw=raw):
+                try:
+                    expected = JSONParser().parse(io.BytesIO(raw))
+                except Exception as e:
+                    with self.assertRaisesMessage(type(e), str(e)):
+                        ORJSONParser().parse(io.BytesIO(raw))
+                else:
+                    self.assertEqual(ORJSONParser().parse(io.BytesIO(raw)), expected)
+
+    def test_benchmark_command(self):
+        create_catalog(3)
+        stdout = io.StringIO()
+        call_command("benchmark_json_renderer", repeat=1, stdout=stdout)
+        self.assertIn("Ускорение", stdout.getvalue())
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(10)
+        CatalogProjectionService().rebuild_all()
+
+    def test_list_fields_and_optional_image(self):
+        response = self.client.get(
+            reverse("product-list"), {"fields": "id,name,slug,price,image"}
+        )
+
+        item = response.data["results"][0]
+        self.assertEqual(set(item), {"id", "name", "slug", "price", "image"})
+        self.assertTrue(item["image"].endswith("/1.jpg"))
+        self.assertNotIn("image", self.client.get(reverse("product-list")).data["results"][0])
+
+    def test_omit(self):
+        response = self.client.get(reverse("product-list"), {"omit": "group,color,images"})
+        self.assertFalse(
+            {"group", "color", "images"} & set(response.data["results"][0])
+        )
+
+    def test_list_serializer_skips_unused_relations(self):
+        products = Product.objects.order_by("id")
+        fields = ProductListSerializer.select_field_names(["id", "name", "price", "image"])
+
+        # товары + медиа, без группы, цвета и вариантов
+        with self.assertNumQueries(2):
+            data = ProductListSerializer(
+                ProductListSerializer.setup_eager_loading(products, fields=fields),
+                many=True,
+                fields=fields,
+            ).data
+        self.assertEqual(len(data), 10)
+
+    def test_detail_sparse_skips_related_queries(self):
+        url = reverse("product-detail", args=["product-0"])
+
+        # ETag + товар; соседние цвета, категории, медиа и варианты не читаются
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"fields": "id,name,price"})
+        self.assertEqual(
+            response.data,
+            {
+                "id": Product.objects.get(slug="product-0").id,
+                "name": "Product 0",
+                "price": "1000.00",
+            },
+        )
+
+        full = self.client.get(url).data
+        cached = self.client.get(url, {"fields": "id,variants"})
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.data, {"id": full["id"], "variants": full["variants"]})
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(3)
+        CatalogProjectionService().rebuild_all()
+        self.url = reverse("product-detail", args=["product-0"])
+
+    def test_server_timing_header(self):
+        response = self.client.get(self.url)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="6 queries", total;dur=[\d.]+$',
+        )
+
+    def test_budget_exceeded_raises_in_tests(self):
+        with override_settings(QUERY_BUDGETS={"product-detail": 3}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "6 queries (budget 3)"):
+                self.client.get(self.url)
+
+    def test_budget_exceeded_logs_in_log_mode(self):
+        with override_settings(
+            QUERY_BUDGETS={"product-detail": 3}, QUERY_BUDGET_ACTION="log"
+        ), self.assertLogs("apps.common.middleware", "WARNING") as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Query budget exceeded for product-detail", logs.output[0])
+
+    def test_outbound_calls(self):
+        with collect_request_metrics() as metrics:
+            for _ in range(2):
+                with track_outbound("yookassa"):
+                    pass
+        self.assertEqual(metrics.outbound["yookassa"][0], 2)
@@ -12,5 +12,16 @@ urlpatterns = [
     ),
     # Products
     path("", views.ProductListView.as_view(), name="product-list"),
+    path("search/", views.ProductSearchView.as_view(), name="product-search"),
+    path(
+        "variants/batch/",
+        views.CartVariantsView.as_view(),
+        name="cart-variants",
+    ),
+    path(
+        "feeds/<slug:feed>.<slug:fmt>",
+        views.product_feed,
+        name="product-feed",
+    ),
     path("<slug:slug>/", views.ProductDetailView.as_view(), name="product-detail"),
 ]
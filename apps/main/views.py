@@ -1,60 +1,232 @@
+from django.db.models import Count, Max, Q
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import generics, permissions
+from rest_framework.response import Response
 
+from apps.common.conditional import ConditionalGetMixin
+from apps.common.fieldsets import SparseFieldsetViewMixin
+from apps.common.pagination import OptionalKeysetPaginationMixin
 
-from .models import Category, Product
+from .cache import catalog_version, product_detail_cache
+from .feeds import FEEDS
+from .filters import CatalogProductFilter
+from .models import (
+    CatalogProduct,
+    Category,
+    Product,
+    ProductGroupCategory,
+    ProductVariant,
+)
+from .service import CatalogSearchService
 from .serializers import (
+    CartVariantSerializer,
+    CartVariantsRequestSerializer,
+    CatalogProductSerializer,
     CategorySerializer,
-    ProductListSerializer,
     ProductDetailSerializer,
 )
 
 
-class CategoryListView(generics.ListAPIView):
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+    """
+    ETag / Last-Modified для каталога: версия каталога плюс
+    max(времени изменения) и количество строк отфильтрованного набора.
+    """
+
+    updated_field = "refreshed_at"
+
+    def get_conditional_state(self, request):
+        state = self.get_conditional_queryset().aggregate(
+            last_modified=Max(self.updated_field), count=Count("pk")
+        )
+        etag_parts = [catalog_version.get(), state["last_modified"], state["count"]]
+        return etag_parts, state["last_modified"]
+
+    def get_conditional_queryset(self):
+        return self.filter_queryset(self.get_queryset()).order_by()
+
+
+class CatalogFacetsMixin:
+    """Фильтры каталога и счётчики фасетов в ответе списка товаров."""
+
+    filterset_class = CatalogProductFilter
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        filterset = self.filterset_class(
+            self.request.query_params,
+            queryset=self.get_queryset(),
+            request=self.request,
+        )
+        response.data["facets"] = filterset.get_facets()
+        return response
+
+
+class CategoryListView(CatalogConditionalGetMixin, generics.ListAPIView):
     serializer_class = CategorySerializer
     queryset = Category.objects.filter(is_active=True).order_by("name")
     permission_classes = [permissions.AllowAny]
+    updated_field = "updated_at"
 
 
-class CategoryProductListView(generics.ListAPIView):
-    serializer_class = ProductListSerializer
+class CategoryProductListView(
+    SparseFieldsetViewMixin,
+    CatalogConditionalGetMixin,
+    CatalogFacetsMixin,
+    OptionalKeysetPaginationMixin,
+    generics.ListAPIView,
+):
+    serializer_class = CatalogProductSerializer
+    ordering_fields = ["created_at", "name", "id", "price"]
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
         category_slug = self.kwargs.get("slug")
-        return (
-            Product.objects.filter(
-                group__categories__slug=category_slug, is_active=True
-            )
-            .select_related("group", "color")
-            .prefetch_related("media", "variants")
-        )
+        group_ids = ProductGroupCategory.objects.filter(
+            category__slug=category_slug
+        ).values("group_id")
+        return CatalogProduct.objects.filter(group_id__in=group_ids)
 
 
-class ProductListView(generics.ListAPIView):
-    serializer_class = ProductListSerializer
-    queryset = (
-        Product.objects.filter(is_active=True)
-        .select_related("group", "color")
-        .prefetch_related("media", "variants")
-    )
+class ProductListView(
+    SparseFieldsetViewMixin,
+    CatalogConditionalGetMixin,
+    CatalogFacetsMixin,
+    OptionalKeysetPaginationMixin,
+    generics.ListAPIView,
+):
+    serializer_class = CatalogProductSerializer
+    queryset = CatalogProduct.objects.all()
     ordering_fields = ["created_at", "name", "id", "price"]
     ordering = ["-created_at"]
     permission_classes = [permissions.AllowAny]
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductSearchView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Полнотекстовый поиск товаров, результаты отсортированы по релевантности.
+
+    GET /api/v1/products/search/?q=пуховик черный
+    """
+
+    serializer_class = CatalogProductSerializer
+    permission_classes = [permissions.AllowAny]
+    # Порядок задаёт ранжирование, OrderingFilter его не перебивает
+    filter_backends = []
+
+    def get_queryset(self):
+        return CatalogSearchService().search(self.request.query_params.get("q", ""))
+
+
+class ProductDetailView(
+    SparseFieldsetViewMixin, CatalogConditionalGetMixin, generics.RetrieveAPIView
+):
     serializer_class = ProductDetailSerializer
-    queryset = (
-        Product.objects.filter(is_active=True)
-        .select_related("group", "color")
-        .prefetch_related(
-            "media",
-            "variants",
-            "group__products__color",
-            "group__products__media",
-            "group__products__variants",
-            "group__categories",
-        )
-    )
+    queryset = Product.objects.filter(is_active=True)
     lookup_field = "slug"
     permission_classes = [permissions.AllowAny]
+
+    def get_conditional_queryset(self):
+        # Карточка включает соседние цвета, поэтому состояние - вся группа
+        group_ids = CatalogProduct.objects.filter(
+            slug=self.kwargs[self.lookup_field]
+        ).values("group_id")
+        return CatalogProduct.objects.filter(group_id__in=group_ids)
+
+    def get_conditional_state(self, request):
+        etag_parts, last_modified = super().get_conditional_state(request)
+        # Пустая группа - товара нет или он неактивен: без ETag, иначе
+        # постоянный ETag для 404 превратился бы в 304 на If-None-Match
+        if not etag_parts[-1]:
+            return None
+        return etag_parts, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        data, version = product_detail_cache.get(slug)
+        cache_status = "HIT"
+
+        if data is None:
+            cache_status = "MISS"
+            # В кэш кладём только полную карточку, выборочные поля считаем отдельно
+            data = self.get_serializer(self.get_object()).data
+            if not self.is_sparse_request():
+                product_detail_cache.set(slug, data, version)
+        elif self.is_sparse_request():
+            fields = self.get_selected_field_names()
+            data = {name: value for name, value in data.items() if name in fields}
+
+        return Response(data, headers={"X-Cache": cache_status})
+
+
+class CartVariantsView(generics.GenericAPIView):
+    """
+    Актуальные цена, остаток и карточка для всех вариантов в корзине
+    за фиксированное число запросов.
+
+    POST /api/v1/products/variants/batch/
+
+    Request:
+    {
+        "ids": [14, 15],
+        "skus": ["hoodie-basic-black-m"]
+    }
+
+    Response:
+    {
+        "results": [{"id": 14, "sku": "...", "price": "5990.00", ...}],
+        "missing": {"ids": [], "skus": []}
+    }
+    """
+
+    serializer_class = CartVariantsRequestSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        ids = serializer.validated_data["ids"]
+        skus = serializer.validated_data["skus"]
+
+        variants = list(
+            CartVariantSerializer.setup_eager_loading(
+                ProductVariant.objects.filter(Q(id__in=ids) | Q(sku__in=skus))
+            )
+        )
+
+        found_ids = {variant.id for variant in variants}
+        found_skus = {variant.sku for variant in variants}
+
+        return Response(
+            {
+                "results": CartVariantSerializer(variants, many=True).data,
+                "missing": {
+                    "ids": [i for i in dict.fromkeys(ids) if i not in found_ids],
+                    "skus": [s for s in dict.fromkeys(skus) if s not in found_skus],
+                },
+            }
+        )
+
+
+@require_GET
+def product_feed(request, feed, fmt):
+    """
+    Потоковая выгрузка товарного фида.
+
+    GET /api/v1/products/feeds/yandex.xml
+    GET /api/v1/products/feeds/google.csv
+
+    Для регулярного забора площадками лучше отдавать файл, выгруженный
+    командой export_product_feeds (nginx, /media/feeds/).
+    """
+    feed_class = FEEDS.get(feed)
+    if feed_class is None or fmt not in feed_class.formats:
+        raise Http404("Фид не найден")
+
+    response = StreamingHttpResponse(
+        feed_class().stream(fmt), content_type=feed_class.content_types[fmt]
+    )
+    response["Content-Disposition"] = f'inline; filename="{feed}.{fmt}"'
+    return response
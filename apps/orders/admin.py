@@ -1,8 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from config.admin import admin_site
-from .models import Order, OrderItem, OrderCustomer, StockHistory
+from .models import Order, OrderItem, OrderCustomer, StockHistory, StockReservation
+from .service import commit_order_stock
 
 
 class OrderItemInline(admin.TabularInline):
@@ -55,6 +57,17 @@ class StockHistoryInline(admin.TabularInline):
         return False
 
 
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    fields = ("product_variant", "quantity", "expires_at", "created_at")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
         "short_id",
@@ -79,7 +92,12 @@ class OrderAdmin(admin.ModelAdmin):
         "payment_link",
     )
     date_hierarchy = "created_at"
-    inlines = [OrderCustomerInline, OrderItemInline, StockHistoryInline]
+    inlines = [
+        OrderCustomerInline,
+        OrderItemInline,
+        StockReservationInline,
+        StockHistoryInline,
+    ]
     actions = [
         "mark_as_paid",
         "mark_as_processing",
@@ -177,8 +195,26 @@ class OrderAdmin(admin.ModelAdmin):
 
     # Actions
     def mark_as_paid(self, request, queryset):
-        updated = queryset.update(status="paid")
+        # Как и вебхук оплаты: резерв переходит в списание остатка.
+        # Резерв отменённого заказа уже снят - такие заказы пропускаем
+        updated = skipped = 0
+        for order in queryset:
+            with transaction.atomic():
+                locked = Order.objects.select_for_update().get(pk=order.pk)
+                if locked.status == "canceled":
+                    skipped += 1
+                    continue
+                locked.status = "paid"
+                locked.save(update_fields=["status", "updated_at"])
+                commit_order_stock(locked, "Списание: заказ отмечен оплаченным вручную")
+            updated += 1
         self.message_user(request, f"{updated} заказ(ов) помечено как оплаченные")
+        if skipped:
+            self.message_user(
+                request,
+                f"{skipped} отменённых заказ(ов) пропущено",
+                level=messages.WARNING,
+            )
 
     mark_as_paid.short_description = "Отметить как Оплачен"
 
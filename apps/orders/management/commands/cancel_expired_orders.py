@@ -2,11 +2,10 @@ import logging
 from datetime import timedelta
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from django.utils import timezone
 
 from apps.orders.models import Order
-from apps.payment.models import Payment
+from apps.orders.service import cancel_unpaid_order
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +37,7 @@ class Command(BaseCommand):
         expired_orders = Order.objects.filter(
             status="awaiting_payment",
             created_at__lt=cutoff_time,
-        ).select_related("items")
+        )
 
         count = expired_orders.count()
 
@@ -63,48 +62,37 @@ class Command(BaseCommand):
                 )
             return
 
-        # Отменяем заказы и возвращаем товар на склад
+        # Отменяем заказы и освобождаем остатки
         canceled_count = 0
         restored_items = 0
 
         for order in expired_orders:
             try:
-                with transaction.atomic():
-                    # Возвращаем товар на склад
-                    for item in order.items.select_related("product_variant").all():
-                        variant = item.product_variant
-                        variant.stock += item.quantity
-                        variant.save(update_fields=["stock"])
-                        restored_items += 1
-
-                    # Отменяем заказ
-                    order.status = "canceled"
-                    order.save(update_fields=["status", "updated_at"])
-
-                    # Отменяем связанный платеж, если есть
-                    Payment.objects.filter(
-                        order=order,
-                        status__in=["pending", "waiting_for_capture"]
-                    ).update(status="canceled")
-
-                    canceled_count += 1
-                    logger.info(
-                        f"Заказ {order.id} отменен автоматически (просрочен), "
-                        f"возвращено позиций: {order.items.count()}"
-                    )
+                restored = cancel_unpaid_order(
+                    order, f"Автоотмена неоплаченного заказа {str(order.id)[:8]}"
+                )
+                if restored is None:
+                    continue
+
+                canceled_count += 1
+                restored_items += restored
+                logger.info(
+                    f"Заказ {order.id} отменен автоматически (просрочен), "
+                    f"освобождено позиций: {restored}"
+                )
 
-                    # Отправка email клиенту
-                    try:
-                        from apps.orders.services.email_service import EmailService
-                        
-                        EmailService.send_order_canceled(
-                            order,
-                            reason="Заказ не был оплачен в течение 2 часов"
-                        )
-                    except Exception as email_error:
-                        logger.error(
-                            f"Ошибка при отправке email для заказа {order.id}: {str(email_error)}"
-                        )
+                # Отправка email клиенту (после commit)
+                try:
+                    from apps.orders.services.email_service import EmailService
+
+                    EmailService.send_order_canceled(
+                        order,
+                        reason="Заказ не был оплачен в течение 2 часов"
+                    )
+                except Exception as email_error:
+                    logger.error(
+                        f"Ошибка при отправке email для заказа {order.id}: {str(email_error)}"
+                    )
 
             except Exception as e:
                 logger.error(
@@ -118,6 +106,6 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(
                 f"Успешно отменено {canceled_count} заказов, "
-                f"возвращено {restored_items} позиций на склад"
+                f"освобождено {restored_items} позиций"
             )
         )
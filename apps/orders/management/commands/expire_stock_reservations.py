@@ -0,0 +1,106 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.main.signals import schedule_stock_refresh
+from apps.orders.models import IdempotencyKey, Order, StockReservation
+from apps.orders.service import cancel_unpaid_order
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Отмена неоплаченных заказов с истёкшим резервом остатков, удаление "
+        "просроченных резервов и ключей Idempotency-Key"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать заказы без реальной отмены",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = StockReservation.objects.filter(expires_at__lte=now)
+
+        orders = list(
+            Order.objects.filter(
+                status="awaiting_payment",
+                pk__in=expired.values("order_id"),
+            ).order_by("created_at")
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.NOTICE("Режим dry-run: отмена не будет выполнена"))
+            self.stdout.write(
+                f"Заказов с истёкшим резервом: {len(orders)}, "
+                f"просроченных резервов: {expired.count()}"
+            )
+            for order in orders:
+                self.stdout.write(
+                    f"  - Заказ {order.id} от {order.created_at.strftime('%Y-%m-%d %H:%M')} "
+                    f"на сумму {order.total_amount}₽"
+                )
+            return
+
+        canceled_count = 0
+        for order in orders:
+            try:
+                released = cancel_unpaid_order(
+                    order, f"Истёк резерв неоплаченного заказа {str(order.id)[:8]}"
+                )
+                if released is None:
+                    continue
+
+                canceled_count += 1
+                logger.info(
+                    f"Заказ {order.id} отменен: истёк резерв, "
+                    f"освобождено позиций: {released}"
+                )
+
+                # Отправка email клиенту (после commit)
+                try:
+                    from apps.orders.services.email_service import EmailService
+
+                    EmailService.send_order_canceled(
+                        order, reason="Заказ не был оплачен вовремя"
+                    )
+                except Exception as email_error:
+                    logger.error(
+                        f"Ошибка при отправке email для заказа {order.id}: {str(email_error)}"
+                    )
+
+            except Exception as e:
+                logger.error(
+                    f"Ошибка при отмене заказа {order.id}: {str(e)}",
+                    exc_info=True,
+                )
+                self.stdout.write(
+                    self.style.ERROR(f"Ошибка при обработке заказа {order.id}: {str(e)}")
+                )
+
+        # Остальные просроченные резервы (заказ уже оплачен или отменён)
+        # больше ни на что не влияют - удаляем одним запросом
+        leftover = StockReservation.objects.filter(expires_at__lte=now)
+        schedule_stock_refresh(
+            leftover.values_list("product_variant__product_id", flat=True)
+        )
+        deleted, _ = leftover.delete()
+
+        keys_deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=now
+            - timedelta(hours=settings.ORDER_IDEMPOTENCY_KEY_TTL_HOURS)
+        ).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Отменено заказов: {canceled_count}, удалено резервов: {deleted}, "
+                f"ключей идемпотентности: {keys_deleted}"
+            )
+        )
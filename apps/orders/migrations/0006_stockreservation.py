@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_productmedia_derivatives'),
+        ('orders', '0005_alter_order_delivery_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.order', verbose_name='Заказ')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='main.productvariant', verbose_name='Вариант товара')),
+            ],
+            options={
+                'verbose_name': 'Резерв остатка',
+                'verbose_name_plural': 'Резервы остатков',
+                'db_table': 'stock_reservations',
+                'indexes': [models.Index(fields=['product_variant', 'expires_at'], name='stock_reser_product_ce1feb_idx'), models.Index(fields=['expires_at'], name='stock_reser_expires_fdd22d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'product_variant'), name='unique_reservation_per_order_variant')],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from apps.main.models import ProductVariant
 
 
@@ -210,3 +214,141 @@ class StockHistory(models.Model):
 
     def __str__(self):
         return f"{self.product_variant} {self.get_action_display()}: {self.quantity_change:+d}"
+
+
+class StockReservation(models.Model):
+    """
+    Временный резерв остатка под неоплаченный заказ.
+
+    Остаток на складе (ProductVariant.stock) при создании заказа не меняется:
+    доступно к продаже = stock минус сумма активных резервов (expires_at в
+    будущем). Просроченные резервы не учитываются сразу, даже если их ещё не
+    удалила команда expire_stock_reservations. При оплате резерв переходит
+    в списание остатка, при отмене - удаляется.
+    """
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Заказ",
+    )
+    product_variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Вариант товара",
+    )
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+
+    class Meta:
+        db_table = "stock_reservations"
+        verbose_name = "Резерв остатка"
+        verbose_name_plural = "Резервы остатков"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "product_variant"],
+                name="unique_reservation_per_order_variant",
+            ),
+        ]
+        indexes = [
+            # Сумма активных резервов варианта: поиск по (variant, expires_at > now)
+            models.Index(fields=["product_variant", "expires_at"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product_variant} x{self.quantity} до {self.expires_at:%H:%M}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ Idempotency-Key запроса создания заказа.
+
+    Хранит отпечаток тела запроса и сохранённый ответ: повтор с тем же ключом
+    получает тот же ответ без нового заказа, резерва и платежа. Пока ответа
+    нет (response_status пустой), запрос считается выполняющимся.
+    """
+
+    client = models.CharField(
+        max_length=100,
+        verbose_name="Клиент",
+        help_text="Пользователь или IP: ключи разных клиентов не пересекаются",
+    )
+    key = models.CharField(max_length=255, verbose_name="Ключ")
+    fingerprint = models.CharField(
+        max_length=64, verbose_name="Отпечаток запроса", help_text="SHA-256 тела запроса"
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="idempotency_keys",
+        verbose_name="Заказ",
+    )
+    response_status = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="HTTP-статус ответа"
+    )
+    response_body = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Тело ответа"
+    )
+    locked_at = models.DateTimeField(verbose_name="Начало обработки")
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name="Создан"
+    )
+
+    class Meta:
+        db_table = "order_idempotency_keys"
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client", "key"], name="unique_idempotency_key_per_client"
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+def annotate_available_stock(queryset, now=None):
+    """
+    Добавляет к queryset вариантов поле available_stock - остаток минус
+    активные резервы (один подзапрос по индексу product_variant, expires_at).
+
+    Только для чтения: в PostgreSQL (READ COMMITTED) подзапрос внутри
+    SELECT ... FOR UPDATE видит снимок до ожидания блокировки. Для проверки
+    под блокировкой резервы считает отдельный запрос - reserved_quantities().
+    """
+    reserved = (
+        StockReservation.objects.filter(
+            product_variant=OuterRef("pk"),
+            expires_at__gt=now or timezone.now(),
+        )
+        .order_by()
+        .values("product_variant")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return queryset.annotate(
+        available_stock=Greatest(
+            F("stock") - Coalesce(Subquery(reserved), Value(0)), Value(0)
+        )
+    )
+
+
+def reserved_quantities(variant_ids, now=None) -> dict:
+    """Сумма активных резервов по вариантам: {variant_id: quantity}."""
+    return dict(
+        StockReservation.objects.filter(
+            product_variant_id__in=variant_ids,
+            expires_at__gt=now or timezone.now(),
+        )
+        .order_by()
+        .values("product_variant_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_variant_id", "total")
+    )
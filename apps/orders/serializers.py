@@ -3,6 +3,8 @@ from rest_framework import serializers
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator
 from django.utils.html import escape
 
+from apps.common.fieldsets import SparseFieldsetSerializerMixin
+
 from .models import Order, OrderItem, OrderCustomer
 from .service import OrderCreationService
 
@@ -78,7 +80,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели заказа
     """
@@ -98,6 +100,17 @@ class OrderSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        """Подгружает позиции и данные клиента, только если они в ответе."""
+        if fields is None:
+            fields = OrderSerializer.select_field_names()
+        if "customer_info" in fields:
+            queryset = queryset.select_related("customer_info")
+        if "items" in fields:
+            queryset = queryset.prefetch_related("items")
+        return queryset
+
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
     """
@@ -175,12 +188,15 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
         customer_data = validated_data.pop("customer_info", {})
         return_url = validated_data.pop("return_url", None)
+        # Передаётся из OrderCreateView через serializer.save()
+        payment_idempotence_key = validated_data.pop("payment_idempotence_key", None)
 
         service = OrderCreationService()
         order = service.create_order_with_payment(
             items_data=items_data,
             customer_data=customer_data,
             return_url=return_url,
+            payment_idempotence_key=payment_idempotence_key,
         )
 
         return order
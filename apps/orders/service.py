@@ -1,18 +1,347 @@
+import hashlib
+import json
 import logging
+from datetime import timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional
 
-from django.db import transaction
-from rest_framework import serializers
-
-from .models import Order, OrderItem, OrderCustomer, StockHistory
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import exceptions, serializers
+
+from .models import (
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OrderCustomer,
+    StockHistory,
+    StockReservation,
+    reserved_quantities,
+)
+from apps.common.db import retry_on_contention
 from apps.main.models import ProductVariant
+from apps.main.signals import schedule_stock_refresh
 from apps.payment.models import Payment
 from apps.payment.provider import PaymentProviderBase, YookassaProvider
 
 logger = logging.getLogger(__name__)
 
 
+def return_order_stock(order: Order, note: str) -> int:
+    """
+    Освобождает остатки отменённого заказа. Вызывается внутри транзакции.
+
+    Резерв (StockReservation) просто удаляется - остаток на складе при
+    создании заказа не менялся. Если остаток уже был списан (оплаченный
+    заказ или заказ, созданный до появления резервов), позиции возвращаются
+    на склад с записью StockHistory (order_canceled). Варианты блокируются
+    по возрастанию id - единый порядок для всех путей, меняющих остатки,
+    исключает deadlock.
+
+    Returns:
+        Количество освобождённых позиций
+    """
+    # Доступный остаток в каталоге растёт - проекция и кэши пересчитываются
+    schedule_stock_refresh(
+        order.reservations.values_list("product_variant__product_id", flat=True)
+    )
+    released, _ = order.reservations.all().delete()
+
+    actions = set(order.stock_changes.values_list("action", flat=True))
+    if not actions & {"order_created", "order_paid"} or "order_canceled" in actions:
+        return released
+
+    items = list(order.items.order_by("product_variant_id"))
+    variants = {
+        variant.id: variant
+        for variant in ProductVariant.objects.select_for_update()
+        .filter(id__in=[item.product_variant_id for item in items])
+        .order_by("id")
+    }
+
+    stock_history_records = []
+    for item in items:
+        variant = variants[item.product_variant_id]
+        stock_before = variant.stock
+        variant.stock += item.quantity
+        variant.save(update_fields=["stock"])
+        stock_history_records.append(
+            StockHistory(
+                product_variant=variant,
+                order=order,
+                action="order_canceled",
+                quantity_change=item.quantity,
+                stock_before=stock_before,
+                stock_after=variant.stock,
+                note=note,
+            )
+        )
+    StockHistory.objects.bulk_create(stock_history_records)
+    return len(items)
+
+
+def commit_order_stock(order: Order, note: str) -> int:
+    """
+    Переводит резерв оплаченного заказа в списание остатка (StockHistory
+    order_paid). Вызывается внутри транзакции вебхука оплаты.
+
+    Повторный вызов и заказы, списанные ещё при создании (до резервов),
+    остаток не трогают.
+
+    Returns:
+        Количество списанных позиций
+    """
+    order.reservations.all().delete()
+
+    actions = set(order.stock_changes.values_list("action", flat=True))
+    if actions & {"order_created", "order_paid"}:
+        return 0
+
+    quantities: Dict[int, int] = {}
+    for variant_id, quantity in order.items.values_list("product_variant_id", "quantity"):
+        quantities[variant_id] = quantities.get(variant_id, 0) + quantity
+    if not quantities:
+        return 0
+
+    stock_changes = decrement_stock(quantities)
+
+    StockHistory.objects.bulk_create(
+        [
+            StockHistory(
+                product_variant_id=variant_id,
+                order=order,
+                action="order_paid",
+                quantity_change=stock_after - stock_before,
+                stock_before=stock_before,
+                stock_after=stock_after,
+                note=note,
+            )
+            for variant_id, (stock_before, stock_after) in sorted(stock_changes.items())
+        ]
+    )
+    return len(stock_changes)
+
+
+def decrement_stock(quantities: Dict[int, int]) -> Dict[int, tuple]:
+    """
+    Списывает остатки всех вариантов одним запросом:
+    UPDATE ... SET stock = stock - qty WHERE stock >= qty RETURNING.
+
+    Если резерв истёк и остаток успели продать, вариант обнуляется,
+    а в лог пишется ошибка - оплаченный заказ отменять уже поздно.
+    UPDATE идёт мимо post_save, поэтому проекция каталога и кэш карточек
+    с версией пересчитываются явно после коммита.
+
+    Returns:
+        {variant_id: (stock_before, stock_after)}
+    """
+    table = connection.ops.quote_name(ProductVariant._meta.db_table)
+    values = ", ".join(["(CAST(%s AS bigint), CAST(%s AS integer))"] * len(quantities))
+    params = [value for pair in quantities.items() for value in pair]
+
+    # Порядок блокировок UPDATE ... FROM не определён: сначала берём строки
+    # по возрастанию id, чтобы пересекающиеся заказы не ловили deadlock
+    current = {
+        variant_id: (stock, product_id)
+        for variant_id, stock, product_id in ProductVariant.objects.select_for_update()
+        .filter(id__in=sorted(quantities))
+        .order_by("id")
+        .values_list("id", "stock", "product_id")
+    }
+
+    # RETURNING только по колонкам обновляемой таблицы (ограничение SQLite)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH requested (variant_id, quantity) AS (VALUES {values}) "
+            f"UPDATE {table} SET stock = {table}.stock - requested.quantity "
+            f"FROM requested "
+            f"WHERE {table}.id = requested.variant_id "
+            f"AND {table}.stock >= requested.quantity "
+            f"RETURNING {table}.id, {table}.stock, {table}.product_id",
+            params,
+        )
+        returned = cursor.fetchall()
+
+    stock_after = {variant_id: stock for variant_id, stock, _ in returned}
+    product_ids = {product_id for _, _, product_id in returned}
+
+    changes = {
+        variant_id: (after + quantities[variant_id], after)
+        for variant_id, after in stock_after.items()
+    }
+
+    oversold = [
+        variant_id
+        for variant_id in quantities
+        if variant_id not in stock_after and variant_id in current
+    ]
+    if oversold:
+        logger.error(
+            f"Oversold variants {oversold}: "
+            f"requested={[quantities[v] for v in oversold]}, "
+            f"available={[current[v][0] for v in oversold]}"
+        )
+        ProductVariant.objects.filter(id__in=oversold).update(stock=0)
+        changes.update(
+            {variant_id: (current[variant_id][0], 0) for variant_id in oversold}
+        )
+        product_ids.update(current[variant_id][1] for variant_id in oversold)
+
+    schedule_stock_refresh(product_ids)
+    return changes
+
+
+@retry_on_contention(name="order_expire")
+def cancel_unpaid_order(order: Order, note: str) -> Optional[int]:
+    """
+    Отмена неоплаченного заказа с освобождением остатков и платежей.
+    Блокировки: платежи, заказ, затем варианты по возрастанию id - тот же
+    порядок, что и при обработке вебхука оплаты.
+
+    Returns:
+        Количество освобождённых позиций или None, если заказ уже
+        оплачен или отменён параллельно
+    """
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update().filter(order_id=order.pk).order_by("id")
+        )
+        locked = (
+            Order.objects.select_for_update()
+            .filter(pk=order.pk, status="awaiting_payment")
+            .first()
+        )
+        if locked is None:
+            return None
+
+        released = return_order_stock(locked, note)
+
+        locked.status = "canceled"
+        locked.save(update_fields=["status", "updated_at"])
+
+        # Отменяем связанный платеж, если есть
+        Payment.objects.filter(
+            pk__in=[payment.pk for payment in payments],
+            status__in=["pending", "waiting_for_capture"],
+        ).update(status="canceled")
+
+    order.status = locked.status
+    return released
+
+
+class IdempotencyKeyInUse(exceptions.APIException):
+    status_code = 409
+    default_detail = "Запрос с этим Idempotency-Key ещё выполняется. Повторите позже."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyMismatch(exceptions.APIException):
+    status_code = 422
+    default_detail = "Idempotency-Key уже использован с другим телом запроса."
+    default_code = "idempotency_key_mismatch"
+
+
+class OrderIdempotencyService:
+    """
+    Идемпотентность создания заказа по заголовку Idempotency-Key.
+
+    Ключи действуют в пределах клиента (client): одинаковые ключи разных
+    клиентов не пересекаются. acquire() занимает ключ (уникальный индекс
+    разрешает гонку параллельных повторов), complete() сохраняет успешный
+    ответ для повторов, release() освобождает ключ после ошибки, чтобы
+    клиент мог повторить запрос.
+    """
+
+    MAX_KEY_LENGTH = 255
+
+    @staticmethod
+    def fingerprint(data) -> str:
+        """SHA-256 тела запроса без учёта порядка ключей."""
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def payment_key(client: str, key: str, fingerprint: str) -> str:
+        """
+        Ключ идемпотентности для YooKassa (64 символа): один и тот же для
+        всех повторов запроса, в том числе после падения процесса между
+        созданием платежа и сохранением ответа - второй платёж не создаётся.
+        """
+        return hashlib.sha256(f"{client}:{key}:{fingerprint}".encode("utf-8")).hexdigest()
+
+    def find_replay(
+        self, client: str, key: str, fingerprint: str
+    ) -> Optional[IdempotencyKey]:
+        """Выполненный запрос с тем же ключом и телом (для повтора ответа)."""
+        return IdempotencyKey.objects.filter(
+            client=client,
+            key=key,
+            fingerprint=fingerprint,
+            response_status__isnull=False,
+            created_at__gte=self._expired_before(timezone.now()),
+        ).first()
+
+    def acquire(self, client: str, key: str, fingerprint: str) -> IdempotencyKey:
+        """
+        Returns:
+            Запись ключа. Если response_status заполнен - запрос уже
+            выполнен, и вызывающий должен вернуть сохранённый ответ.
+
+        Raises:
+            IdempotencyKeyMismatch: ключ использован с другим телом
+            IdempotencyKeyInUse: запрос с этим ключом ещё выполняется
+        """
+        now = timezone.now()
+        IdempotencyKey.objects.filter(
+            client=client, key=key, created_at__lt=self._expired_before(now)
+        ).delete()
+
+        record, created = IdempotencyKey.objects.get_or_create(
+            client=client,
+            key=key,
+            defaults={"fingerprint": fingerprint, "locked_at": now},
+        )
+        if created:
+            return record
+
+        if record.fingerprint != fingerprint:
+            logger.warning(f"Idempotency key {key!r} reused with a different request")
+            raise IdempotencyKeyMismatch()
+
+        if record.response_status is not None:
+            logger.info(
+                f"Idempotency key {key!r}: replaying response for order {record.order_id}"
+            )
+            return record
+
+        # Ответ не сохранён: либо запрос ещё выполняется, либо процесс упал.
+        # Во втором случае после ORDER_IDEMPOTENCY_LOCK_SECONDS ключ забирает
+        # первый повтор (условный UPDATE по прежнему locked_at)
+        stale_before = now - timedelta(seconds=settings.ORDER_IDEMPOTENCY_LOCK_SECONDS)
+        taken = record.locked_at < stale_before and IdempotencyKey.objects.filter(
+            pk=record.pk, response_status__isnull=True, locked_at=record.locked_at
+        ).update(locked_at=now)
+        if not taken:
+            raise IdempotencyKeyInUse()
+
+        record.locked_at = now
+        return record
+
+    def complete(self, record: IdempotencyKey, status: int, body, order_id=None) -> None:
+        record.response_status = status
+        record.response_body = body
+        record.order_id = order_id
+        record.save(update_fields=["response_status", "response_body", "order"])
+
+    def release(self, record: IdempotencyKey) -> None:
+        IdempotencyKey.objects.filter(pk=record.pk, response_status__isnull=True).delete()
+
+    @staticmethod
+    def _expired_before(now):
+        return now - timedelta(hours=settings.ORDER_IDEMPOTENCY_KEY_TTL_HOURS)
+
+
 class OrderCreationService:
     """
     Сервис для создания заказов с платежами.
@@ -26,90 +355,238 @@ class OrderCreationService:
         items_data: List[Dict],
         customer_data: Dict,
         return_url: Optional[str] = None,
+        payment_idempotence_key: Optional[str] = None,
     ) -> Order:
         """
         Создает заказ с платежом.
+        payment_idempotence_key - ключ для провайдера платежей (из
+        Idempotency-Key запроса); без него ключ выводится из id заказа.
+
+        Три шага, чтобы блокировки остатков не держались во время HTTP-вызовов:
+        1. reserve - короткая транзакция: блокировка вариантов, проверка
+           доступного остатка, создание заказа, позиций и резерва с TTL;
+        2. расчёт доставки и создание платежа - вне транзакции. Запись
+           Payment с ключом идемпотентности сохраняется до вызова провайдера;
+        3. finalize - короткая транзакция: сумма заказа, ID платежа, ссылка.
+        При ошибке на шагах 2-3 заказ отменяется, резерв снимается. Если
+        провайдер платёж уже создал, его ID остаётся в Payment: вебхук об
+        оплате найдёт платёж и проведёт заказ.
+        Остаток на складе списывается только при оплате (commit_order_stock).
+        """
+        order, validated_items, items_total = self._reserve_order(
+            items_data, customer_data
+        )
+        idempotence_key = payment_idempotence_key or f"order-{order.id}"
+        payment, payment_result = None, None
+
+        try:
+            delivery_cost = self._calculate_delivery_cost(
+                validated_items, customer_data.get("shipping_address")
+            )
+            total_amount = items_total + delivery_cost
+
+            payment = Payment.objects.create(
+                order=order,
+                provider="yookassa",
+                idempotence_key=idempotence_key,
+                amount=total_amount,
+                status="pending",
+            )
+            payment_result = self.payment_provider.create_payment(
+                amount=total_amount,
+                currency="RUB",
+                order_id=str(order.id),
+                return_url=return_url,
+                customer_email=customer_data.get("email"),
+                idempotence_key=idempotence_key,
+            )
+
+            self._finalize_order(
+                order, delivery_cost, total_amount, payment, payment_result
+            )
+
+            logger.info(
+                f"Order {order.id} created successfully with payment and delivery"
+            )
+            return order
+
+        except Exception as e:
+            logger.error(
+                f"Failed to create payment for order {order.id}: {e}", exc_info=True
+            )
+            self._release_order(order, payment, payment_result)
+            raise serializers.ValidationError(
+                {"payment": "Не удалось создать платеж. Попробуйте позже."}
+            )
+
+    @retry_on_contention(name="order_reserve")
+    def _reserve_order(
+        self, items_data: List[Dict], customer_data: Dict
+    ) -> tuple[Order, List[Dict], Decimal]:
+        """
+        Шаг 1: резерв остатков и создание заказа (короткая транзакция).
+        Число SQL-запросов не зависит от количества позиций. Сначала
+        варианты блокируются по возрастанию id, и только затем отдельным
+        запросом считаются активные резервы: он видит резервы, которые
+        конкурирующий заказ зафиксировал, пока мы ждали блокировку.
         """
         with transaction.atomic():
-            variant_ids = [item["product_variant"].id for item in items_data]
-            variants = ProductVariant.objects.select_for_update().filter(
-                id__in=variant_ids,
-                is_active=True,
+            variant_ids = sorted({item["product_variant"].id for item in items_data})
+            variants = list(
+                ProductVariant.objects.select_for_update(of=("self",))
+                .select_related("product")
+                .filter(id__in=variant_ids, is_active=True)
+                .order_by("pk")
             )
+            reserved = reserved_quantities(variant_ids)
+            for variant in variants:
+                variant.available_stock = max(
+                    variant.stock - reserved.get(variant.id, 0), 0
+                )
 
             validated_items, items_total = self._validate_and_calculate_items(
                 items_data, variants
             )
 
-            delivery_cost = Decimal("0")
-            delivery_method = "self_pickup"
-
-            shipping_address = customer_data.get("shipping_address")
+            order = Order.objects.create(
+                total_amount=items_total,
+                delivery_cost=Decimal("0"),
+                delivery_method="self_pickup",
+                status="awaiting_payment",
+            )
+            OrderCustomer.objects.create(order=order, **customer_data)
 
-            if shipping_address:
-                from apps.delivery.service import DeliveryService
+            self._create_order_items_and_reservations(order, validated_items)
 
-                delivery_service = DeliveryService()
+        return order, validated_items, items_total
 
-                try:
-                    delivery_cost = delivery_service.calculate_delivery_cost(
-                        items_data=validated_items,
-                        destination_address=shipping_address,
-                        tariff=delivery_method,
-                    )
-                    logger.info(f"Delivery cost calculated: {delivery_cost} RUB")
-                except Exception as e:
-                    logger.error(f"Failed to calculate delivery cost: {e}")
-                    from django.conf import settings
-                    delivery_cost = Decimal(str(settings.DEFAULT_DELIVERY_COST))
+    def _calculate_delivery_cost(
+        self, validated_items: List[Dict], shipping_address: Optional[str]
+    ) -> Decimal:
+        """Шаг 2: стоимость доставки (HTTP к Яндекс Доставке, вне транзакции)."""
+        if not shipping_address:
+            return Decimal("0")
 
-            total_amount = items_total + delivery_cost
+        from apps.delivery.service import DeliveryService
 
-            order = Order.objects.create(
-                total_amount=total_amount,
-                delivery_cost=delivery_cost,
-                delivery_method=delivery_method,
-                status="awaiting_payment",
+        try:
+            delivery_cost = DeliveryService().calculate_delivery_cost(
+                items_data=validated_items,
+                destination_address=shipping_address,
+                tariff="self_pickup",
+            )
+            logger.info(f"Delivery cost calculated: {delivery_cost} RUB")
+            return delivery_cost
+        except Exception as e:
+            logger.error(f"Failed to calculate delivery cost: {e}")
+            return Decimal(str(settings.DEFAULT_DELIVERY_COST))
+
+    @retry_on_contention(name="order_finalize")
+    def _finalize_order(
+        self,
+        order: Order,
+        delivery_cost: Decimal,
+        total_amount: Decimal,
+        payment: Payment,
+        payment_result,
+    ) -> None:
+        """Шаг 3: сохранение суммы и ID платежа (короткая транзакция)."""
+        with transaction.atomic():
+            order.delivery_cost = delivery_cost
+            order.total_amount = total_amount
+            order.payment_url = payment_result.confirmation_url
+            order.save(
+                update_fields=[
+                    "delivery_cost",
+                    "total_amount",
+                    "payment_url",
+                    "updated_at",
+                ]
             )
 
-            customer = OrderCustomer.objects.create(order=order, **customer_data)
+            self._attach_provider_payment(payment, payment_result.payment_id)
 
-            self._create_order_items_and_update_stock(order, validated_items)
+        logger.info(
+            f"Payment created for order {order.id}: {payment_result.payment_id}"
+        )
 
-            try:
-                payment_url = self._create_payment(
-                    order, total_amount, return_url, customer.email
+    def _release_order(
+        self,
+        order: Order,
+        payment: Optional[Payment] = None,
+        payment_result=None,
+    ) -> None:
+        """
+        Компенсация: отмена заказа и снятие резерва, если заказ не завершён.
+        Платёж, который провайдер не создал, удаляется. Созданный платёж
+        нельзя отменить (YooKassa отменяет только waiting_for_capture), поэтому
+        его ID сохраняется: оплата по нему придёт вебхуком на этот заказ.
+        Если компенсация не удалась, резерв истечёт сам, а заказ отменит
+        expire_stock_reservations.
+        """
+        try:
+            if payment is not None and payment_result is None:
+                payment.delete()
+            elif payment is not None:
+                with transaction.atomic():
+                    self._attach_provider_payment(payment, payment_result.payment_id)
+                logger.warning(
+                    f"Order {order.id} canceled with live payment "
+                    f"{payment_result.payment_id}"
                 )
-                order.payment_url = payment_url
-                order.save(update_fields=["payment_url"])
+        except Exception as e:
+            logger.error(
+                f"Failed to save payment for order {order.id}: {e}", exc_info=True
+            )
 
-                logger.info(
-                    f"Order {order.id} created successfully with payment and delivery"
-                )
-                return order
+        try:
+            self._cancel_order(order)
+            logger.info(f"Order {order.id} canceled, stock released")
+        except Exception as e:
+            logger.error(
+                f"Failed to release stock for order {order.id}: {e}", exc_info=True
+            )
 
-            except Exception as e:
-                logger.error(
-                    f"Failed to create payment for order {order.id}: {e}", exc_info=True
-                )
-                raise serializers.ValidationError(
-                    {"payment": "Не удалось создать платеж. Попробуйте позже."}
-                )
+    @staticmethod
+    def _attach_provider_payment(payment: Payment, provider_payment_id: str) -> None:
+        """
+        Записывает ID платежа провайдера. Повтор запроса с тем же ключом
+        получает тот же платёж - он переходит от отменённой попытки к
+        новому заказу. Вызывается внутри транзакции.
+        """
+        Payment.objects.filter(provider_payment_id=provider_payment_id).exclude(
+            pk=payment.pk
+        ).update(provider_payment_id=None)
+        payment.provider_payment_id = provider_payment_id
+        payment.save(update_fields=["provider_payment_id"])
+
+    @retry_on_contention(name="order_release")
+    def _cancel_order(self, order: Order) -> None:
+        with transaction.atomic():
+            return_order_stock(
+                order, f"Возврат: не удалось создать платеж {str(order.id)[:8]}"
+            )
+            order.status = "canceled"
+            order.save(update_fields=["status", "updated_at"])
 
     def _validate_and_calculate_items(
         self, items_data: List[Dict], variants
     ) -> tuple[List[Dict], Decimal]:
         """
         Проверяет доступность товаров и вычисляет общую стоимость.
+        Остаток сравнивается с available_stock (stock минус активные резервы)
+        с учётом повторов одного варианта в корзине.
         """
         validated_items = []
         total_amount = Decimal(0)
+        variants_by_id = {variant.id: variant for variant in variants}
+        requested_totals: Dict[int, int] = {}
 
         for item_data in items_data:
             requested_variant = item_data["product_variant"]
             requested_quantity = int(item_data.get("quantity", 1))
 
-            variant = next((v for v in variants if v.id == requested_variant.id), None)
+            variant = variants_by_id.get(requested_variant.id)
 
             if not variant or not variant.is_active:
                 logger.warning(f"Variant {requested_variant.id} is not available")
@@ -117,15 +594,19 @@ class OrderCreationService:
                     {"items": f"Товар (ID: {requested_variant.id}) недоступен"}
                 )
 
-            if variant.stock < requested_quantity:
+            requested_totals[variant.id] = (
+                requested_totals.get(variant.id, 0) + requested_quantity
+            )
+            if variant.available_stock < requested_totals[variant.id]:
                 logger.warning(
                     f"Insufficient stock for variant {requested_variant.id}: "
-                    f"requested={requested_quantity}, available={variant.stock}"
+                    f"requested={requested_totals[variant.id]}, "
+                    f"available={variant.available_stock}"
                 )
                 raise serializers.ValidationError(
                     {
                         "items": f"Недостаточно товара (ID: {requested_variant.id}). "
-                        f"Доступно: {variant.stock}"
+                        f"Доступно: {variant.available_stock}"
                     }
                 )
 
@@ -143,62 +624,33 @@ class OrderCreationService:
 
         return validated_items, total_amount
 
-    def _create_order_items_and_update_stock(
+    def _create_order_items_and_reservations(
         self, order: Order, validated_items: List[Dict]
     ) -> None:
-        order_items = []
-        stock_history_records = []
+        expires_at = timezone.now() + timedelta(
+            minutes=settings.STOCK_RESERVATION_TTL_MINUTES
+        )
 
+        reserved: Dict[int, int] = {}
         for item_data in validated_items:
-            variant = item_data["product_variant"]
-            quantity = item_data["quantity"]
-
-            order_items.append(OrderItem(order=order, **item_data))
-
-            stock_before = variant.stock
+            variant_id = item_data["product_variant"].id
+            reserved[variant_id] = reserved.get(variant_id, 0) + item_data["quantity"]
 
-            variant.stock -= quantity
-            variant.save(update_fields=["stock"])
-
-            stock_history_records.append(
-                StockHistory(
-                    product_variant=variant,
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, **item_data) for item_data in validated_items]
+        )
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(
                     order=order,
-                    action="order_created",
-                    quantity_change=-quantity,
-                    stock_before=stock_before,
-                    stock_after=variant.stock,
-                    note=f"Резерв при создании заказа {str(order.id)[:8]}",
+                    product_variant_id=variant_id,
+                    quantity=quantity,
+                    expires_at=expires_at,
                 )
-            )
-
-        OrderItem.objects.bulk_create(order_items)
-        StockHistory.objects.bulk_create(stock_history_records)
-
-    def _create_payment(
-        self,
-        order: Order,
-        amount: Decimal,
-        return_url: Optional[str],
-        customer_email: str,
-    ) -> str:
-        payment_result = self.payment_provider.create_payment(
-            amount=amount,
-            currency="RUB",
-            order_id=str(order.id),
-            return_url=return_url,
-            customer_email=customer_email,
-        )
-
-        Payment.objects.create(
-            order=order,
-            provider="yookassa",
-            provider_payment_id=payment_result.payment_id,
-            amount=amount,
-            status="pending",
+                for variant_id, quantity in reserved.items()
+            ]
         )
-
-        logger.info(
-            f"Payment created for order {order.id}: {payment_result.payment_id}"
+        # Каталог показывает доступный остаток: резерв уменьшает его
+        schedule_stock_refresh(
+            item_data["product_variant"].product_id for item_data in validated_items
         )
-        return payment_result.confirmation_url
@@ -1,3 +1,518 @@
-from django.test import TestCase
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.common.db import get_retry_stats, retry_on_contention
+from apps.main.models import (
+    CatalogProduct,
+    Color,
+    Product,
+    ProductGroup,
+    ProductVariant,
+    Size,
+)
+from apps.main.service import CatalogProjectionService
+from apps.main.snapshot import CatalogSnapshotService
+from apps.payment.models import Payment
+from apps.payment.provider import CreatePaymentResult, PaymentProviderBase
+from config.admin import admin_site
+
+from .admin import OrderAdmin
+from .models import (
+    IdempotencyKey,
+    Order,
+    OrderCustomer,
+    StockHistory,
+    StockReservation,
+    annotate_available_stock,
+)
+from .service import (
+    OrderCreationService,
+    OrderIdempotencyService,
+    cancel_unpaid_order,
+    commit_order_stock,
+    decrement_stock,
+)
+
+
+class FakePaymentProvider(PaymentProviderBase):
+    """Платёжный провайдер для тестов: запоминает вызовы, может падать."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    def create_payment(self, amount, currency, **kwargs):
+        self.calls.append({"amount": amount, "currency": currency, **kwargs})
+        if self.fail:
+            raise ConnectionError("provider unavailable")
+        payment_id = f"pay-{len(self.calls)}"
+        return CreatePaymentResult(
+            confirmation_url=f"https://pay.example.com/{payment_id}",
+            payment_id=payment_id,
+            status="pending",
+            payment=None,
+        )
+
+
+def create_variants(count: int, stock: int = 5) -> list:
+    group = ProductGroup.objects.create(name="Hoodie", slug="hoodie", is_active=True)
+    product = Product.objects.create(
+        group=group,
+        color=Color.objects.create(name="Black", slug="black"),
+        name="Hoodie Black",
+        slug="hoodie-black",
+        price=Decimal("1000.00"),
+        is_active=True,
+    )
+    return [
+        ProductVariant.objects.create(
+            product=product,
+            size=Size.objects.create(name=f"S{i}", position=i),
+            stock=stock,
+        )
+        for i in range(count)
+    ]
+
+
+CUSTOMER = {
+    "full_name": "Иван Иванов",
+    "email": "ivan@example.com",
+    "phone": "+79990000000",
+    "shipping_address": "",
+}
+
+
+class OrderSparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(total_amount=Decimal("2000.00"))
+        OrderCustomer.objects.create(
+            order=self.order,
+            full_name="Иван Иванов",
+            email="ivan@example.com",
+            phone="+79990000000",
+        )
+        self.url = reverse("order-detail", kwargs={"id": self.order.id})
+
+    def test_full_order(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["customer_info"]["full_name"], "Иван Иванов")
+        self.assertEqual(response.data["items"], [])
+
+    def test_fields_skip_relations(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"fields": "id,status,total_amount"})
+        self.assertEqual(
+            response.data,
+            {
+                "id": str(self.order.id),
+                "status": "awaiting_payment",
+                "total_amount": "2000.00",
+            },
+        )
+
+
+class OrderCheckoutTests(TestCase):
+    def setUp(self):
+        self.variants = create_variants(2)
+        self.items = [
+            {"product_variant": self.variants[0], "quantity": 2},
+            {"product_variant": self.variants[1], "quantity": 1},
+        ]
+
+    def test_order_reserved_and_paid(self):
+        provider = FakePaymentProvider()
+        order = OrderCreationService(payment_provider=provider).create_order_with_payment(
+            self.items, dict(CUSTOMER)
+        )
+
+        self.assertEqual(order.total_amount, Decimal("3000.00"))
+        self.assertEqual(order.payment_url, "https://pay.example.com/pay-1")
+        self.assertEqual(provider.calls[0]["order_id"], str(order.id))
+        self.assertEqual(Payment.objects.get(order=order).amount, Decimal("3000.00"))
+        # Остаток не списан, но зарезервирован
+        self.assertEqual(
+            list(ProductVariant.objects.values_list("stock", flat=True)), [5, 5]
+        )
+        self.assertEqual(
+            list(
+                annotate_available_stock(ProductVariant.objects.order_by("id"))
+                .values_list("available_stock", flat=True)
+            ),
+            [3, 4],
+        )
+
+    def test_finalize_failure_keeps_live_payment(self):
+        provider = FakePaymentProvider()
+        service = OrderCreationService(payment_provider=provider)
+        with mock.patch.object(
+            OrderCreationService,
+            "_finalize_order",
+            side_effect=OperationalError("connection lost"),
+        ), self.assertRaises(serializers.ValidationError):
+            service.create_order_with_payment(self.items, dict(CUSTOMER))
+
+        order = Order.objects.get()
+        self.assertEqual(order.status, "canceled")
+        self.assertFalse(StockReservation.objects.exists())
+        # вебхук об оплате найдёт платёж, созданный у провайдера
+        payment = Payment.objects.get(provider_payment_id="pay-1")
+        self.assertEqual(payment.order, order)
+        self.assertEqual(payment.idempotence_key, provider.calls[0]["idempotence_key"])
+
+        # повтор с тем же ключом получает тот же платёж у провайдера
+        provider.calls.clear()
+        retry = service.create_order_with_payment(
+            self.items, dict(CUSTOMER), payment_idempotence_key=payment.idempotence_key
+        )
+        self.assertEqual(Payment.objects.get(provider_payment_id="pay-1").order, retry)
+        self.assertIsNone(Payment.objects.get(pk=payment.pk).provider_payment_id)
+
+    @override_settings(CATALOG_SNAPSHOT_AUTO_REFRESH=True)
+    def test_order_does_not_rerender_snapshot(self):
+        service = OrderCreationService(payment_provider=FakePaymentProvider())
+        with mock.patch.object(
+            CatalogSnapshotService, "render_category_products"
+        ) as render_category, mock.patch.object(
+            CatalogSnapshotService, "refresh"
+        ) as refresh, self.captureOnCommitCallbacks(execute=True):
+            service.create_order_with_payment(self.items, dict(CUSTOMER))
+
+        render_category.assert_not_called()
+        refresh.assert_not_called()
+        # Проекция каталога при этом видит резерв
+        self.assertEqual(
+            CatalogProduct.objects.get(pk=self.variants[0].product_id).available_sizes,
+            ["S0", "S1"],
+        )
+
+    def test_payment_failure_releases_reservation(self):
+        service = OrderCreationService(payment_provider=FakePaymentProvider(fail=True))
+        with self.assertRaises(serializers.ValidationError):
+            service.create_order_with_payment(self.items, dict(CUSTOMER))
+
+        order = Order.objects.get()
+        self.assertEqual(order.status, "canceled")
+        self.assertFalse(Payment.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(
+            list(ProductVariant.objects.values_list("stock", flat=True)), [5, 5]
+        )
+
+
+class StockReservationTests(TestCase):
+    def reserve(self, items):
+        return OrderCreationService(payment_provider=FakePaymentProvider())._reserve_order(
+            items, dict(CUSTOMER)
+        )
+
+    def test_constant_queries_and_stock_untouched(self):
+        variants = create_variants(20, stock=3)
+        counts = []
+        for size in (2, 20):
+            items = [{"product_variant": v, "quantity": 1} for v in variants[:size]]
+            with CaptureQueriesContext(connection) as queries:
+                order, _, _ = self.reserve(items)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(order.reservations.count(), 20)
+        self.assertEqual(ProductVariant.objects.get(pk=variants[0].pk).stock, 3)
+        self.assertFalse(StockHistory.objects.exists())
+
+    def test_reservations_counted_after_variant_lock(self):
+        variant = create_variants(1, stock=3)[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.reserve([{"product_variant": variant, "quantity": 1}])
+
+        sql = [query["sql"] for query in queries]
+        lock = next(i for i, q in enumerate(sql) if 'FROM "product_variants"' in q)
+        reserved = next(i for i, q in enumerate(sql) if 'FROM "stock_reservations"' in q)
+        self.assertNotIn("stock_reservations", sql[lock])
+        self.assertGreater(reserved, lock)
+
+    def test_active_reservations_limit_and_expired_ignored(self):
+        variant = create_variants(1, stock=3)[0]
+        first, _, _ = self.reserve([{"product_variant": variant, "quantity": 2}])
+
+        with self.assertRaises(serializers.ValidationError):
+            self.reserve([{"product_variant": variant, "quantity": 2}])
+
+        # Просроченный резерв не учитывается ещё до запуска чистки
+        first.reservations.update(
+            expires_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        second, _, _ = self.reserve([{"product_variant": variant, "quantity": 3}])
+        self.assertEqual(second.reservations.get().quantity, 3)
+
+    def test_commit_on_payment_decrements_stock_once(self):
+        variant = create_variants(1, stock=3)[0]
+        order, _, _ = self.reserve([{"product_variant": variant, "quantity": 2}])
+
+        with transaction.atomic():
+            self.assertEqual(commit_order_stock(order, "paid"), 1)
+            self.assertEqual(commit_order_stock(order, "paid again"), 0)
+
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 1)
+        self.assertFalse(StockReservation.objects.exists())
+        history = StockHistory.objects.get(order=order)
+        self.assertEqual(history.action, "order_paid")
+        self.assertEqual((history.stock_before, history.stock_after), (3, 1))
+
+    def test_decrement_stock_refreshes_catalog_projection(self):
+        variant = create_variants(1, stock=2)[0]
+        CatalogProjectionService().refresh_products([variant.product_id])
+        self.assertTrue(CatalogProduct.objects.get(pk=variant.product_id).in_stock)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                decrement_stock({variant.id: 2})
+
+        entry = CatalogProduct.objects.get(pk=variant.product_id)
+        self.assertFalse(entry.in_stock)
+        self.assertEqual(entry.available_sizes, [])
+
+    def test_catalog_shows_stock_minus_reservations(self):
+        variant = create_variants(1, stock=2)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            order, _, _ = self.reserve([{"product_variant": variant, "quantity": 2}])
+        self.assertFalse(CatalogProduct.objects.get(pk=variant.product_id).in_stock)
+
+        order.reservations.update(
+            expires_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("expire_stock_reservations", stdout=io.StringIO())
+        self.assertTrue(CatalogProduct.objects.get(pk=variant.product_id).in_stock)
+
+    def test_commit_after_stock_sold_out_clamps_to_zero(self):
+        variant = create_variants(1, stock=3)[0]
+        order, _, _ = self.reserve([{"product_variant": variant, "quantity": 2}])
+        ProductVariant.objects.filter(pk=variant.pk).update(stock=1)
+
+        with transaction.atomic():
+            commit_order_stock(order, "paid")
+
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 0)
+        history = StockHistory.objects.get(order=order)
+        self.assertEqual((history.quantity_change, history.stock_after), (-1, 0))
+
+
+def contention_error(sqlstate: str) -> OperationalError:
+    error = OperationalError("could not serialize access")
+    error.__cause__ = type("DriverError", (Exception,), {"pgcode": sqlstate})()
+    return error
+
+
+@mock.patch("apps.common.db.time.sleep")
+class ContentionRetryTests(SimpleTestCase):
+    def test_retries_deadlock_and_serialization_failures(self, sleep):
+        calls = iter([contention_error("40P01"), contention_error("40001"), "ok"])
+
+        @retry_on_contention(name="test_retry")
+        def checkout():
+            result = next(calls)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.assertEqual(checkout(), "ok")
+        self.assertEqual(sleep.call_count, 2)
+        stats = get_retry_stats()
+        self.assertGreaterEqual(stats["test_retry:40P01"], 1)
+        self.assertGreaterEqual(stats["test_retry:40001"], 1)
+
+    def test_other_errors_and_exhaustion_raise(self, sleep):
+        @retry_on_contention(name="test_unique")
+        def unique_violation():
+            raise contention_error("23505")
+
+        @retry_on_contention(name="test_give_up", max_attempts=2)
+        def always_deadlocks():
+            raise contention_error("40P01")
+
+        with self.assertRaises(OperationalError):
+            unique_violation()
+        sleep.assert_not_called()
+        with self.assertRaises(OperationalError):
+            always_deadlocks()
+        self.assertEqual(sleep.call_count, 1)
+
+
+class CancelExpiredOrdersTests(TestCase):
+    def test_releases_reservations_and_skips_paid_orders(self):
+        variant = create_variants(1)[0]
+        service = OrderCreationService(payment_provider=FakePaymentProvider())
+        expired = service.create_order_with_payment(
+            [{"product_variant": variant, "quantity": 2}], dict(CUSTOMER)
+        )
+        paid = service.create_order_with_payment(
+            [{"product_variant": variant, "quantity": 1}], dict(CUSTOMER)
+        )
+        Order.objects.filter(pk=paid.pk).update(status="paid")
+        Order.objects.update(created_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+        call_command("cancel_expired_orders", stdout=io.StringIO())
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, "canceled")
+        self.assertEqual(Payment.objects.get(order=expired).status, "canceled")
+        self.assertEqual(Order.objects.get(pk=paid.pk).status, "paid")
+        self.assertFalse(expired.reservations.exists())
+        self.assertTrue(Order.objects.get(pk=paid.pk).reservations.exists())
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 5)
+
+    def test_expire_stock_reservations_cancels_unpaid_orders(self):
+        variant = create_variants(1)[0]
+        service = OrderCreationService(payment_provider=FakePaymentProvider())
+        expired = service.create_order_with_payment(
+            [{"product_variant": variant, "quantity": 2}], dict(CUSTOMER)
+        )
+        active = service.create_order_with_payment(
+            [{"product_variant": variant, "quantity": 1}], dict(CUSTOMER)
+        )
+        expired.reservations.update(
+            expires_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+
+        call_command("expire_stock_reservations", stdout=io.StringIO())
+
+        self.assertEqual(Order.objects.get(pk=expired.pk).status, "canceled")
+        self.assertEqual(Payment.objects.get(order=expired).status, "canceled")
+        self.assertEqual(Order.objects.get(pk=active.pk).status, "awaiting_payment")
+        self.assertEqual(
+            list(StockReservation.objects.values_list("order_id", flat=True)),
+            [active.pk],
+        )
+
+
+@mock.patch.object(
+    OrderCreationService, "_calculate_delivery_cost", return_value=Decimal("0")
+)
+@mock.patch("apps.orders.service.YookassaProvider")
+class OrderIdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.variant = create_variants(1)[0]
+        self.url = reverse("order-create")
+        self.body = {
+            "items": [{"product_variant": self.variant.id, "quantity": 2}],
+            "customer_info": dict(CUSTOMER, shipping_address="Москва, Тверская 1"),
+        }
+
+    def post(self, body, key, ip="127.0.0.1"):
+        return self.client.post(
+            self.url,
+            body,
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            REMOTE_ADDR=ip,
+        )
+
+    def payment_key(self, key, ip="127.0.0.1"):
+        return OrderIdempotencyService.payment_key(
+            f"ip:{ip}", key, OrderIdempotencyService.fingerprint(self.body)
+        )
+
+    def test_retry_replays_response_without_new_order_or_payment(
+        self, provider_cls, delivery_cost
+    ):
+        provider = provider_cls.return_value = FakePaymentProvider()
+
+        first = self.post(self.body, "retry-1")
+        # Повторы не расходуют лимит OrderCreateThrottle (5/minute)
+        replays = [self.post(self.body, "retry-1") for _ in range(6)]
+
+        self.assertEqual(first.status_code, 201)
+        for replay in replays:
+            self.assertEqual(replay.status_code, 201)
+            self.assertEqual(replay["Idempotent-Replayed"], "true")
+            self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        self.assertEqual(len(provider.calls), 1)
+        self.assertEqual(provider.calls[0]["idempotence_key"], self.payment_key("retry-1"))
+        self.assertEqual(len(provider.calls[0]["idempotence_key"]), 64)
+
+    def test_keys_are_scoped_per_client(self, provider_cls, delivery_cost):
+        provider = provider_cls.return_value = FakePaymentProvider()
+
+        self.assertEqual(self.post(self.body, "shared", ip="10.0.0.1").status_code, 201)
+        response = self.post(self.body, "shared", ip="10.0.0.2")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertNotEqual(
+            provider.calls[0]["idempotence_key"], provider.calls[1]["idempotence_key"]
+        )
+
+    def test_stale_key_takeover_reuses_payment_key(self, provider_cls, delivery_cost):
+        provider = provider_cls.return_value = FakePaymentProvider()
+        # Процесс упал после создания платежа, не сохранив ответ
+        IdempotencyKey.objects.create(
+            client="ip:127.0.0.1",
+            key="crashed",
+            fingerprint=OrderIdempotencyService.fingerprint(self.body),
+            locked_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+
+        self.assertEqual(self.post(self.body, "crashed").status_code, 201)
+        self.assertEqual(provider.calls[0]["idempotence_key"], self.payment_key("crashed"))
+
+    def test_key_reused_with_other_body_or_in_progress(self, provider_cls, delivery_cost):
+        provider_cls.return_value = FakePaymentProvider()
+        self.post(self.body, "retry-2")
+
+        other = dict(self.body, items=[{"product_variant": self.variant.id, "quantity": 1}])
+        self.assertEqual(self.post(other, "retry-2").status_code, 422)
+
+        IdempotencyKey.objects.create(
+            client="ip:127.0.0.1",
+            key="retry-3",
+            fingerprint=OrderIdempotencyService.fingerprint(self.body),
+            locked_at=timezone.now(),
+        )
+        self.assertEqual(self.post(self.body, "retry-3").status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_releases_key(self, provider_cls, delivery_cost):
+        provider_cls.return_value = FakePaymentProvider(fail=True)
+        self.assertEqual(self.post(self.body, "retry-4").status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        provider_cls.return_value = FakePaymentProvider()
+        self.assertEqual(self.post(self.body, "retry-4").status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().order.status, "awaiting_payment")
+
+
+class MarkAsPaidActionTests(TestCase):
+    def test_skips_canceled_orders(self):
+        variant = create_variants(1, stock=3)[0]
+        service = OrderCreationService(payment_provider=FakePaymentProvider())
+        paid, canceled = [
+            service.create_order_with_payment(
+                [{"product_variant": variant, "quantity": 1}], dict(CUSTOMER)
+            )
+            for _ in range(2)
+        ]
+        cancel_unpaid_order(canceled, "canceled")
+
+        model_admin = OrderAdmin(Order, admin_site)
+        with mock.patch.object(model_admin, "message_user"):
+            model_admin.mark_as_paid(None, Order.objects.all())
+
+        self.assertEqual(Order.objects.get(pk=paid.pk).status, "paid")
+        self.assertEqual(Order.objects.get(pk=canceled.pk).status, "canceled")
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 2)
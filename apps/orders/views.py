@@ -1,14 +1,18 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
 
+from apps.common.fieldsets import SparseFieldsetViewMixin
 
 from .models import Order
 from .serializers import OrderSerializer, OrderCreateSerializer
+from .service import OrderIdempotencyService
 from apps.common.throttling import OrderCreateThrottle
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """
     Представление для получения деталей заказа по его ID.
+    Поддерживает выборочные поля: ?fields=id,status / ?omit=items
     """
 
     queryset = Order.objects.all()
@@ -20,9 +24,88 @@ class OrderDetailView(generics.RetrieveAPIView):
 class OrderCreateView(generics.CreateAPIView):
     """
     Представление для создания нового заказа.
+
+    Необязательный заголовок Idempotency-Key защищает от повторов клиента:
+    повтор с тем же ключом и телом получает сохранённый ответ (заголовок
+    Idempotent-Replayed: true) без нового заказа, резерва и платежа и не
+    расходует лимит OrderCreateThrottle. Ключи действуют в пределах клиента
+    (пользователь или IP). Тот же ключ с другим телом - 422, пока первый
+    запрос выполняется - 409. Сохраняется только успешный ответ: после
+    ошибки ключ можно использовать повторно.
     """
 
     queryset = Order.objects.all()
     serializer_class = OrderCreateSerializer
     permission_classes = [permissions.AllowAny]
     throttle_classes = [OrderCreateThrottle]
+
+    def create(self, request, *args, **kwargs):
+        key = self.get_idempotency_key(request)
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        idempotency = OrderIdempotencyService()
+        client = self.get_idempotency_client(request)
+        fingerprint = idempotency.fingerprint(request.data)
+
+        record = idempotency.acquire(client, key, fingerprint)
+        if record.response_status is not None:
+            return self._replay(record)
+
+        self.payment_idempotence_key = idempotency.payment_key(client, key, fingerprint)
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            idempotency.release(record)
+            raise
+
+        idempotency.complete(
+            record, response.status_code, response.data, order_id=response.data.get("id")
+        )
+        return response
+
+    def perform_create(self, serializer):
+        serializer.save(
+            payment_idempotence_key=getattr(self, "payment_idempotence_key", None)
+        )
+
+    def is_idempotent_replay(self, request) -> bool:
+        """Есть сохранённый ответ на этот запрос (вызывается из throttle)."""
+        key = self.get_idempotency_key(request)
+        if not key:
+            return False
+        idempotency = OrderIdempotencyService()
+        return (
+            idempotency.find_replay(
+                self.get_idempotency_client(request),
+                key,
+                idempotency.fingerprint(request.data),
+            )
+            is not None
+        )
+
+    @staticmethod
+    def get_idempotency_key(request):
+        key = request.headers.get("Idempotency-Key")
+        if key and len(key) > OrderIdempotencyService.MAX_KEY_LENGTH:
+            raise serializers.ValidationError(
+                {
+                    "idempotency_key": f"Idempotency-Key длиннее "
+                    f"{OrderIdempotencyService.MAX_KEY_LENGTH} символов"
+                }
+            )
+        return key
+
+    @staticmethod
+    def get_idempotency_client(request) -> str:
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{OrderCreateThrottle().get_ident(request)}"
+
+    @staticmethod
+    def _replay(record) -> Response:
+        return Response(
+            record.response_body,
+            status=record.response_status,
+            headers={"Idempotent-Replayed": "true"},
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_alter_payment_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='idempotence_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Ключ идемпотентности у провайдера'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='provider_payment_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, unique=True, verbose_name='ID платежа у провайдера'),
+        ),
+    ]
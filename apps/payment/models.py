@@ -20,11 +20,20 @@ class Payment(models.Model):
         verbose_name="Заказ",
     )
     provider = models.CharField(max_length=100, verbose_name="Провайдер платежа")
+    # Пусто, пока провайдер не ответил: запись создаётся до его вызова
     provider_payment_id = models.CharField(
         max_length=100,
         verbose_name="ID платежа у провайдера",
         unique=True,
         db_index=True,
+        null=True,
+        blank=True,
+    )
+    idempotence_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name="Ключ идемпотентности у провайдера",
     )
 
     amount = models.DecimalField(
@@ -2,6 +2,8 @@ import uuid
 from yookassa import Configuration, Payment
 from django.conf import settings
 
+from apps.common.metrics import timed_outbound
+
 from .base import PaymentProviderBase
 from .schemas import CreatePaymentResult
 
@@ -15,11 +17,13 @@ Configuration.configure(
 class YookassaProvider(PaymentProviderBase):
     """Провайдер платежей YooKassa."""
 
+    @timed_outbound("yookassa")
     def get_payment(self, payment_id: str):
         """Получение информации о платеже по его ID."""
         payment = Payment.find_one(payment_id)
         return payment
 
+    @timed_outbound("yookassa")
     def create_payment(
         self,
         order_id: str,
@@ -28,10 +32,15 @@ class YookassaProvider(PaymentProviderBase):
         return_url: str = None,
         payment_method: str = "bank_card",
         customer_email: str = None,
+        idempotence_key: str = None,
     ) -> CreatePaymentResult:
-        """Создание платежа через YooKassa."""
+        """
+        Создание платежа через YooKassa.
+        idempotence_key (до 64 символов) - повтор с тем же ключом вернёт
+        уже созданный платёж; без него генерируется случайный.
+        """
 
-        idempotence_key = str(uuid.uuid4())
+        idempotence_key = idempotence_key or str(uuid.uuid4())
         payment = Payment.create(
             {
                 "amount": {
@@ -1,14 +1,16 @@
 import json
 import logging
-import time
 import ipaddress
 
-from functools import wraps
 from django.conf import settings
-from django.db import transaction, OperationalError, connection
+from django.db import transaction, connection
 
 from yookassa.domain.notification import WebhookNotification
 
+from apps.common.db import retry_on_contention
+from apps.orders.models import Order
+from apps.orders.service import commit_order_stock, return_order_stock
+
 from .models import Payment, PaymentEvent
 
 logger = logging.getLogger(__name__)
@@ -25,41 +27,6 @@ YOOKASSA_IPS = [
 ]
 
 
-def retry_on_db_locked(max_retries=3, delay=0.5):
-    """Декоратор для повторной попытки при OperationalError (database is locked)"""
-
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except OperationalError as e:
-                    last_exception = e
-                    if "database is locked" in str(e):
-                        if attempt < max_retries - 1:
-                            wait_time = delay * (2**attempt)  # Exponential backoff
-                            logger.warning(
-                                f"Database locked on attempt {attempt + 1}/{max_retries}, "
-                                f"retrying in {wait_time:.2f}s..."
-                            )
-                            time.sleep(wait_time)
-                        else:
-                            logger.error(
-                                f"Database still locked after {max_retries} attempts, giving up"
-                            )
-                            raise
-                    else:
-                        raise
-            if last_exception:
-                raise last_exception
-
-        return wrapper
-
-    return decorator
-
-
 class PaymentService:
     @staticmethod
     def get_client_ip(request):
@@ -100,7 +67,7 @@ class PaymentService:
             return False
 
     @staticmethod
-    @retry_on_db_locked(max_retries=10, delay=0.5)
+    @retry_on_contention(name="payment_webhook", max_attempts=10, base_delay=0.1)
     def payment_acceptance(
         notification: WebhookNotification,
         payload: bytes,
@@ -146,10 +113,14 @@ class PaymentService:
             # КРИТИЧЕСКИ ВАЖНО: отделяем транзакцию БД от отправки email
             order = None
             with transaction.atomic():
-                # Повторно получаем с блокировкой в транзакции
+                # Повторно получаем с блокировкой в транзакции.
+                # Порядок блокировок везде один: платёж, заказ, варианты по id
                 payment = Payment.objects.select_for_update().get(
                     provider_payment_id=payment_id
                 )
+                payment.order = Order.objects.select_for_update().get(
+                    pk=payment.order_id
+                )
 
                 if event_type == "payment.succeeded":
                     order = PaymentService._handle_payment_succeeded(payment, payload)
@@ -199,6 +170,12 @@ class PaymentService:
         order.save(update_fields=["status"])
         logger.info(f"[DB TRANSACTION] Order {order.id} status saved")
 
+        # Резерв переходит в списание остатка со склада
+        committed = commit_order_stock(
+            order, f"Списание: платеж {payment.provider_payment_id} оплачен"
+        )
+        logger.info(f"[DB TRANSACTION] Stock committed for {committed} variants")
+
         PaymentEvent.objects.create(
             payment=payment,
             event_type="payment.succeeded",
@@ -234,7 +211,7 @@ class PaymentService:
 
     @staticmethod
     def _handle_payment_canceled(payment: Payment, payload: dict):
-        """Обработка отмены платежа с возвратом товара на склад (внутри транзакции)"""
+        """Обработка отмены платежа со снятием резерва (внутри транзакции)"""
         logger.info(
             f"[DB TRANSACTION] Starting payment cancellation handler for {payment.provider_payment_id}"
         )
@@ -245,12 +222,8 @@ class PaymentService:
         order = payment.order
         order.status = "canceled"
 
-        # Возврат товара на склад
-        order_items = order.items.select_related("product_variant").all()
-        for item in order_items:
-            variant = item.product_variant
-            variant.stock += item.quantity
-            variant.save(update_fields=["stock"])
+        # Снятие резерва (или возврат на склад, если остаток уже списан)
+        return_order_stock(order, f"Возврат: платеж {payment.provider_payment_id} отменен")
 
         order.save(update_fields=["status"])
 
@@ -261,7 +234,7 @@ class PaymentService:
         )
 
         logger.info(
-            f"Payment {payment.provider_payment_id} canceled, order {order.id} canceled, stock restored"
+            f"Payment {payment.provider_payment_id} canceled, order {order.id} canceled, stock released"
         )
 
         return order  # Возвращаем order для отправки email
@@ -0,0 +1,105 @@
+import io
+import logging
+from dataclasses import dataclass
+from typing import BinaryIO, List
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImageDerivative:
+    """Уменьшенная копия изображения в одном формате."""
+
+    name: str
+    format: str
+    width: int
+    height: int
+    content: bytes
+    content_type: str
+
+
+class ImageDerivativeGenerator:
+    """
+    Генерация производных изображений (Pillow) при загрузке.
+
+    Для каждого размера из SIZES (ширина в пикселях) создаются WebP и JPEG
+    (запасной вариант для клиентов без WebP). Изображения не увеличиваются:
+    размеры шире оригинала пропускаются, кроме самого маленького.
+    """
+
+    SIZES = {
+        "thumb": 160,
+        "card": 480,
+        "detail": 1080,
+        "zoom": 2000,
+    }
+    FORMATS = {
+        "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+        "jpeg": (
+            "JPEG",
+            "image/jpeg",
+            {"quality": 82, "optimize": True, "progressive": True},
+        ),
+    }
+    # Анимацию не пережимаем: derivatives для GIF не создаются
+    SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+    def generate(self, file: BinaryIO) -> List[ImageDerivative]:
+        file.seek(0)
+        with Image.open(file) as source:
+            source.load()
+            image = ImageOps.exif_transpose(source)
+        file.seek(0)
+
+        derivatives = []
+        widths = sorted(self.SIZES.items(), key=lambda item: item[1])
+        for index, (name, width) in enumerate(widths):
+            if width > image.width and index > 0:
+                continue
+            resized = self._resize(image, width)
+            for fmt, (pil_format, content_type, options) in self.FORMATS.items():
+                derivatives.append(
+                    ImageDerivative(
+                        name=name,
+                        format=fmt,
+                        width=resized.width,
+                        height=resized.height,
+                        content=self._encode(resized, pil_format, options),
+                        content_type=content_type,
+                    )
+                )
+
+        logger.info(
+            f"Сгенерировано производных изображений: {len(derivatives)} "
+            f"(оригинал {image.width}x{image.height})"
+        )
+        return derivatives
+
+    @staticmethod
+    def _resize(image: Image.Image, width: int) -> Image.Image:
+        if image.width <= width:
+            return image.copy()
+        height = max(1, round(image.height * width / image.width))
+        return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    @staticmethod
+    def _encode(image: Image.Image, pil_format: str, options: dict) -> bytes:
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        if pil_format == "JPEG" or not has_alpha:
+            if has_alpha:
+                # JPEG без прозрачности: подкладываем белый фон
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image.convert("RGBA"), mask=image.convert("RGBA"))
+                image = background
+            else:
+                image = image.convert("RGB")
+        else:
+            image = image.convert("RGBA")
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=pil_format, **options)
+        return buffer.getvalue()
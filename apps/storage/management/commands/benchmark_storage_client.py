@@ -0,0 +1,77 @@
+import time
+
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.storage import StorageService
+from apps.storage.providers.yandex import get_s3_client, reset_s3_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк клиента S3: новый boto3.client на каждую операцию "
+        "против общего клиента с пулом соединений"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="Количество операций в каждом замере (по умолчанию 50)",
+        )
+        parser.add_argument(
+            "--key",
+            help=(
+                "Ключ существующего файла: каждая операция делает HEAD к бакету "
+                "(без ключа замеряется только создание сервиса и клиента)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        key = options["key"]
+        if key and not settings.YANDEX_STORAGE_BUCKET_NAME:
+            raise CommandError("Не задан YANDEX_STORAGE_BUCKET_NAME")
+
+        self.stdout.write(
+            f"Операций: {repeat}, "
+            f"{'HEAD ' + key if key else 'только создание StorageService'}"
+        )
+
+        def per_call_client():
+            # Поведение до общего клиента: сессия и клиент на каждый вызов
+            client = boto3.client(
+                "s3",
+                endpoint_url=settings.YANDEX_STORAGE_ENDPOINT,
+                aws_access_key_id=settings.YANDEX_STORAGE_ACCESS_KEY,
+                aws_secret_access_key=settings.YANDEX_STORAGE_SECRET_KEY,
+                region_name=settings.YANDEX_STORAGE_REGION,
+            )
+            if key:
+                client.head_object(Bucket=settings.YANDEX_STORAGE_BUCKET_NAME, Key=key)
+
+        def shared_client():
+            service = StorageService()
+            if key:
+                service.storage_provider.get_file_info(key)
+
+        reset_s3_client()
+        get_s3_client()  # первое создание не входит в замер
+        timings = [
+            self._measure(name, func, repeat)
+            for name, func in (("per-call", per_call_client), ("shared", shared_client))
+        ]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Ускорение на операцию: x{timings[0] / timings[1]:.1f}")
+        )
+
+    def _measure(self, name, func, repeat) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        seconds = (time.perf_counter() - started) / repeat
+        self.stdout.write(f"{name:<9}: {seconds * 1000:8.2f} мс/операция")
+        return seconds
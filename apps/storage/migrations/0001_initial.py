@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file_key', models.CharField(max_length=255, verbose_name='Ключ в хранилище')),
+                ('url', models.URLField(max_length=500, unique=True, verbose_name='Публичный URL')),
+                ('file_size', models.PositiveBigIntegerField(verbose_name='Размер, байт')),
+                ('content_type', models.CharField(max_length=100, verbose_name='MIME-тип')),
+                ('derivatives', models.JSONField(blank=True, default=list, verbose_name='Производные изображения')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Загружен')),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+                'db_table': 'stored_files',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import models
+from django.db.models import F
+
+
+class StoredFile(models.Model):
+    """
+    Файл в хранилище, адресуемый по содержимому (SHA-256).
+    Одинаковые байты хранятся одним объектом; ref_count - число записей
+    (ProductMedia), которые ссылаются на его URL.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    file_key = models.CharField(max_length=255, verbose_name="Ключ в хранилище")
+    url = models.URLField(max_length=500, unique=True, verbose_name="Публичный URL")
+    file_size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    content_type = models.CharField(max_length=100, verbose_name="MIME-тип")
+    derivatives = models.JSONField(
+        default=list, blank=True, verbose_name="Производные изображения"
+    )
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Загружен")
+
+    class Meta:
+        db_table = "stored_files"
+        verbose_name = "Файл хранилища"
+        verbose_name_plural = "Файлы хранилища"
+
+    def __str__(self):
+        return f"{self.file_key} ({self.ref_count})"
+
+    @classmethod
+    def add_reference(cls, url: str) -> None:
+        """+1 ссылка; для URL вне хранилища ничего не делает."""
+        cls.objects.filter(url=url).update(ref_count=F("ref_count") + 1)
+
+    @classmethod
+    def remove_reference(cls, url: str) -> None:
+        cls.objects.filter(url=url, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1
+        )
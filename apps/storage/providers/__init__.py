@@ -1,10 +1,14 @@
 from .base import StorageProviderBase
-from .schemas import DeleteResult, UploadResult
+from .local import LocalStorageProvider
+from .schemas import DeleteResult, PresignedUpload, StoredObject, UploadResult
 from .yandex import YandexStorageProvider
 
 __all__ = [
     "StorageProviderBase",
     "YandexStorageProvider",
+    "LocalStorageProvider",
     "UploadResult",
+    "PresignedUpload",
+    "StoredObject",
     "DeleteResult",
 ]
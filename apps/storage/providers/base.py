@@ -1,14 +1,19 @@
 from abc import ABC
-from typing import BinaryIO
+from typing import BinaryIO, Iterable, Iterator, List, Optional
 
-from .schemas import DeleteResult, UploadResult
+from .schemas import DeleteResult, PresignedUpload, StoredObject, UploadResult
 
 
 class StorageProviderBase(ABC):
     """Базовый класс для провайдеров файлового хранилища."""
 
     def upload_file(
-        self, file: BinaryIO, filename: str, content_type: str, path_prefix: str = ""
+        self,
+        file: BinaryIO,
+        filename: str,
+        content_type: str,
+        path_prefix: str = "",
+        file_key: Optional[str] = None,
     ) -> UploadResult:
         """
         Метод для загрузки файла в хранилище.
@@ -19,12 +24,63 @@ class StorageProviderBase(ABC):
             filename: Имя файла
             content_type: MIME-тип файла
             path_prefix: Префикс пути для организации файлов
+            file_key: Готовый ключ файла (иначе генерируется из префикса и имени)
 
         Returns:
             UploadResult с URL и метаданными файла
         """
         raise NotImplementedError("Метод upload_file должен быть реализован.")
 
+    def create_presigned_upload(
+        self,
+        filename: str,
+        content_type: str,
+        max_size: int,
+        path_prefix: str = "",
+        expires_in: int = 600,
+    ) -> PresignedUpload:
+        """
+        Параметры прямой загрузки файла из браузера в хранилище.
+        Ограничения (тип, размер) должны проверяться самим хранилищем.
+
+        Args:
+            filename: Имя файла
+            content_type: MIME-тип файла
+            max_size: Максимальный размер файла в байтах
+            path_prefix: Префикс пути для организации файлов
+            expires_in: Время жизни подписи в секундах
+
+        Returns:
+            PresignedUpload с адресом формы и её полями
+        """
+        raise NotImplementedError(
+            "Метод create_presigned_upload должен быть реализован."
+        )
+
+    def get_file_info(self, file_key: str) -> Optional[UploadResult]:
+        """
+        Метаданные уже загруженного файла.
+
+        Args:
+            file_key: Ключ файла в хранилище
+
+        Returns:
+            UploadResult или None, если файла нет
+        """
+        raise NotImplementedError("Метод get_file_info должен быть реализован.")
+
+    def open_file(self, file_key: str) -> BinaryIO:
+        """
+        Чтение загруженного файла (например, для производных изображений).
+
+        Args:
+            file_key: Ключ файла в хранилище
+
+        Returns:
+            Файловый объект, позиция в начале
+        """
+        raise NotImplementedError("Метод open_file должен быть реализован.")
+
     def delete_file(self, file_url: str) -> DeleteResult:
         """
         Метод для удаления файла из хранилища.
@@ -37,3 +93,27 @@ class StorageProviderBase(ABC):
             DeleteResult с результатом операции
         """
         raise NotImplementedError("Метод delete_file должен быть реализован.")
+
+    def list_files(self, prefix: str) -> Iterator[StoredObject]:
+        """
+        Перебор всех объектов с ключами, начинающимися с prefix.
+
+        Args:
+            prefix: Префикс ключей (например, "products/")
+
+        Returns:
+            Итератор StoredObject (постранично, без загрузки всего списка)
+        """
+        raise NotImplementedError("Метод list_files должен быть реализован.")
+
+    def delete_files(self, file_keys: Iterable[str]) -> List[DeleteResult]:
+        """
+        Массовое удаление объектов по ключам.
+
+        Args:
+            file_keys: Ключи файлов
+
+        Returns:
+            DeleteResult для каждого ключа
+        """
+        raise NotImplementedError("Метод delete_files должен быть реализован.")
@@ -0,0 +1,143 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+
+from .base import StorageProviderBase
+from .schemas import DeleteResult, StoredObject, UploadResult
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStorageProvider(StorageProviderBase):
+    """
+    Провайдер для локальной файловой системы (MEDIA_ROOT).
+
+    Файлы раздаёт nginx из location /media/, URL строится от
+    STORAGE_LOCAL_BASE_URL. Подходит для тестов, бенчмарков, офлайн-разработки
+    и недорогого staging. Прямая загрузка из браузера (presigned POST)
+    не поддерживается - админка загружает файлы через форму.
+    """
+
+    def __init__(self, root: Optional[Path] = None, base_url: Optional[str] = None):
+        self.root = Path(root or settings.MEDIA_ROOT)
+        self.base_url = (base_url or settings.STORAGE_LOCAL_BASE_URL).rstrip("/")
+
+    def upload_file(
+        self,
+        file: BinaryIO,
+        filename: str,
+        content_type: str,
+        path_prefix: str = "",
+        file_key: Optional[str] = None,
+    ) -> UploadResult:
+        """
+        Копирование файла под MEDIA_ROOT потоково, через временный файл
+        и атомарную замену.
+        """
+        file_key = file_key or self._generate_file_key(filename, path_prefix)
+        path = self._path(file_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        file.seek(0)
+        descriptor, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(descriptor, "wb") as tmp:
+                shutil.copyfileobj(file, tmp)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            error_msg = f"Ошибка при сохранении файла {file_key}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+
+        file_size = path.stat().st_size
+        logger.info(f"Файл сохранён локально: {file_key} ({file_size} байт)")
+        return UploadResult(
+            url=self._get_public_url(file_key),
+            file_key=file_key,
+            file_size=file_size,
+            content_type=content_type,
+        )
+
+    def get_file_info(self, file_key: str) -> Optional[UploadResult]:
+        path = self._path(file_key)
+        if not path.is_file():
+            return None
+        return UploadResult(
+            url=self._get_public_url(file_key),
+            file_key=file_key,
+            file_size=path.stat().st_size,
+            content_type="",
+        )
+
+    def open_file(self, file_key: str) -> BinaryIO:
+        return self._path(file_key).open("rb")
+
+    def delete_file(self, file_url: str) -> DeleteResult:
+        file_key = self._extract_key_from_url(file_url)
+        if not file_key:
+            error_msg = f"Не удалось извлечь ключ файла из URL: {file_url}"
+            logger.error(error_msg)
+            return DeleteResult(success=False, error=error_msg)
+        return self._delete_key(file_key)
+
+    def list_files(self, prefix: str) -> Iterator[StoredObject]:
+        """Обход каталогов под MEDIA_ROOT; ключи - пути относительно корня."""
+        start = self.root / os.path.dirname(prefix)
+        for dirpath, _, filenames in os.walk(start):
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                file_key = path.relative_to(self.root).as_posix()
+                if name.startswith(".upload-") or not file_key.startswith(prefix):
+                    continue
+                stat = path.stat()
+                yield StoredObject(
+                    file_key=file_key,
+                    url=self._get_public_url(file_key),
+                    file_size=stat.st_size,
+                    last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                )
+
+    def delete_files(self, file_keys: Iterable[str]) -> List[DeleteResult]:
+        return [self._delete_key(file_key) for file_key in file_keys]
+
+    def _delete_key(self, file_key: str) -> DeleteResult:
+        try:
+            self._path(file_key).unlink(missing_ok=True)
+        except (OSError, ValueError) as e:
+            error_msg = f"Ошибка при удалении файла {file_key}: {str(e)}"
+            logger.error(error_msg)
+            return DeleteResult(success=False, file_key=file_key, error=error_msg)
+
+        logger.info(f"Файл успешно удалён: {file_key}")
+        return DeleteResult(success=True, file_key=file_key)
+
+    def _path(self, file_key: str) -> Path:
+        """Путь файла под корнем; ключи с выходом за корень отклоняются."""
+        path = (self.root / file_key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Недопустимый ключ файла: {file_key}")
+        return path
+
+    def _generate_file_key(self, filename: str, path_prefix: str = "") -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        unique_id = uuid.uuid4().hex[:12]
+        extension = Path(filename).suffix.lower()
+        prefix = path_prefix or "products"
+        return f"{prefix}/{unique_id}_{timestamp}{extension}"
+
+    def _get_public_url(self, file_key: str) -> str:
+        return f"{self.base_url}/{file_key}"
+
+    def _extract_key_from_url(self, file_url: str) -> str:
+        prefix = f"{self.base_url}/"
+        return file_url[len(prefix):] if file_url.startswith(prefix) else ""
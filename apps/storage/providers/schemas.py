@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
 
@@ -12,6 +13,26 @@ class UploadResult:
     content_type: str
 
 
+@dataclass
+class PresignedUpload:
+    """Параметры прямой загрузки из браузера в бакет (presigned POST)."""
+
+    url: str
+    fields: dict
+    file_key: str
+    expires_in: int
+
+
+@dataclass
+class StoredObject:
+    """Объект в хранилище (результат листинга)."""
+
+    file_key: str
+    url: str
+    file_size: int
+    last_modified: datetime
+
+
 @dataclass
 class DeleteResult:
     """Результат удаления файла из хранилища."""
@@ -1,64 +1,125 @@
 import logging
+import os
+import tempfile
+import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import BinaryIO
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Optional
 from urllib.parse import urlparse
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from django.conf import settings
 
+from apps.common.metrics import track_outbound
+
 from .base import StorageProviderBase
-from .schemas import DeleteResult, UploadResult
+from .schemas import DeleteResult, PresignedUpload, StoredObject, UploadResult
 
 logger = logging.getLogger(__name__)
 
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Общий на процесс клиент S3 с пулом соединений.
+
+    Создаётся лениво при первом обращении. Клиенты boto3 потокобезопасны,
+    поэтому все провайдеры (и потоки gunicorn) используют один клиент
+    и его keep-alive соединения вместо новой сессии и TLS на каждую операцию.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                # Сессия boto3 не потокобезопасна: своя, только под блокировкой
+                session = boto3.session.Session()
+                _s3_client = session.client(
+                    "s3",
+                    endpoint_url=settings.YANDEX_STORAGE_ENDPOINT,
+                    aws_access_key_id=settings.YANDEX_STORAGE_ACCESS_KEY,
+                    aws_secret_access_key=settings.YANDEX_STORAGE_SECRET_KEY,
+                    region_name=settings.YANDEX_STORAGE_REGION,
+                    config=Config(
+                        max_pool_connections=settings.YANDEX_STORAGE_MAX_POOL_CONNECTIONS,
+                        tcp_keepalive=True,
+                        connect_timeout=5,
+                        read_timeout=60,
+                        retries={"mode": "standard", "max_attempts": 3},
+                    ),
+                )
+    return _s3_client
+
+
+def reset_s3_client() -> None:
+    """Сбрасывает общий клиент (после смены настроек хранилища или fork)."""
+    global _s3_client
+    with _s3_client_lock:
+        _s3_client = None
+
 
 class YandexStorageProvider(StorageProviderBase):
     """Провайдер для Yandex Cloud Object Storage."""
 
+    # Ограничение S3 DeleteObjects на один запрос
+    DELETE_BATCH_SIZE = 1000
+
     def __init__(self):
-        """Инициализация клиента S3 для Yandex Cloud."""
-        self.s3_client = boto3.client(
-            "s3",
-            endpoint_url=settings.YANDEX_STORAGE_ENDPOINT,
-            aws_access_key_id=settings.YANDEX_STORAGE_ACCESS_KEY,
-            aws_secret_access_key=settings.YANDEX_STORAGE_SECRET_KEY,
-            region_name=settings.YANDEX_STORAGE_REGION,
-        )
+        """Инициализация провайдера с общим клиентом S3 (см. get_s3_client)."""
+        self.s3_client = get_s3_client()
         self.bucket_name = settings.YANDEX_STORAGE_BUCKET_NAME
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.YANDEX_STORAGE_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.YANDEX_STORAGE_MULTIPART_CHUNK_SIZE,
+            max_concurrency=settings.YANDEX_STORAGE_MAX_CONCURRENCY,
+        )
 
     def upload_file(
-        self, file: BinaryIO, filename: str, content_type: str, path_prefix: str = ""
+        self,
+        file: BinaryIO,
+        filename: str,
+        content_type: str,
+        path_prefix: str = "",
+        file_key: Optional[str] = None,
     ) -> UploadResult:
         """
         Загрузка файла в Yandex Cloud Object Storage.
 
+        Файл читается потоково: размер берётся через seek/tell, большие файлы
+        уходят multipart-загрузкой частями (см. YANDEX_STORAGE_MULTIPART_*),
+        поэтому целиком в память не попадают.
+
         Args:
             file: Файловый объект для загрузки
             filename: Оригинальное имя файла
             content_type: MIME-тип файла
             path_prefix: Префикс пути (по умолчанию "products")
+            file_key: Готовый ключ файла (например, для производных изображений)
 
         Returns:
             UploadResult с публичным URL и метаданными файла
         """
         try:
-            file_key = self._generate_file_key(filename, path_prefix)
-            file.seek(0)
-            file_size = len(file.read())
-            file.seek(0)
-
-            self.s3_client.upload_fileobj(
-                file,
-                self.bucket_name,
-                file_key,
-                ExtraArgs={
-                    "ContentType": content_type,
-                    "ACL": "public-read",
-                },
-            )
+            file_key = file_key or self._generate_file_key(filename, path_prefix)
+            file_size = self._get_file_size(file)
+
+            with track_outbound("s3"):
+                self.s3_client.upload_fileobj(
+                    file,
+                    self.bucket_name,
+                    file_key,
+                    ExtraArgs={
+                        "ContentType": content_type,
+                        "ACL": "public-read",
+                    },
+                    Config=self.transfer_config,
+                )
 
             public_url = self._get_public_url(file_key)
 
@@ -78,6 +139,82 @@ class YandexStorageProvider(StorageProviderBase):
             logger.error(error_msg)
             raise Exception(error_msg) from e
 
+    def create_presigned_upload(
+        self,
+        filename: str,
+        content_type: str,
+        max_size: int,
+        path_prefix: str = "",
+        expires_in: int = 600,
+    ) -> PresignedUpload:
+        """
+        Presigned POST для загрузки из браузера напрямую в бакет.
+
+        Политика фиксирует ключ, Content-Type, публичный ACL и диапазон
+        размера - Object Storage отклонит файл, который в неё не укладывается.
+        """
+        file_key = self._generate_file_key(filename, path_prefix)
+        try:
+            presigned = self.s3_client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Fields={"Content-Type": content_type, "acl": "public-read"},
+                Conditions=[
+                    {"Content-Type": content_type},
+                    {"acl": "public-read"},
+                    ["content-length-range", 1, max_size],
+                ],
+                ExpiresIn=expires_in,
+            )
+        except ClientError as e:
+            error_msg = f"Ошибка при подписи прямой загрузки: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+
+        return PresignedUpload(
+            url=presigned["url"],
+            fields=presigned["fields"],
+            file_key=file_key,
+            expires_in=expires_in,
+        )
+
+    def get_file_info(self, file_key: str) -> Optional[UploadResult]:
+        """Метаданные объекта в бакете (HEAD) или None, если его нет."""
+        try:
+            with track_outbound("s3"):
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            error_msg = f"Ошибка при чтении метаданных файла {file_key}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+
+        return UploadResult(
+            url=self._get_public_url(file_key),
+            file_key=file_key,
+            file_size=head["ContentLength"],
+            content_type=head.get("ContentType", ""),
+        )
+
+    def open_file(self, file_key: str) -> BinaryIO:
+        """
+        Скачивает объект во временный файл (в памяти до 1 МБ, дальше на диск).
+        """
+        file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        try:
+            with track_outbound("s3"):
+                self.s3_client.download_fileobj(
+                    self.bucket_name, file_key, file, Config=self.transfer_config
+                )
+        except ClientError as e:
+            file.close()
+            error_msg = f"Ошибка при скачивании файла {file_key}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+        file.seek(0)
+        return file
+
     def delete_file(self, file_url: str) -> DeleteResult:
         """
         Удаление файла из Yandex Cloud Object Storage.
@@ -96,7 +233,8 @@ class YandexStorageProvider(StorageProviderBase):
                 logger.error(error_msg)
                 return DeleteResult(success=False, error=error_msg)
 
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
+            with track_outbound("s3"):
+                self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
 
             logger.info(f"Файл успешно удалён: {file_key}")
 
@@ -107,6 +245,71 @@ class YandexStorageProvider(StorageProviderBase):
             logger.error(error_msg)
             return DeleteResult(success=False, error=error_msg)
 
+    @staticmethod
+    def _get_file_size(file: BinaryIO) -> int:
+        """Размер файла без чтения содержимого; позиция сбрасывается в начало."""
+        file.seek(0, os.SEEK_END)
+        file_size = file.tell()
+        file.seek(0)
+        return file_size
+
+    def list_files(self, prefix: str) -> Iterator[StoredObject]:
+        """Листинг бакета постранично (ListObjectsV2, до 1000 ключей за запрос)."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        try:
+            for page in pages:
+                for item in page.get("Contents", []):
+                    yield StoredObject(
+                        file_key=item["Key"],
+                        url=self._get_public_url(item["Key"]),
+                        file_size=item["Size"],
+                        last_modified=item["LastModified"],
+                    )
+        except ClientError as e:
+            error_msg = f"Ошибка при листинге бакета по префиксу {prefix}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+
+    def delete_files(self, file_keys: Iterable[str]) -> List[DeleteResult]:
+        """Удаление пачками через DeleteObjects (до 1000 ключей за запрос)."""
+        results = []
+        keys = iter(file_keys)
+        while batch := list(islice(keys, self.DELETE_BATCH_SIZE)):
+            try:
+                with track_outbound("s3"):
+                    response = self.s3_client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={
+                            "Objects": [{"Key": key} for key in batch],
+                            "Quiet": True,
+                        },
+                    )
+            except ClientError as e:
+                error_msg = f"Ошибка при массовом удалении из S3: {str(e)}"
+                logger.error(error_msg)
+                results.extend(
+                    DeleteResult(success=False, file_key=key, error=error_msg)
+                    for key in batch
+                )
+                continue
+
+            # В режиме Quiet ответ содержит только ошибки
+            errors = {
+                error["Key"]: error.get("Message", error.get("Code", ""))
+                for error in response.get("Errors", [])
+            }
+            results.extend(
+                DeleteResult(
+                    success=key not in errors, file_key=key, error=errors.get(key)
+                )
+                for key in batch
+            )
+            logger.info(
+                f"Удалено файлов пачкой: {len(batch) - len(errors)} из {len(batch)}"
+            )
+        return results
+
     def _generate_file_key(self, filename: str, path_prefix: str = "") -> str:
         """
         Генерация уникального ключа файла для хранения в S3.
@@ -1,13 +1,24 @@
+import hashlib
+import io
 import logging
 import mimetypes
-from pathlib import Path
-from typing import Optional
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
 
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 
-from .providers import YandexStorageProvider
+from .images import ImageDerivativeGenerator
+from .providers import LocalStorageProvider, YandexStorageProvider
 from .providers.base import StorageProviderBase
-from .providers.schemas import DeleteResult, UploadResult
+from .providers.schemas import (
+    DeleteResult,
+    PresignedUpload,
+    StoredObject,
+    UploadResult,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,31 +26,47 @@ logger = logging.getLogger(__name__)
 class StorageService:
     """Сервис для управления загрузкой и удалением файлов."""
 
+    PROVIDERS = {
+        "yandex": YandexStorageProvider,
+        "local": LocalStorageProvider,
+    }
+
     ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+    DIRECT_UPLOAD_EXPIRES = 10 * 60  # время жизни presigned POST, секунды
+    # Файлы, адресуемые по содержимому: <CONTENT_PREFIX>/ab/<sha256>.ext
+    CONTENT_PREFIX = "products/sha256"
 
     def __init__(self, storage_provider: Optional[StorageProviderBase] = None):
         """
         Инициализация сервиса хранилища.
 
         Args:
-            storage_provider: Провайдер хранилища (по умолчанию YandexStorageProvider)
+            storage_provider: Провайдер хранилища (по умолчанию из settings.STORAGE_BACKEND)
         """
-        self.storage_provider = storage_provider or YandexStorageProvider()
+        self.storage_provider = (
+            storage_provider or self.PROVIDERS[settings.STORAGE_BACKEND]()
+        )
 
     def upload(
         self,
         file: UploadedFile,
         path_prefix: str = "products",
         validate: bool = True,
+        deduplicate: bool = True,
     ) -> UploadResult:
         """
         Загрузка файла в хранилище.
 
+        С deduplicate ключ файла строится из SHA-256 содержимого (path_prefix
+        не используется): повторная загрузка тех же байтов не отправляет
+        ничего в хранилище и возвращает уже существующий объект.
+
         Args:
             file: Загружаемый файл
             path_prefix: Префикс пути для организации файлов
             validate: Проводить ли валидацию файла
+            deduplicate: Адресовать файл по содержимому
 
         Returns:
             UploadResult с публичным URL и метаданными файла
@@ -58,6 +85,9 @@ class StorageService:
                 f"Начало загрузки файла: {file.name} ({file.size} байт), тип: {content_type}"
             )
 
+            if deduplicate:
+                return self._upload_content_addressed(file, content_type)
+
             result = self.storage_provider.upload_file(
                 file=file.file,
                 filename=file.name,
@@ -77,6 +107,188 @@ class StorageService:
             )
             raise
 
+    def _upload_content_addressed(
+        self, file: UploadedFile, content_type: str
+    ) -> UploadResult:
+        # apps.storage импортирует сервис до загрузки моделей
+        from .models import StoredFile
+
+        sha256 = hashlib.sha256()
+        for chunk in file.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        file.seek(0)
+
+        with transaction.atomic():
+            # Ждём параллельную очистку этой записи (delete_stored_file)
+            stored = StoredFile.objects.select_for_update().filter(sha256=digest).first()
+            # Объект без ссылок мог уже удалить сборщик - тогда загружаем заново
+            if stored and (
+                stored.ref_count > 0
+                or self.storage_provider.get_file_info(stored.file_key) is not None
+            ):
+                logger.info(f"Файл {file.name} уже загружен как {stored.url}, пропускаем")
+                return self._stored_result(stored)
+
+        extension = Path(file.name).suffix.lower()
+        file_key = f"{self.CONTENT_PREFIX}/{digest[:2]}/{digest}{extension}"
+        result = self.storage_provider.get_file_info(file_key)
+        if result is None:
+            result = self.storage_provider.upload_file(
+                file=file.file,
+                filename=file.name,
+                content_type=content_type,
+                file_key=file_key,
+            )
+            logger.info(f"Файл успешно загружен: {result.url}")
+        else:
+            logger.info(f"Объект {file_key} уже есть в хранилище, пропускаем загрузку")
+
+        stored, _ = StoredFile.objects.get_or_create(
+            sha256=digest,
+            defaults={
+                "file_key": result.file_key,
+                "url": result.url,
+                "file_size": result.file_size,
+                "content_type": result.content_type or content_type,
+            },
+        )
+        return self._stored_result(stored)
+
+    @staticmethod
+    def _stored_result(stored) -> UploadResult:
+        return UploadResult(
+            url=stored.url,
+            file_key=stored.file_key,
+            file_size=stored.file_size,
+            content_type=stored.content_type,
+        )
+
+    def create_direct_upload(
+        self, filename: str, size: Optional[int] = None, path_prefix: str = "products"
+    ) -> PresignedUpload:
+        """
+        Подпись прямой загрузки из браузера в хранилище (минуя gunicorn).
+        Расширение и заявленный размер проверяются здесь, фактические тип и
+        размер - политикой presigned POST в самом хранилище.
+
+        Args:
+            filename: Имя выбранного файла
+            size: Размер файла по данным браузера
+            path_prefix: Префикс пути для организации файлов
+
+        Returns:
+            PresignedUpload с адресом формы и её полями
+
+        Raises:
+            ValueError: Если файл не прошёл валидацию
+        """
+        self._validate_name(filename)
+        if size is not None:
+            self._validate_size(size)
+
+        upload = self.storage_provider.create_presigned_upload(
+            filename=filename,
+            content_type=self._get_content_type(filename),
+            max_size=self.MAX_FILE_SIZE,
+            path_prefix=path_prefix,
+            expires_in=self.DIRECT_UPLOAD_EXPIRES,
+        )
+        logger.info(f"Подписана прямая загрузка: {upload.file_key}")
+        return upload
+
+    def confirm_direct_upload(
+        self, file_key: str, path_prefix: str = "products"
+    ) -> UploadResult:
+        """
+        Проверка файла, загруженного напрямую в хранилище.
+
+        Args:
+            file_key: Ключ из PresignedUpload
+            path_prefix: Префикс, под которым допускаются ключи
+
+        Returns:
+            UploadResult с публичным URL и метаданными файла
+
+        Raises:
+            ValueError: Если ключ чужой, файла нет или он не прошёл валидацию
+        """
+        if not file_key.startswith(f"{path_prefix.rstrip('/')}/") or ".." in file_key:
+            raise ValueError(f"Недопустимый ключ файла: {file_key}")
+        self._validate_name(file_key)
+
+        result = self.storage_provider.get_file_info(file_key)
+        if result is None:
+            raise ValueError(f"Файл не найден в хранилище: {file_key}")
+
+        try:
+            self._validate_size(result.file_size)
+        except ValueError:
+            self.delete(result.url)
+            raise
+
+        logger.info(f"Прямая загрузка подтверждена: {result.url}")
+        return result
+
+    def open(self, file_key: str) -> BinaryIO:
+        """Чтение файла из хранилища (файловый объект, позиция в начале)."""
+        return self.storage_provider.open_file(file_key)
+
+    def upload_derivatives(
+        self, file: Union[UploadedFile, BinaryIO], original: UploadResult
+    ) -> List[dict]:
+        """
+        Генерирует производные изображения и кладёт их рядом с оригиналом:
+        <ключ оригинала без расширения>_<размер>.<формат>.
+
+        Args:
+            file: Файл-оригинал (загруженный или прочитанный из хранилища)
+            original: Результат загрузки оригинала
+
+        Returns:
+            Список {"name", "format", "width", "height", "url"}; пустой,
+            если для формата файла производные не создаются
+        """
+        key = PurePosixPath(original.file_key)
+        if key.suffix.lower() not in ImageDerivativeGenerator.SUPPORTED_EXTENSIONS:
+            return []
+
+        from .models import StoredFile
+
+        stored = StoredFile.objects.filter(url=original.url).first()
+        if stored and stored.derivatives:
+            return stored.derivatives
+
+        base_key = str(key.with_suffix(""))
+
+        derivatives = []
+        source = getattr(file, "file", file)
+        for derivative in ImageDerivativeGenerator().generate(source):
+            result = self.storage_provider.upload_file(
+                file=io.BytesIO(derivative.content),
+                filename=f"{key.stem}_{derivative.name}.{derivative.format}",
+                content_type=derivative.content_type,
+                file_key=f"{base_key}_{derivative.name}.{derivative.format}",
+            )
+            derivatives.append(
+                {
+                    "name": derivative.name,
+                    "format": derivative.format,
+                    "width": derivative.width,
+                    "height": derivative.height,
+                    "url": result.url,
+                }
+            )
+
+        if stored:
+            stored.derivatives = derivatives
+            stored.save(update_fields=["derivatives"])
+
+        logger.info(
+            f"Производные изображения загружены: {len(derivatives)} для {original.url}"
+        )
+        return derivatives
+
     def delete(self, file_url: str) -> DeleteResult:
         """
         Удаление файла из хранилища.
@@ -107,37 +319,110 @@ class StorageService:
             )
             return DeleteResult(success=False, error=str(e))
 
+    def find_orphans(
+        self, prefix: str, referenced_urls: set, older_than: datetime
+    ) -> Iterator[StoredObject]:
+        """
+        Объекты под prefix, на которые нет ссылок.
+
+        Args:
+            prefix: Префикс ключей в хранилище
+            referenced_urls: URL, которые используются (множество в памяти)
+            older_than: Более новые объекты не трогаем - их загрузка может
+                ещё не закончиться сохранением записи
+
+        Returns:
+            Итератор StoredObject без ссылок
+        """
+        for obj in self.storage_provider.list_files(prefix):
+            if obj.url not in referenced_urls and obj.last_modified < older_than:
+                yield obj
+
+    def delete_many(self, file_keys: Iterable[str]) -> List[DeleteResult]:
+        """Массовое удаление по ключам (пачками, если хранилище это умеет)."""
+        results = self.storage_provider.delete_files(file_keys)
+        failed = [result for result in results if not result.success]
+        for result in failed:
+            logger.error(f"Не удалось удалить {result.file_key}: {result.error}")
+        logger.info(f"Массовое удаление: {len(results) - len(failed)} из {len(results)}")
+        return results
+
+    def delete_stored_file(self, file_url: str) -> Optional[DeleteResult]:
+        """
+        Удаление файла, адресуемого по содержимому, и его записи StoredFile,
+        если на неё нет ссылок.
+
+        Запись заблокирована, пока удаляется объект: загрузка тех же байтов
+        ждёт блокировку и, не найдя записи, загружает объект заново, а не
+        возвращает URL удаляемого файла.
+
+        Args:
+            file_url: Публичный URL файла
+
+        Returns:
+            DeleteResult или None, если записи нет или на неё есть ссылки
+        """
+        from .models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(url=file_url).first()
+            if stored is None or stored.ref_count > 0:
+                return None
+            result = self.delete(file_url)
+            if result.success:
+                stored.delete()
+            return result
+
     def cleanup_unused(
-        self, file_url: str, model_class, field_name: str = "url"
+        self,
+        file_url: str,
+        model_class,
+        field_name: str = "url",
+        related_urls: Iterable[str] = (),
     ) -> bool:
         """
         Удаление файла, если он больше не используется в указанной модели.
+        Вызывается после удаления записи, которая на него ссылалась.
+
+        Для файлов, адресуемых по содержимому (StoredFile), решение точное -
+        по счётчику ссылок; для остальных - по оставшимся записям модели.
 
         Args:
             file_url: URL файла для проверки и удаления
             model_class: Класс модели для проверки использования
             field_name: Имя поля с URL (по умолчанию "url")
+            related_urls: Файлы, удаляемые вместе с основным (производные изображения)
 
         Returns:
             True если файл был удалён, False если он всё ещё используется или не удалён
         """
-        try:
-            # Проверяем, используется ли файл в других записях
-            filter_kwargs = {field_name: file_url}
-            usage_count = model_class.objects.filter(**filter_kwargs).count()
+        from .models import StoredFile
 
-            if usage_count > 1:
-                logger.info(
-                    f"Файл {file_url} используется в {usage_count} записях, пропускаем удаление"
-                )
-                return False
+        try:
+            related_urls = set(related_urls)
+            stored = StoredFile.objects.filter(url=file_url).first()
+            if stored is not None:
+                result = self.delete_stored_file(file_url)
+                if result is None:
+                    logger.info(
+                        f"Файл {file_url} снова используется, пропускаем удаление"
+                    )
+                    return False
+                related_urls.update(d["url"] for d in stored.derivatives)
+            else:
+                filter_kwargs = {field_name: file_url}
+                usage_count = model_class.objects.filter(**filter_kwargs).count()
 
-            if usage_count == 0:
-                logger.warning(
-                    f"Файл {file_url} не найден в базе данных, но будет удалён из хранилища"
-                )
+                if usage_count > 0:
+                    logger.info(
+                        f"Файл {file_url} используется в {usage_count} записях, пропускаем удаление"
+                    )
+                    return False
+                result = self.delete(file_url)
 
-            result = self.delete(file_url)
+            if result.success:
+                for url in related_urls:
+                    self.delete(url)
             return result.success
 
         except Exception as e:
@@ -160,13 +445,18 @@ class StorageService:
         if not file:
             raise ValueError("Файл не предоставлен")
 
-        if file.size > self.MAX_FILE_SIZE:
+        self._validate_size(file.size)
+        self._validate_name(file.name)
+
+    def _validate_size(self, size: int) -> None:
+        if size > self.MAX_FILE_SIZE:
             raise ValueError(
                 f"Размер файла превышает максимально допустимый: "
-                f"{file.size} > {self.MAX_FILE_SIZE} байт"
+                f"{size} > {self.MAX_FILE_SIZE} байт"
             )
 
-        extension = Path(file.name).suffix.lower()
+    def _validate_name(self, filename: str) -> None:
+        extension = Path(filename).suffix.lower()
         if extension not in self.ALLOWED_EXTENSIONS:
             raise ValueError(
                 f"Недопустимое расширение файла: {extension}. "
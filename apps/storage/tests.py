@@ -0,0 +1,393 @@
+import datetime
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.main.models import CatalogProduct, Product, ProductMedia
+from apps.main.tests import create_catalog
+
+from . import StorageService
+from .images import ImageDerivativeGenerator
+from .models import StoredFile
+from .providers import LocalStorageProvider, YandexStorageProvider
+from .providers.base import StorageProviderBase
+from .providers.schemas import (
+    DeleteResult,
+    PresignedUpload,
+    StoredObject,
+    UploadResult,
+)
+from .providers.yandex import reset_s3_client
+
+
+class InMemoryStorageProvider(StorageProviderBase):
+    """Провайдер хранилища для тестов: складывает файлы в словарь."""
+
+    def __init__(self):
+        self.files = {}
+        self.modified = {}
+
+    def upload_file(self, file, filename, content_type, path_prefix="", file_key=None):
+        file_key = file_key or f"{path_prefix}/{filename}"
+        content = file.read()
+        self.files[file_key] = content
+        return UploadResult(
+            url=f"https://cdn.example.com/{file_key}",
+            file_key=file_key,
+            file_size=len(content),
+            content_type=content_type,
+        )
+
+    def create_presigned_upload(
+        self, filename, content_type, max_size, path_prefix="", expires_in=600
+    ):
+        file_key = f"{path_prefix}/{filename}"
+        return PresignedUpload(
+            url="https://storage.example.com/bucket",
+            fields={"key": file_key, "Content-Type": content_type},
+            file_key=file_key,
+            expires_in=expires_in,
+        )
+
+    def get_file_info(self, file_key):
+        if file_key not in self.files:
+            return None
+        return UploadResult(
+            url=f"https://cdn.example.com/{file_key}",
+            file_key=file_key,
+            file_size=len(self.files[file_key]),
+            content_type="",
+        )
+
+    def open_file(self, file_key):
+        return io.BytesIO(self.files[file_key])
+
+    def delete_file(self, file_url):
+        file_key = file_url.removeprefix("https://cdn.example.com/")
+        self.files.pop(file_key, None)
+        return DeleteResult(success=True, file_key=file_key)
+
+    def list_files(self, prefix):
+        for file_key, content in sorted(self.files.items()):
+            if file_key.startswith(prefix):
+                yield StoredObject(
+                    file_key=file_key,
+                    url=f"https://cdn.example.com/{file_key}",
+                    file_size=len(content),
+                    last_modified=self.modified.get(file_key, timezone.now()),
+                )
+
+    def delete_files(self, file_keys):
+        return [self.delete_file(f"https://cdn.example.com/{key}") for key in file_keys]
+
+
+class OrphanMediaCleanupTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(1)
+        self.provider = InMemoryStorageProvider()
+        old = timezone.now() - datetime.timedelta(days=2)
+        for key in ("products/1/used.jpg", "products/1/used_thumb.webp", "products/1/orphan.jpg"):
+            self.provider.files[key] = b"data"
+            self.provider.modified[key] = old
+        self.provider.files["products/temp/uploading.jpg"] = b"data"
+        ProductMedia.objects.create(
+            product=Product.objects.get(),
+            type="image",
+            url="https://cdn.example.com/products/1/used.jpg",
+            derivatives=[
+                {"name": "thumb", "format": "webp", "width": 160, "height": 160,
+                 "url": "https://cdn.example.com/products/1/used_thumb.webp"}
+            ],
+        )
+
+    def run_command(self, *args):
+        service = StorageService(storage_provider=self.provider)
+        with mock.patch(
+            "apps.main.management.commands.cleanup_orphan_media.StorageService",
+            return_value=service,
+        ):
+            call_command("cleanup_orphan_media", *args, stdout=io.StringIO())
+
+    def test_dry_run_keeps_files(self):
+        self.run_command("--dry-run")
+        self.assertEqual(len(self.provider.files), 4)
+
+    def test_deletes_only_old_orphans(self):
+        self.run_command()
+        self.assertEqual(
+            sorted(self.provider.files),
+            [
+                "products/1/used.jpg",
+                "products/1/used_thumb.webp",
+                "products/temp/uploading.jpg",
+            ],
+        )
+
+
+    def test_keeps_stored_file_referenced_after_scan(self):
+        stored = StoredFile.objects.create(
+            sha256="a" * 64,
+            file_key="products/sha256/aa/reused.jpg",
+            url="https://cdn.example.com/products/sha256/aa/reused.jpg",
+            file_size=4,
+            content_type="image/jpeg",
+            ref_count=1,
+        )
+        self.provider.files[stored.file_key] = b"data"
+        self.provider.modified[stored.file_key] = timezone.now() - datetime.timedelta(days=2)
+
+        # ссылка появилась уже после того, как команда собрала используемые URL
+        with mock.patch(
+            "apps.main.management.commands.cleanup_orphan_media.Command._referenced_urls",
+            return_value={
+                "https://cdn.example.com/products/1/used.jpg",
+                "https://cdn.example.com/products/1/used_thumb.webp",
+            },
+        ):
+            self.run_command()
+
+        self.assertIn(stored.file_key, self.provider.files)
+        self.assertNotIn("products/1/orphan.jpg", self.provider.files)
+        self.assertTrue(StoredFile.objects.filter(pk=stored.pk).exists())
+
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.provider = InMemoryStorageProvider()
+        self.service = StorageService(storage_provider=self.provider)
+
+    def test_presign_validates_extension_and_size(self):
+        upload = self.service.create_direct_upload("photo.JPG", size=100)
+        self.assertEqual(upload.fields["Content-Type"], "image/jpeg")
+        self.assertTrue(upload.file_key.startswith("products/"))
+
+        with self.assertRaises(ValueError):
+            self.service.create_direct_upload("script.svg")
+        with self.assertRaises(ValueError):
+            self.service.create_direct_upload("photo.jpg", size=StorageService.MAX_FILE_SIZE + 1)
+
+    def test_confirm_checks_key_and_object(self):
+        self.provider.files["products/1/photo.png"] = b"png"
+        result = self.service.confirm_direct_upload("products/1/photo.png")
+        self.assertEqual(result.file_size, 3)
+
+        for key in ("orders/1/photo.png", "products/../photo.png", "products/2/missing.png"):
+            with self.assertRaises(ValueError):
+                self.service.confirm_direct_upload(key)
+
+    def test_confirm_deletes_oversized_object(self):
+        self.provider.files["products/1/big.png"] = b"x" * (StorageService.MAX_FILE_SIZE + 1)
+        with self.assertRaises(ValueError):
+            self.service.confirm_direct_upload("products/1/big.png")
+        self.assertNotIn("products/1/big.png", self.provider.files)
+
+
+class MediaDeduplicationTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(1)
+        self.product = Product.objects.get(slug="product-0")
+        self.provider = InMemoryStorageProvider()
+        self.service = StorageService(storage_provider=self.provider)
+
+    def upload(self, name="photo.jpg", content=b"same bytes"):
+        return self.service.upload(SimpleUploadedFile(name, content), "products/1")
+
+    def test_identical_bytes_share_one_object(self):
+        first = self.upload()
+        second = self.upload(name="reshoot.jpg")
+
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(len(self.provider.files), 1)
+        self.assertTrue(first.file_key.startswith(f"{StorageService.CONTENT_PREFIX}/"))
+        self.assertEqual(StoredFile.objects.get().file_size, len(b"same bytes"))
+
+    def test_cleanup_uses_reference_count(self):
+        result = self.upload()
+        first, second = (
+            ProductMedia.objects.create(product=self.product, type="image", url=result.url)
+            for _ in range(2)
+        )
+        self.assertEqual(StoredFile.objects.get().ref_count, 2)
+
+        first.delete()
+        self.assertFalse(self.service.cleanup_unused(result.url, ProductMedia))
+        self.assertIn(result.file_key, self.provider.files)
+
+        second.url = "https://cdn.example.com/other.jpg"
+        second.save()
+        self.assertEqual(StoredFile.objects.get().ref_count, 0)
+        self.assertTrue(self.service.cleanup_unused(result.url, ProductMedia))
+        self.assertEqual(self.provider.files, {})
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_reuse_reuploads_object_removed_by_cleanup(self):
+        result = self.upload()
+        # сборщик успел удалить объект, запись без ссылок ещё на месте
+        del self.provider.files[result.file_key]
+
+        self.assertEqual(self.upload(name="again.jpg").url, result.url)
+        self.assertEqual(self.provider.files[result.file_key], b"same bytes")
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_delete_stored_file_rechecks_references(self):
+        result = self.upload()
+        StoredFile.add_reference(result.url)
+
+        self.assertIsNone(self.service.delete_stored_file(result.url))
+        self.assertIn(result.file_key, self.provider.files)
+
+    def test_legacy_url_kept_while_referenced(self):
+        url = "https://cdn.example.com/0/0.jpg"
+        self.provider.files["0/0.jpg"] = b"legacy"
+        self.product.media.filter(position=1).delete()
+        ProductMedia.objects.create(product=self.product, type="image", url=url)
+
+        self.product.media.filter(url=url).first().delete()
+        self.assertFalse(self.service.cleanup_unused(url, ProductMedia))
+        self.product.media.filter(url=url).delete()
+        self.assertTrue(self.service.cleanup_unused(url, ProductMedia))
+        self.assertNotIn("0/0.jpg", self.provider.files)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(1)
+        self.product = Product.objects.get(slug="product-0")
+
+    @staticmethod
+    def make_upload(width, height, name="photo.png", mode="RGBA"):
+        buffer = io.BytesIO()
+        Image.new(mode, (width, height), (200, 10, 10, 128)).save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_generator_skips_upscaling(self):
+        derivatives = ImageDerivativeGenerator().generate(self.make_upload(1200, 600))
+
+        self.assertEqual(
+            sorted({(d.name, d.width, d.height) for d in derivatives}),
+            [("card", 480, 240), ("detail", 1080, 540), ("thumb", 160, 80)],
+        )
+        jpeg = next(d for d in derivatives if d.format == "jpeg")
+        self.assertEqual(Image.open(io.BytesIO(jpeg.content)).mode, "RGB")
+        webp = next(d for d in derivatives if d.format == "webp")
+        self.assertEqual(Image.open(io.BytesIO(webp.content)).format, "WEBP")
+
+    def test_upload_derivatives_next_to_original(self):
+        provider = InMemoryStorageProvider()
+        service = StorageService(storage_provider=provider)
+        upload = self.make_upload(600, 600)
+        original = service.upload(upload, path_prefix="products/1", deduplicate=False)
+
+        derivatives = service.upload_derivatives(upload, original)
+
+        self.assertEqual(len(derivatives), 4)
+        self.assertIn("products/1/photo_card.webp", provider.files)
+        gif = service.upload(SimpleUploadedFile("anim.gif", b"GIF89a"), "products/1")
+        self.assertEqual(service.upload_derivatives(io.BytesIO(b"GIF89a"), gif), [])
+
+    def test_srcsets_in_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            media = self.product.media.get(position=0)
+            media.derivatives = [
+                {"name": name, "format": fmt, "width": width, "height": width,
+                 "url": f"https://cdn.example.com/0/0_{name}.{fmt}"}
+                for name, width in (("card", 480), ("thumb", 160))
+                for fmt in ("webp", "jpeg")
+            ]
+            media.save()
+
+        expected = {
+            "webp": "https://cdn.example.com/0/0_thumb.webp 160w, "
+            "https://cdn.example.com/0/0_card.webp 480w",
+            "jpeg": "https://cdn.example.com/0/0_thumb.jpeg 160w, "
+            "https://cdn.example.com/0/0_card.jpeg 480w",
+        }
+        self.assertEqual(media.get_srcsets(), expected)
+        self.assertEqual(
+            media.get_derivative_url("thumb"), "https://cdn.example.com/0/0_thumb.jpeg"
+        )
+        # главное фото (is_main) идёт первым, как и в images
+        self.assertEqual(CatalogProduct.objects.get().image_srcsets, [{}, expected])
+
+        client = APIClient()
+        listing = client.get(reverse("product-list")).json()["results"][0]
+        self.assertEqual(listing["srcsets"], [{}, expected])
+        detail = client.get(
+            reverse("product-detail", kwargs={"slug": self.product.slug})
+        ).json()
+        self.assertEqual(detail["media"][0]["srcset"], expected)
+
+
+class YandexStorageUploadTests(TestCase):
+    def test_providers_share_pooled_client(self):
+        reset_s3_client()
+        self.addCleanup(reset_s3_client)
+        with override_settings(YANDEX_STORAGE_MAX_POOL_CONNECTIONS=7):
+            first, second = YandexStorageProvider(), YandexStorageProvider()
+
+        self.assertIs(first.s3_client, second.s3_client)
+        self.assertEqual(first.s3_client.meta.config.max_pool_connections, 7)
+
+    @override_settings(
+        YANDEX_STORAGE_MULTIPART_CHUNK_SIZE=5 * 1024 * 1024,
+        YANDEX_STORAGE_MAX_CONCURRENCY=2,
+    )
+    def test_upload_streams_with_transfer_config(self):
+        provider = YandexStorageProvider()
+        provider.s3_client = mock.Mock()
+        file = io.BytesIO(b"x" * 1000)
+        file.read = mock.Mock(wraps=file.read)
+
+        result = provider.upload_file(file, "clip.mp4", "video/mp4", file_key="v/clip.mp4")
+
+        self.assertEqual(result.file_size, 1000)
+        file.read.assert_not_called()
+        config = provider.s3_client.upload_fileobj.call_args.kwargs["Config"]
+        self.assertEqual(config.multipart_chunksize, 5 * 1024 * 1024)
+        self.assertEqual(config.max_concurrency, 2)
+
+
+class LocalStorageProviderTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def test_upload_list_delete(self):
+        with override_settings(
+            STORAGE_BACKEND="local",
+            MEDIA_ROOT=self.root,
+            STORAGE_LOCAL_BASE_URL="https://shop.example.com/media/",
+        ):
+            service = StorageService()
+            self.assertIsInstance(service.storage_provider, LocalStorageProvider)
+            result = service.upload(SimpleUploadedFile("photo.jpg", b"jpeg bytes"))
+
+        self.assertTrue(result.url.startswith("https://shop.example.com/media/products/"))
+        self.assertEqual((self.root / result.file_key).read_bytes(), b"jpeg bytes")
+        self.assertEqual(
+            [obj.file_key for obj in service.storage_provider.list_files("products/")],
+            [result.file_key],
+        )
+
+        self.assertTrue(service.delete(result.url).success)
+        self.assertFalse((self.root / result.file_key).exists())
+
+    def test_rejects_keys_outside_root(self):
+        provider = LocalStorageProvider(root=self.root, base_url="http://localhost/media/")
+        with self.assertRaises(ValueError):
+            provider.open_file("../etc/passwd")
+        self.assertFalse(provider.delete_files(["../outside.jpg"])[0].success)
@@ -1,4 +1,6 @@
+import sys
 from pathlib import Path
+from corsheaders.defaults import default_headers as default_cors_headers
 from decouple import config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +45,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "apps.common.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -96,6 +99,24 @@ elif DATABASES["default"]["ENGINE"].startswith("django.db.backends.postgresql"):
         "connect_timeout": 10,
     }
 
+# Cache
+# LocMemCache живёт внутри одного процесса. При нескольких воркерах gunicorn
+# нужен общий бэкенд (например, FileBasedCache), иначе сброс кэша в одном
+# воркере не затронет остальные.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="minem-default"),
+    }
+}
+
+# Время жизни кэша карточки товара (сек). Основной механизм - сброс по сигналам
+PRODUCT_DETAIL_CACHE_TIMEOUT = config(
+    "PRODUCT_DETAIL_CACHE_TIMEOUT", default=60 * 60, cast=int
+)
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -140,6 +161,13 @@ STATICFILES_FINDERS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Хранилище медиа: "yandex" (Object Storage) или "local" (файлы в MEDIA_ROOT,
+# раздаются nginx из /media/) - для тестов, бенчмарков и staging без бакета
+STORAGE_BACKEND = config("STORAGE_BACKEND", default="yandex")
+STORAGE_LOCAL_BASE_URL = config(
+    "STORAGE_LOCAL_BASE_URL", default=f"http://localhost:8000{MEDIA_URL}"
+)
+
 # Yandex Cloud Object Storage
 YANDEX_STORAGE_ACCESS_KEY = config("YANDEX_STORAGE_ACCESS_KEY", default="")
 YANDEX_STORAGE_SECRET_KEY = config("YANDEX_STORAGE_SECRET_KEY", default="")
@@ -148,6 +176,21 @@ YANDEX_STORAGE_ENDPOINT = config(
     "YANDEX_STORAGE_ENDPOINT", default="https://storage.yandexcloud.net"
 )
 YANDEX_STORAGE_REGION = config("YANDEX_STORAGE_REGION", default="ru-central1")
+# Multipart-загрузка: файлы больше порога уходят частями по CHUNK_SIZE,
+# до MAX_CONCURRENCY частей параллельно (память ~ CHUNK_SIZE * MAX_CONCURRENCY)
+YANDEX_STORAGE_MULTIPART_THRESHOLD = config(
+    "YANDEX_STORAGE_MULTIPART_THRESHOLD", default=8 * 1024 * 1024, cast=int
+)
+YANDEX_STORAGE_MULTIPART_CHUNK_SIZE = config(
+    "YANDEX_STORAGE_MULTIPART_CHUNK_SIZE", default=8 * 1024 * 1024, cast=int
+)
+YANDEX_STORAGE_MAX_CONCURRENCY = config(
+    "YANDEX_STORAGE_MAX_CONCURRENCY", default=4, cast=int
+)
+# Пул keep-alive соединений общего клиента S3 (не меньше MAX_CONCURRENCY)
+YANDEX_STORAGE_MAX_POOL_CONNECTIONS = config(
+    "YANDEX_STORAGE_MAX_POOL_CONNECTIONS", default=10, cast=int
+)
 
 # Yandex Delivery Service
 YANDEX_DELIVERY_API_KEY = config("YANDEX_DELIVERY_API_KEY", default="")
@@ -163,6 +206,19 @@ DEFAULT_DELIVERY_COST = config("DEFAULT_DELIVERY_COST", default=400, cast=int)
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# JSON для API: "json" (стандартный) или "orjson" (быстрый, нужен пакет orjson)
+API_JSON_BACKEND = config("API_JSON_BACKEND", default="json")
+JSON_RENDERER_CLASS, JSON_PARSER_CLASS = {
+    "json": (
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.parsers.JSONParser",
+    ),
+    "orjson": (
+        "apps.common.renderers.ORJSONRenderer",
+        "apps.common.parsers.ORJSONParser",
+    ),
+}[API_JSON_BACKEND]
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
@@ -179,10 +235,10 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        JSON_RENDERER_CLASS,
     ],
     "DEFAULT_PARSER_CLASSES": [
-        "rest_framework.parsers.JSONParser",
+        JSON_PARSER_CLASS,
         "rest_framework.parsers.MultiPartParser",
         "rest_framework.parsers.FormParser",
     ],
@@ -218,6 +274,10 @@ SECURE_HSTS_PRELOAD = True
 
 # CORS - добавьте только реальные домены!
 CORS_ALLOW_CREDENTIALS = True
+# Заголовки условных запросов каталога доступны фронтенду
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified", "Idempotent-Replayed"]
+# Idempotency-Key для повторов POST /api/v1/orders/
+CORS_ALLOW_HEADERS = (*default_cors_headers, "idempotency-key")
 
 # CSRF Protection
 CSRF_TRUSTED_ORIGINS = [
@@ -241,10 +301,43 @@ CSRF_COOKIE_SAMESITE = "Lax"
 YOOKASSA_ACCOUNT_ID = config("YOOKASSA_ACCOUNT_ID", default="")
 YOOKASSA_SECRET_KEY = config("YOOKASSA_SECRET_KEY", default="")
 
+# Время жизни резерва остатков под неоплаченный заказ (минуты). Просроченные
+# резервы сразу перестают уменьшать доступный остаток, а команда
+# expire_stock_reservations отменяет такие заказы
+STOCK_RESERVATION_TTL_MINUTES = config(
+    "STOCK_RESERVATION_TTL_MINUTES", default=30, cast=int
+)
+
+# Idempotency-Key для POST /api/v1/orders/: сколько часов хранится ответ
+# и через сколько секунд незавершённый запрос можно выполнить повторно
+# (процесс упал, не сохранив ответ)
+ORDER_IDEMPOTENCY_KEY_TTL_HOURS = config(
+    "ORDER_IDEMPOTENCY_KEY_TTL_HOURS", default=24, cast=int
+)
+ORDER_IDEMPOTENCY_LOCK_SECONDS = config(
+    "ORDER_IDEMPOTENCY_LOCK_SECONDS", default=60, cast=int
+)
+
 
 # URL фронтенда для редиректов
 FRONTEND_URL = config("FRONTEND_URL", default="http://localhost:5173")
 
+# Товарные фиды (Яндекс Маркет, Google Merchant)
+FEED_SHOP_NAME = config("FEED_SHOP_NAME", default="Minem")
+FEED_COMPANY_NAME = config("FEED_COMPANY_NAME", default="Minem")
+FEED_ROOT = MEDIA_ROOT / "feeds"
+
+# Статический снимок каталога (publish_catalog_snapshot), раздаётся nginx
+CATALOG_SNAPSHOT_ROOT = MEDIA_ROOT / "catalog"
+# Хост и схема для ссылок пагинации внутри снимка
+CATALOG_SNAPSHOT_BASE_URL = config(
+    "CATALOG_SNAPSHOT_BASE_URL", default="http://localhost:8000"
+)
+# Перерисовывать затронутые файлы снимка при изменении товара в админке
+CATALOG_SNAPSHOT_AUTO_REFRESH = config(
+    "CATALOG_SNAPSHOT_AUTO_REFRESH", default=False, cast=bool
+)
+
 # Email настройки (для уведомлений)
 EMAIL_BACKEND = config(
     "EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend"
@@ -257,6 +350,23 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="Minem <noreply@minem.com>")
 
+# Метрики запросов (Server-Timing, лог) и бюджеты SQL-запросов по имени маршрута
+TESTING = sys.argv[1:2] == ["test"]
+REQUEST_METRICS_ENABLED = config("REQUEST_METRICS_ENABLED", default=True, cast=bool)
+# "log" - warning в лог, "raise" - исключение (по умолчанию в тестах)
+QUERY_BUDGET_ACTION = config(
+    "QUERY_BUDGET_ACTION", default="raise" if TESTING else "log"
+)
+QUERY_BUDGETS = {
+    "category-list": 4,
+    "category-product-list": 6,
+    "product-list": 6,
+    "product-search": 4,
+    "product-detail": 8,
+    "cart-variants": 2,
+    "order-detail": 3,
+}
+
 # Logging configuration
 LOGGING = {
     "version": 1,
@@ -340,6 +450,16 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "apps.common.middleware": {
+            "handlers": ["file"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "apps.common.db": {
+            "handlers": ["console", "file"],
+            "level": "WARNING",
+            "propagate": False,
+        },
         "apps.delivery": {
             "handlers": ["delivery_file", "console"],
             "level": "DEBUG",
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path, include
 from config.admin import admin_site
 
@@ -9,3 +11,6 @@ urlpatterns = [
     path("api/v1/contacts/", include("apps.contacts.urls")),
     path("api/v1/delivery/", include("apps.delivery.urls")),
 ]
+
+# Медиа из MEDIA_ROOT при DEBUG (STORAGE_BACKEND=local); в продакшене - nginx
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
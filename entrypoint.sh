@@ -10,6 +10,11 @@ echo "Database started"
 echo "Running migrations..."
 python manage.py migrate --noinput
 
+# Списки каталога читают только CatalogProduct: после миграций таблица
+# должна быть заполнена, иначе каталог пуст до ручной пересборки
+echo "Rebuilding catalog projection..."
+python manage.py rebuild_catalog_projection
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput --clear
 